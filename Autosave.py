@@ -0,0 +1,383 @@
+"""Автосохранение и восстановление после сбоя.
+
+Правки (вставка, удаление, смена стиля участка, картинки) отправляются в
+очередь и дописываются фоновым потоком в журнал — файл JSON-строк. Поток сам
+применяет правки к своей копии документа и время от времени сохраняет её
+снимком: снимок пишется во временный файл и атомарно переименовывается,
+после чего начинается новый журнал. Поток интерфейса только кладёт записи
+в очередь, поэтому стоимость автосохранения пропорциональна правкам, а не
+размеру документа. Содержимое картинки пишется в журнал один раз — при
+первом её появлении после снимка.
+
+Каждый запущенный редактор пишет в свой каталог сеанса внутри общего
+каталога автосохранения (AutosaveSession), поэтому несколько редакторов не
+затирают журналы друг друга; у каждой вкладки — свой журнал в подкаталоге
+сеанса. Каталог сеанса заблокирован файлом lock, пока
+процесс жив; блокировку снимает ОС, поэтому незаблокированный каталог
+остался от завершившегося со сбоем редактора.
+
+Файлы в каталоге сеанса:
+    lock                — файл блокировки сеанса;
+    tab-<N>/            — журнал вкладки:
+        snapshot.json   — документ версии 2 и номер поколения журнала;
+        journal-<N>.log — правки после снимка поколения N.
+При штатном выходе каталог сеанса удаляется; оставшиеся файлы означают сбой.
+"""
+import base64
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import DocumentFormat
+from Document import Document
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+SNAPSHOT_NAME = "snapshot.json"
+LOCK_NAME = "lock"
+SESSION_PREFIX = "session-"
+JOURNAL_PREFIX = "tab-"
+SNAPSHOT_INTERVAL = 60.0  # Секунд между снимками
+FLUSH_INTERVAL = 1.0  # Секунд между сбросом журнала на диск
+
+
+def default_directory():
+    return os.path.join(os.path.expanduser("~"), ".texteditor", "autosave")
+
+
+def journal_path(directory, generation):
+    return os.path.join(directory, f"journal-{generation}.log")
+
+
+def write_atomically(path, data):
+    """Записывает файл через временный файл и rename, чтобы не оставить его недописанным."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def apply_record(document, record, styles):
+    """Применяет запись журнала к документу; styles — номера стилей журнала и их ключи."""
+    op = record["op"]
+    if op == "style":
+        styles[record["id"]] = DocumentFormat.style_key(record["style"])
+    elif op == "insert":
+        document.insert(record["offset"], record["text"], styles[record["style"]])
+    elif op == "delete":
+        document.delete(record["offset"], record["length"])
+    elif op == "format":
+        document.set_style(record["start"], record["end"], styles[record["style"]])
+    elif op == "image_data":
+        document.add_image_data(record["hash"], base64.b64decode(record["data"]))
+    elif op == "image":
+        document.set_image(record["start"], record["end"], tuple(record["ref"]) if record["ref"] else None)
+
+
+def recover(directory):
+    """Восстанавливает документ из снимка и журнала; None, если восстанавливать нечего."""
+    snapshot_file = os.path.join(directory, SNAPSHOT_NAME)
+    if not os.path.exists(snapshot_file):
+        return None
+    with open(snapshot_file, "r", encoding="utf-8") as file:
+        snapshot = json.load(file)
+
+    document = Document.from_json(snapshot["document"])
+    styles = {}
+    replayed = 0
+    journal_file = journal_path(directory, snapshot["generation"])
+    if os.path.exists(journal_file):
+        with open(journal_file, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Последняя строка могла остаться недописанной
+                apply_record(document, record, styles)
+                if record["op"] not in ("style", "image_data"):
+                    replayed += 1
+
+    if not replayed and not len(document):
+        return None
+    return document.to_json()
+
+
+def session_journals(directory):
+    """Каталоги журналов сеанса в порядке создания (сам каталог — если журнал лежит прямо в нём)."""
+    names = sorted(name for name in os.listdir(directory)
+                   if name.startswith(JOURNAL_PREFIX) and os.path.isdir(os.path.join(directory, name)))
+    return [directory] + [os.path.join(directory, name) for name in names]
+
+
+def recover_session(directory):
+    """Документы всех журналов каталога сеанса (журналы, которые не удалось прочитать, пропускаются)."""
+    documents = []
+    for journal_directory in session_journals(directory):
+        try:
+            document = recover(journal_directory)
+        except Exception as e:
+            print(f"[ERROR] Не удалось прочитать автосохранение {journal_directory}: {e}")
+            continue
+        if document is not None:
+            documents.append(document)
+    return documents
+
+
+def discard(directory):
+    """Удаляет файлы автосохранения."""
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name == SNAPSHOT_NAME or (name.startswith("journal-") and name.endswith(".log")) or name.endswith(".tmp"):
+            os.remove(os.path.join(directory, name))
+
+
+class SessionLock:
+    """Блокировка файла на время жизни процесса (снимается ОС, если процесс завершился)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """Пытается заблокировать файл, не дожидаясь; False — файл занят другим процессом."""
+        file = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            file.close()
+            return False
+        self._file = file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # Закрытие файла снимает блокировку
+            self._file = None
+
+
+def remove_session(directory, lock):
+    """Удаляет каталог сеанса, которым владеет lock, вместе с журналами вкладок."""
+    lock.release()
+    try:
+        shutil.rmtree(directory)
+    except OSError as e:
+        print(f"[ERROR] Не удалось удалить каталог автосохранения: {e}")
+
+
+def orphaned_sessions(base_directory):
+    """Каталоги сеансов завершившихся редакторов: [(каталог, блокировка)], блокировки уже захвачены."""
+    if not os.path.isdir(base_directory):
+        return []
+    sessions = []
+    for name in sorted(os.listdir(base_directory)):
+        directory = os.path.join(base_directory, name)
+        if not name.startswith(SESSION_PREFIX) or not os.path.isdir(directory):
+            continue
+        lock = SessionLock(os.path.join(directory, LOCK_NAME))
+        try:
+            if lock.acquire():
+                sessions.append((directory, lock))
+        except OSError as e:
+            print(f"[ERROR] Не удалось проверить каталог автосохранения {directory}: {e}")
+    return sessions
+
+
+class AutosaveSession:
+    """Каталог автосохранения этого процесса внутри общего каталога base_directory."""
+
+    def __init__(self, base_directory):
+        os.makedirs(base_directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix=f"{SESSION_PREFIX}{os.getpid()}-", dir=base_directory)
+        self.lock = SessionLock(os.path.join(self.directory, LOCK_NAME))
+        if not self.lock.acquire():
+            raise OSError(f"Каталог автосохранения занят: {self.directory}")
+        self._journals = 0
+
+    def journal_directory(self):
+        """Новый каталог для журнала одной вкладки."""
+        self._journals += 1
+        return os.path.join(self.directory, f"{JOURNAL_PREFIX}{self._journals:06d}")
+
+    def close(self):
+        """Штатное завершение: каталог сеанса больше не нужен."""
+        remove_session(self.directory, self.lock)
+
+
+class Autosave:
+    """Журнал правок с фоновым потоком записи и периодическими снимками."""
+
+    def __init__(self, directory, snapshot_interval=SNAPSHOT_INTERVAL, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.flush_interval = flush_interval
+        self.active = False
+        self.error = None  # Последняя ошибка записи (поток не падает из-за неё)
+        self._queue = queue.Queue()
+        self._style_ids = {}  # Ключ стиля -> номер в журнале (только поток интерфейса)
+        self._image_hashes = set()  # Картинки, содержимое которых уже в журнале (только поток интерфейса)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --- Поток интерфейса ---
+
+    def reset(self, document):
+        """Начинает автосохранение документа заново (None — приостановить до следующего reset).
+
+        document — копия (Document.snapshot()), которую дальше меняет только фоновый поток:
+        снимок в JSON собирается там же, а не в потоке интерфейса.
+        """
+        self._style_ids = {}
+        self._image_hashes = set()
+        self.active = document is not None
+        self._queue.put(("reset", document))
+
+    def record_insert(self, offset, text, style_key):
+        if self.active:
+            self._queue.put({"op": "insert", "offset": offset, "text": text, "style": self._style_id(style_key)})
+
+    def record_delete(self, offset, length):
+        if self.active:
+            self._queue.put({"op": "delete", "offset": offset, "length": length})
+
+    def record_format(self, start, end, style_key):
+        if self.active:
+            self._queue.put({"op": "format", "start": start, "end": end, "style": self._style_id(style_key)})
+
+    def record_image(self, start, end, ref, data=None):
+        """Картинка ref (None — убрана) на участке [start, end); data — содержимое файла картинки."""
+        if not self.active:
+            return
+        if ref is not None and ref[0] not in self._image_hashes and data is not None:
+            self._image_hashes.add(ref[0])
+            # base64 считается в фоновом потоке
+            self._queue.put({"op": "image_data", "hash": ref[0], "data": data})
+        self._queue.put({"op": "image", "start": start, "end": end, "ref": list(ref) if ref else None})
+
+    def _style_id(self, style_key):
+        style_id = self._style_ids.get(style_key)
+        if style_id is None:
+            style_id = self._style_ids[style_key] = len(self._style_ids)
+            self._queue.put({"op": "style", "id": style_id, "style": DocumentFormat.style_from_key(style_key)})
+        return style_id
+
+    def suspend(self):
+        """Дописывает документ снимком и освобождает копию в потоке записи; файлы остаются для восстановления.
+
+        Продолжить журнал можно только через reset.
+        """
+        self.active = False
+        self._queue.put(("suspend", None))
+
+    def take_error(self):
+        """Ошибка записи с прошлого вызова (None — ошибок не было)."""
+        error, self.error = self.error, None
+        return error
+
+    def close(self, discard_files=True):
+        """Останавливает поток; при штатном выходе файлы автосохранения удаляются."""
+        self.active = False
+        self._queue.put(("close", discard_files))
+        self._thread.join()
+
+    # --- Фоновый поток ---
+
+    def _run(self):
+        document = None
+        styles = {}
+        journal = None
+        generation = 0
+        dirty = False
+        last_snapshot = last_flush = time.monotonic()
+
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            try:
+                if isinstance(item, tuple):
+                    command, argument = item
+                    if journal is not None:
+                        journal.close()
+                        journal = None
+                    if command == "close":
+                        if argument:
+                            discard(self.directory)
+                            if os.path.isdir(self.directory) and not os.listdir(self.directory):
+                                os.rmdir(self.directory)
+                        return
+                    if command == "suspend":
+                        if document is not None and dirty:
+                            # Снимок вместо журнала: после него копия документа не нужна
+                            old_journal = journal_path(self.directory, generation)
+                            generation += 1
+                            self._write_snapshot(document, generation).close()
+                            os.remove(old_journal)
+                        document = None
+                    else:
+                        # reset: новый документ — сразу пишем снимок и начинаем новый журнал
+                        document = argument
+                        discard(self.directory)
+                        if document is not None:
+                            generation += 1
+                            journal = self._write_snapshot(document, generation)
+                            last_snapshot = time.monotonic()
+                    styles = {}
+                    dirty = False
+                elif item is not None and journal is not None:
+                    if item["op"] == "image_data":
+                        item = dict(item, data=base64.b64encode(item["data"]).decode("ascii"))
+                    apply_record(document, item, styles)
+                    journal.write(json.dumps(item, ensure_ascii=False) + "\n")
+                    dirty = True
+
+                now = time.monotonic()
+                if journal is not None and dirty and now - last_flush >= self.flush_interval:
+                    journal.flush()
+                    os.fsync(journal.fileno())
+                    last_flush = now
+                if journal is not None and dirty and now - last_snapshot >= self.snapshot_interval:
+                    # Компактизация: снимок вместо накопленного журнала
+                    journal.close()
+                    old_journal = journal_path(self.directory, generation)
+                    generation += 1
+                    journal = self._write_snapshot(document, generation, styles, document.image_data)
+                    os.remove(old_journal)
+                    last_snapshot = now
+                    dirty = False
+            except Exception as e:
+                self.error = e
+
+    def _write_snapshot(self, document, generation, styles=None, image_data=None):
+        """Пишет снимок поколения generation и открывает для него новый журнал."""
+        os.makedirs(self.directory, exist_ok=True)
+        journal = open(journal_path(self.directory, generation), "w", encoding="utf-8")
+        if styles or image_data:
+            # Номера стилей и уже записанные картинки продолжают действовать — переносим их в новый
+            # журнал (в снимок попадают только картинки, которые сейчас есть в тексте)
+            for style_id, key in (styles or {}).items():
+                record = {"op": "style", "id": style_id, "style": DocumentFormat.style_from_key(key)}
+                journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+            for image_hash, data in (image_data or {}).items():
+                record = {"op": "image_data", "hash": image_hash, "data": base64.b64encode(data).decode("ascii")}
+                journal.write(json.dumps(record) + "\n")
+            journal.flush()
+        snapshot = {"generation": generation, "document": document.to_json()}
+        write_atomically(os.path.join(self.directory, SNAPSHOT_NAME), json.dumps(snapshot, ensure_ascii=False))
+        return journal
@@ -0,0 +1,252 @@
+"""Пакетное преобразование документов без запуска Tk.
+
+Преобразует файлы между форматами редактора: текущим JSON (сжатым или нет),
+старым посимвольным JSON и обычным текстом. Документы читаются и пишутся
+теми же функциями FileTasks, что и при открытии и сохранении в редакторе,
+поэтому результат совпадает с тем, что сохранил бы редактор. Файлы
+распределяются по процессам (ProcessPoolExecutor).
+
+Большие TXT-файлы и старый посимвольный формат пишутся потоково, не
+собирая весь JSON в памяти.
+
+Запуск:
+    python TextEditorCore.py convert ВХОД... --to json.gz -o КАТАЛОГ [-j ПРОЦЕССОВ]
+    python Convert.py ВХОД... --to txt
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import DocumentCodec
+import DocumentFormat
+import FileTasks
+from Document import Document
+from FileLoader import TextChunkReader
+
+# Формат вывода -> расширение файла
+OUTPUT_FORMATS = {
+    "json": ".json",
+    "json.gz": ".json.gz",
+    "json.zst": ".json.zst",
+    "txt": ".txt",
+    "legacy": ".json",
+}
+INPUT_EXTENSIONS = (".json", ".json.gz", ".json.zst", ".txt")
+STREAM_THRESHOLD = 64 * 1024 * 1024  # TXT-файлы от этого размера (байт) пишутся в JSON потоково
+STREAM_CHUNK = 1024 * 1024  # Байт TXT-файла, читаемых и записываемых в JSON за один раз
+LEGACY_BATCH = 4096  # Символов старого формата в одной записи
+
+
+class NullTask:
+    """Заменяет BackgroundTask для функций FileTasks: без прогресса и отмены."""
+
+    def report(self, done, total):
+        pass
+
+    def check(self):
+        pass
+
+
+def strip_extension(file_path):
+    """Имя файла без расширения документа (.json.gz считается одним расширением)."""
+    name = os.path.basename(file_path)
+    for extension in sorted(INPUT_EXTENSIONS, key=len, reverse=True):
+        if name.lower().endswith(extension):
+            return name[:-len(extension)]
+    return os.path.splitext(name)[0]
+
+
+def is_text_file(file_path):
+    return file_path.lower().endswith(".txt")
+
+
+def read_text(file_path):
+    """Текст TXT-файла с теми же переводами строк, что при открытии в редакторе."""
+    reader = TextChunkReader(file_path)
+    try:
+        return "".join(iter(reader.read_chunk, None))
+    finally:
+        reader.close()
+
+
+def read_document(file_path):
+    if is_text_file(file_path):
+        return Document(read_text(file_path))
+    return FileTasks.read_document(file_path, NullTask())
+
+
+def stream_text_to_json(source_path, output_path, compression):
+    """Пишет TXT-файл документом JSON без форматирования, читая и сжимая его блоками."""
+    reader = TextChunkReader(source_path)
+    temp_path = f"{output_path}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            stream = DocumentCodec.open_writer(file, compression)
+            header = {"format": DocumentFormat.FORMAT_NAME, "version": DocumentFormat.FORMAT_VERSION}
+            stream.write(json.dumps(header, ensure_ascii=False, separators=(",", ":"))[:-1].encode("utf-8"))
+            stream.write(b',"text":"')
+            length = 0
+            for text in iter(lambda: reader.read_chunk(STREAM_CHUNK), None):
+                length += len(text)
+                # Экранированная строка JSON без кавычек: блоки склеиваются в одну строку
+                stream.write(json.dumps(text, ensure_ascii=False)[1:-1].encode("utf-8"))
+            styles = [DocumentFormat.DEFAULT_STYLE] if length else []
+            runs = [[0, length, 0]] if length else []
+            tail = json.dumps({"styles": styles, "runs": runs}, ensure_ascii=False, separators=(",", ":"))
+            stream.write(b'",' + tail[1:].encode("utf-8"))
+            if stream is not file:
+                stream.close()
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        reader.close()
+
+
+def write_legacy(document, output_path):
+    """Пишет документ в старом посимвольном формате (список словарей), не собирая список в памяти.
+
+    Как и старый text_to_json, в конце добавляется перевод строки виджета со стилем по умолчанию.
+    """
+    text = document.text()
+    temp_path = f"{output_path}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write("[")
+            batch = []
+            first = True
+            runs = list(document.styles.runs()) + [(len(text), len(text) + 1, DocumentFormat.DEFAULT_STYLE_KEY)]
+            text += "\n"
+            for start, end, key in runs:
+                # Общая часть словаря символов отрезка сериализуется один раз
+                prefix = json.dumps(DocumentFormat.style_from_key(key), ensure_ascii=False)[:-1] + ', "text": '
+                for char in text[start:end]:
+                    batch.append(prefix + json.dumps(char, ensure_ascii=False) + "}")
+                    if len(batch) >= LEGACY_BATCH:
+                        if not first:
+                            file.write(", ")
+                        file.write(", ".join(batch))
+                        batch = []
+                        first = False
+            if batch:
+                if not first:
+                    file.write(", ")
+                file.write(", ".join(batch))
+            file.write("]")
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def convert_file(source_path, output_path, output_format):
+    """Преобразует один файл; возвращает (байт прочитано, байт записано, секунд)."""
+    started = time.perf_counter()
+    compression = DocumentCodec.compression_for_path(output_path)
+    if output_format != "txt" and output_format != "legacy" and is_text_file(source_path) \
+            and os.path.getsize(source_path) >= STREAM_THRESHOLD:
+        stream_text_to_json(source_path, output_path, compression)
+    else:
+        document = read_document(source_path)
+        if output_format == "txt":
+            FileTasks.write_text(output_path, document, NullTask())
+        elif output_format == "legacy":
+            write_legacy(document, output_path)
+        else:
+            FileTasks.write_document(output_path, document, NullTask())
+    return os.path.getsize(source_path), os.path.getsize(output_path), time.perf_counter() - started
+
+
+def collect_inputs(paths):
+    """Файлы документов из списка путей; каталоги обходятся рекурсивно."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                files.extend(os.path.join(directory, name) for name in sorted(names)
+                             if name.lower().endswith(INPUT_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def plan_outputs(files, output, output_format):
+    """Пары (вход, выход); output — каталог или, для одного файла, путь результата."""
+    extension = OUTPUT_FORMATS[output_format]
+    if output and len(files) == 1 and not os.path.isdir(output) and output.lower().endswith(extension):
+        return [(files[0], output)]
+    if output:
+        os.makedirs(output, exist_ok=True)
+    pairs = []
+    for source_path in files:
+        directory = output or os.path.dirname(source_path)
+        output_path = os.path.join(directory, strip_extension(source_path) + extension)
+        if os.path.abspath(output_path) == os.path.abspath(source_path):
+            output_path = os.path.join(directory, strip_extension(source_path) + ".converted" + extension)
+        pairs.append((source_path, output_path))
+    return pairs
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="convert", description="Пакетное преобразование документов редактора")
+    parser.add_argument("inputs", nargs="+", help="файлы .json, .json.gz, .json.zst, .txt или каталоги")
+    parser.add_argument("--to", dest="output_format", choices=tuple(OUTPUT_FORMATS), default="json",
+                        help="формат результата (legacy — старый посимвольный JSON)")
+    parser.add_argument("-o", "--output", help="каталог результатов (по умолчанию — рядом с исходными)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="число процессов")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pairs = plan_outputs(collect_inputs(args.inputs), args.output, args.output_format)
+    if not pairs:
+        print("[ERROR] Нет файлов для преобразования")
+        return 1
+
+    started = time.perf_counter()
+    total_in = total_out = 0
+    failed = 0
+
+    def report(source_path, output_path, result):
+        nonlocal total_in, total_out
+        bytes_in, bytes_out, seconds = result
+        total_in += bytes_in
+        total_out += bytes_out
+        print(f"{source_path} -> {output_path}: {bytes_in / 1024 / 1024:.1f} МБ за {seconds:.2f} с")
+
+    jobs = max(1, min(args.jobs, len(pairs)))
+    if jobs == 1:
+        for source_path, output_path in pairs:
+            try:
+                report(source_path, output_path, convert_file(source_path, output_path, args.output_format))
+            except Exception as e:
+                failed += 1
+                print(f"[ERROR] {source_path}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(convert_file, source_path, output_path, args.output_format):
+                       (source_path, output_path) for source_path, output_path in pairs}
+            for future in as_completed(futures):
+                source_path, output_path = futures[future]
+                try:
+                    report(source_path, output_path, future.result())
+                except Exception as e:
+                    failed += 1
+                    print(f"[ERROR] {source_path}: {e}")
+
+    elapsed = time.perf_counter() - started
+    converted = len(pairs) - failed
+    print(f"Преобразовано файлов: {converted} из {len(pairs)} за {elapsed:.2f} с "
+          f"({converted / elapsed:.1f} файлов/с, {total_in / 1024 / 1024 / elapsed:.1f} МБ/с), процессов: {jobs}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""Модель документа без привязки к текстовому виджету.
+
+Document хранит текст в таблице фрагментов (piece table), стили — отрезками,
+покрывающими весь текст, а также позицию курсора и выделение. Правки
+выполняются методами insert, delete и set_style; текстовый виджет лишь
+отображает документ. Сохранение, поиск, статистика и история работают с
+документом напрямую, без обращений к Tcl, и проверяются без дисплея.
+
+Смещения считаются в символах документа; встроенная картинка занимает
+один символ OBJECT_REPLACEMENT, как и одну позицию в виджете. Индекс строк
+(lines) переводит смещения в позиции "строка.столбец" виджета и обратно;
+он строится при первом обращении и дальше обновляется правками. Какая
+картинка стоит на месте символа, хранят отрезки images с ключами
+(хеш, ширина, высота), а содержимое файлов картинок — image_data по хешу.
+"""
+import base64
+from bisect import bisect_right
+
+import DocumentFormat
+from LineIndex import LineIndex
+
+OBJECT_REPLACEMENT = DocumentFormat.IMAGE_CHAR
+ADD_CHUNK_SIZE = 4096  # Набор подряд дописывается в один фрагмент до этого размера
+COMPACT_PIECES = 4096  # При таком числе фрагментов таблица пересобирается
+COMPACT_BLOCK_SIZE = 64 * 1024
+
+
+class PieceTable:
+    """Текст как последовательность фрагментов (строка, начало, конец).
+
+    Исходный текст не копируется: фрагменты ссылаются на его участки.
+    Вставленный текст дописывается в небольшие добавочные строки, поэтому
+    набор подряд продлевает последний фрагмент, а не создаёт новый.
+    """
+
+    def __init__(self, text=""):
+        self._pieces = []
+        self._starts = []  # Смещение начала каждого фрагмента в тексте
+        self._length = 0
+        self._add = None  # Добавочная строка, которую ещё можно продлевать
+        self._text = None  # Кэш всего текста до следующей правки
+        if text:
+            self._pieces.append((text, 0, len(text)))
+            self._starts.append(0)
+            self._length = len(text)
+            self._text = text
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def piece_count(self):
+        return len(self._pieces)
+
+    def _locate(self, offset):
+        """Номер фрагмента, содержащего offset, и смещение внутри него (len(_pieces), 0 — конец текста)."""
+        i = bisect_right(self._starts, offset) - 1
+        if i < 0:
+            return 0, 0
+        source, start, end = self._pieces[i]
+        inner = offset - self._starts[i]
+        if inner < end - start:
+            return i, inner
+        return i + 1, 0
+
+    def _split(self, offset):
+        """Разрезает фрагмент в позиции offset; возвращает номер фрагмента, начинающегося в ней."""
+        i, inner = self._locate(offset)
+        if inner:
+            source, start, end = self._pieces[i]
+            self._pieces[i:i + 1] = [(source, start, start + inner), (source, start + inner, end)]
+            self._starts.insert(i + 1, offset)
+            return i + 1
+        return i
+
+    def _shift(self, index, delta):
+        if index < len(self._starts):
+            self._starts[index:] = [start + delta for start in self._starts[index:]]
+
+    def insert(self, offset, text):
+        if not text:
+            return
+        offset = max(0, min(offset, self._length))
+        self._text = None
+        i, inner = self._locate(offset)
+
+        if not inner and i > 0:
+            source, start, end = self._pieces[i - 1]
+            if source is self._add and end == len(source) and end + len(text) <= ADD_CHUNK_SIZE:
+                # Продолжение набора: продлеваем последний добавленный фрагмент
+                self._add = source + text
+                self._pieces[i - 1] = (self._add, start, end + len(text))
+                self._shift(i, len(text))
+                self._length += len(text)
+                return
+
+        self._add = text if len(text) < ADD_CHUNK_SIZE else None
+        i = self._split(offset)
+        self._pieces.insert(i, (text, 0, len(text)))
+        self._starts.insert(i, offset)
+        self._shift(i + 1, len(text))
+        self._length += len(text)
+        if len(self._pieces) > COMPACT_PIECES:
+            self.compact()
+
+    def delete(self, offset, length):
+        """Удаляет length символов с позиции offset и возвращает удалённый текст."""
+        offset = max(0, offset)
+        end = min(offset + length, self._length)
+        if offset >= end:
+            return ""
+        removed = self.text(offset, end)
+        first = self._split(offset)
+        last = self._split(end)
+        del self._pieces[first:last]
+        del self._starts[first:last]
+        self._shift(first, offset - end)
+        self._length -= end - offset
+        self._text = None
+        self._add = None
+        return removed
+
+    def text(self, start=0, end=None):
+        """Текст участка [start, end); весь текст кэшируется до следующей правки."""
+        end = self._length if end is None else min(end, self._length)
+        start = max(0, start)
+        if start >= end:
+            return ""
+        whole = start == 0 and end == self._length
+        if whole and self._text is not None:
+            return self._text
+
+        parts = []
+        i, inner = self._locate(start)
+        position = start
+        while position < end:
+            source, piece_start, piece_end = self._pieces[i]
+            first = piece_start + inner
+            last = min(piece_end, first + end - position)
+            parts.append(source[first:last])
+            position += last - first
+            i += 1
+            inner = 0
+        text = "".join(parts)
+        if whole:
+            self._text = text
+        return text
+
+    def copy(self):
+        """Копия таблицы за O(число фрагментов): строки фрагментов неизменяемы и остаются общими."""
+        table = PieceTable()
+        table._pieces = list(self._pieces)
+        table._starts = list(self._starts)
+        table._length = self._length
+        table._text = self._text
+        return table
+
+    def compact(self):
+        """Собирает текст в одну строку и делит её на крупные фрагменты."""
+        text = self.text()
+        self._pieces = [(text, start, min(start + COMPACT_BLOCK_SIZE, len(text)))
+                        for start in range(0, len(text), COMPACT_BLOCK_SIZE)]
+        self._starts = list(range(0, len(text), COMPACT_BLOCK_SIZE))
+        self._add = None
+
+
+class StyleRuns:
+    """Отрезки стилей, покрывающие весь текст: i-й отрезок начинается в starts[i] и имеет ключ keys[i].
+
+    Соседние отрезки всегда имеют разные ключи. Участки без явного ключа имеют ключ default.
+    """
+
+    def __init__(self, length=0, default=DocumentFormat.DEFAULT_STYLE_KEY):
+        self.default = default
+        self.starts = [0] if length else []
+        self.keys = [default] if length else []
+        self.length = length
+
+    @classmethod
+    def from_runs(cls, length, runs, default=DocumentFormat.DEFAULT_STYLE_KEY):
+        """Строит отрезки по списку (начало, конец, ключ); промежутки получают ключ default."""
+        style_runs = cls(default=default)
+        style_runs.length = length
+        position = 0
+        for start, end, key in runs:
+            if start > position:
+                style_runs._append(position, default)
+            if end > start:
+                style_runs._append(start, key)
+                position = end
+        if position < length:
+            style_runs._append(position, default)
+        return style_runs
+
+    def copy(self):
+        style_runs = StyleRuns(default=self.default)
+        style_runs.starts = list(self.starts)
+        style_runs.keys = list(self.keys)
+        style_runs.length = self.length
+        return style_runs
+
+    def _append(self, start, key):
+        if not self.keys or self.keys[-1] != key:
+            self.starts.append(start)
+            self.keys.append(key)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _run_at(self, offset):
+        return bisect_right(self.starts, offset) - 1
+
+    def _split(self, offset):
+        """Разрезает отрезок в позиции offset; возвращает номер отрезка, начинающегося в ней."""
+        if offset >= self.length:
+            return len(self.starts)
+        i = self._run_at(offset)
+        if self.starts[i] == offset:
+            return i
+        self.starts.insert(i + 1, offset)
+        self.keys.insert(i + 1, self.keys[i])
+        return i + 1
+
+    def _shift(self, index, delta):
+        if index < len(self.starts):
+            self.starts[index:] = [start + delta for start in self.starts[index:]]
+
+    def _merge(self, index):
+        """Сливает отрезок index с соседями, если у них тот же ключ."""
+        for i in (index + 1, index):
+            if 0 < i < len(self.starts) and self.keys[i] == self.keys[i - 1]:
+                del self.starts[i]
+                del self.keys[i]
+
+    def key_at(self, offset):
+        """Ключ символа в позиции offset (default вне текста)."""
+        if not self.starts or offset < 0 or offset >= self.length:
+            return self.default
+        return self.keys[self._run_at(offset)]
+
+    def insert(self, offset, length, key):
+        if length <= 0:
+            return
+        if offset > 0 and self.key_at(offset - 1) == key:
+            # Вставка продолжает отрезок слева — сдвигаются только следующие
+            self._shift(self._run_at(offset - 1) + 1, length)
+            self.length += length
+            return
+        i = self._split(offset)
+        self._shift(i, length)
+        self.starts.insert(i, offset)
+        self.keys.insert(i, key)
+        self.length += length
+        self._merge(i)
+
+    def delete(self, offset, length):
+        end = min(offset + length, self.length)
+        if offset >= end:
+            return
+        first = self._split(offset)
+        last = self._split(end)
+        del self.starts[first:last]
+        del self.keys[first:last]
+        self._shift(first, offset - end)
+        self.length -= end - offset
+        self._merge(first)
+
+    def set_style(self, start, end, key):
+        end = min(end, self.length)
+        if start >= end:
+            return
+        first = self._split(start)
+        last = self._split(end)
+        self.starts[first:last] = [start]
+        self.keys[first:last] = [key]
+        self._merge(first)
+
+    def runs(self, start=0, end=None):
+        """Отрезки (начало, конец, ключ), пересекающиеся с участком [start, end)."""
+        end = self.length if end is None else min(end, self.length)
+        if start >= end:
+            return
+        i = max(0, self._run_at(start))
+        while i < len(self.starts) and self.starts[i] < end:
+            run_end = self.starts[i + 1] if i + 1 < len(self.starts) else self.length
+            yield max(self.starts[i], start), min(run_end, end), self.keys[i]
+            i += 1
+
+
+class Document:
+    """Текст, стили, картинки, курсор и выделение документа."""
+
+    def __init__(self, text=""):
+        self.buffer = PieceTable(text)
+        self.styles = StyleRuns(len(text))
+        self.images = StyleRuns(len(text), default=None)  # Ключ (хеш, ширина, высота) или None
+        self.image_data = {}  # Хеш -> содержимое файла картинки
+        self.cursor = 0
+        self.selection = None  # (начало, конец) или None
+        self.version = 0  # Увеличивается при каждой правке
+        self._lines = None  # Индекс строк, пока к нему не обращались
+
+    @classmethod
+    def from_json(cls, json_data):
+        """Создаёт документ из JSON (формат версий 2–3 или старый посимвольный)."""
+        data = DocumentFormat.load_document(json_data)
+        document = cls(data["text"])
+        keys = [DocumentFormat.style_key(style) for style in data["styles"]]
+        document.styles = StyleRuns.from_runs(len(document), (
+            (start, end, keys[style_id]) for start, end, style_id in data["runs"]))
+
+        if data.get("images"):
+            refs = [(image["hash"], image["width"], image["height"]) for image in data["images"]]
+            document.images = StyleRuns.from_runs(len(document), (
+                (start, end, refs[image_id]) for start, end, image_id in data["image_runs"]), default=None)
+            document.image_data = {image_hash: base64.b64decode(encoded)
+                                   for image_hash, encoded in data["image_data"].items()}
+        return document
+
+    def to_json(self):
+        """Документ формата версии 3: текст, таблица стилей, отрезки стилей и картинки."""
+        builder = DocumentFormat.RunBuilder()
+        for start, end, key in self.styles.runs():
+            builder.add(start, end, DocumentFormat.style_from_key(key))
+
+        images, image_runs, image_ids = [], [], {}
+        for start, end, ref in self.images.runs():
+            if ref is None:
+                continue
+            image_id = image_ids.get(ref)
+            if image_id is None:
+                image_id = image_ids[ref] = len(images)
+                images.append({"hash": ref[0], "width": ref[1], "height": ref[2]})
+            image_runs.append([start, end, image_id])
+        # Содержимое каждой картинки сохраняется один раз, сколько бы раз она ни встречалась
+        image_data = {image["hash"]: base64.b64encode(self.image_data[image["hash"]]).decode("ascii")
+                      for image in images}
+        return DocumentFormat.make_document(
+            self.text(), builder.table.styles, builder.runs, images, image_runs, image_data)
+
+    def snapshot(self):
+        """Копия документа для фоновой записи: строки текста общие (они неизменяемы), списки копируются.
+
+        Текст не склеивается — копируется только таблица фрагментов, поэтому снимок
+        дёшев и в потоке интерфейса.
+        """
+        copy = Document()
+        copy.buffer = self.buffer.copy()
+        copy.styles = self.styles.copy()
+        copy.images = self.images.copy()
+        copy.image_data = dict(self.image_data)
+        return copy
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def lines(self):
+        """Индекс строк: смещение <-> позиция (строка, столбец) за O(log n)."""
+        if self._lines is None:
+            self._lines = LineIndex(self.text())
+        return self._lines
+
+    def text(self, start=0, end=None):
+        return self.buffer.text(start, end)
+
+    def style_at(self, offset):
+        return self.styles.key_at(offset)
+
+    def image_at(self, offset):
+        """Ключ картинки (хеш, ширина, высота) в позиции offset или None."""
+        return self.images.key_at(offset)
+
+    def insert(self, offset, text, key=DocumentFormat.DEFAULT_STYLE_KEY):
+        """Вставляет text в позицию offset со стилем key."""
+        if not text:
+            return
+        offset = max(0, min(offset, len(self)))
+        self.buffer.insert(offset, text)
+        if self._lines is not None:
+            self._lines.insert(offset, text)
+        self.styles.insert(offset, len(text), key)
+        self.images.insert(offset, len(text), None)
+        if self.cursor >= offset:
+            self.cursor += len(text)
+        self.selection = None
+        self.version += 1
+
+    def delete(self, offset, length):
+        """Удаляет length символов с позиции offset и возвращает удалённый текст."""
+        removed = self.buffer.delete(offset, length)
+        if removed:
+            if self._lines is not None:
+                self._lines.delete(max(0, offset), len(removed))
+            self.styles.delete(offset, len(removed))
+            self.images.delete(offset, len(removed))
+            if self.cursor > offset:
+                self.cursor = max(offset, self.cursor - len(removed))
+            self.selection = None
+            self.version += 1
+        return removed
+
+    def set_style(self, start, end, key):
+        """Назначает участку [start, end) стиль key."""
+        self.styles.set_style(max(0, start), end, key)
+        self.version += 1
+
+    def set_image(self, start, end, ref):
+        """Назначает символам [start, end) картинку ref (None — убирает картинку)."""
+        self.images.set_style(max(0, start), end, ref)
+        self.version += 1
+
+    def add_image_data(self, image_hash, data):
+        self.image_data.setdefault(image_hash, data)
+
+    def set_cursor(self, offset):
+        self.cursor = max(0, min(offset, len(self)))
+
+    def set_selection(self, start, end):
+        """Задаёт выделение [start, end); пустой участок снимает выделение."""
+        start, end = max(0, start), min(end, len(self))
+        self.selection = (start, end) if start < end else None
+
+    def selected_text(self):
+        return self.text(*self.selection) if self.selection else ""
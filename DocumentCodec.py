@@ -0,0 +1,130 @@
+"""Кодирование документа в байты файла и обратно.
+
+JSON кодируется библиотекой orjson или ujson, если она установлена, иначе
+стандартным модулем json; вывод всегда компактный, без отступов. Файл может
+быть сжат gzip (.json.gz) или zstd (.json.zst, нужен пакет zstandard).
+При чтении сжатие определяется по первым байтам файла, а не по расширению.
+"""
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Расширения сжатых документов и соответствующее сжатие
+COMPRESSED_EXTENSIONS = {".gz": "gzip", ".zst": "zstd"}
+
+
+def _json_dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _ujson_dumps(data):
+    return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")
+
+
+# Имя -> (кодирование в bytes, разбор из bytes); порядок — по убыванию предпочтения
+BACKENDS = {}
+if orjson is not None:
+    BACKENDS["orjson"] = (orjson.dumps, orjson.loads)
+if ujson is not None:
+    BACKENDS["ujson"] = (_ujson_dumps, ujson.loads)
+BACKENDS["json"] = (_json_dumps, json.loads)
+
+COMPRESSIONS = ("gzip", "zstd") if zstandard is not None else ("gzip",)
+
+
+def default_backend():
+    return next(iter(BACKENDS))
+
+
+def compression_for_path(file_path):
+    """Сжатие, которое подразумевает расширение файла (None — обычный JSON)."""
+    for extension, compression in COMPRESSED_EXTENSIONS.items():
+        if file_path.lower().endswith(extension):
+            return compression
+    return None
+
+
+def detect_compression(data):
+    """Сжатие по первым байтам файла (None — несжатые данные)."""
+    if data.startswith(GZIP_MAGIC):
+        return "gzip"
+    if data.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def compress(data, compression):
+    if compression is None:
+        return data
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("Для сжатия zstd нужен пакет zstandard")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Неизвестное сжатие: {compression}")
+
+
+def decompress(data):
+    """Распаковывает данные, если они сжаты gzip или zstd."""
+    compression = detect_compression(data)
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("Файл сжат zstd — для чтения нужен пакет zstandard")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def open_writer(file, compression):
+    """Поток записи поверх двоичного файла file со сжатием compression (None — без сжатия).
+
+    Поток нужно закрыть: только после этого сжатые данные дописаны в file целиком.
+    """
+    if compression is None:
+        return file
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=file, mode="wb", compresslevel=GZIP_LEVEL)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("Для сжатия zstd нужен пакет zstandard")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(file, closefd=False)
+    raise ValueError(f"Неизвестное сжатие: {compression}")
+
+
+def encode(data, compression=None, backend=None):
+    """Кодирует JSON-совместимые данные в байты файла."""
+    dumps = BACKENDS[backend or default_backend()][0]
+    return compress(dumps(data), compression)
+
+
+def decode(data, backend=None):
+    """Разбирает байты файла (сжатые или нет) в JSON-совместимые данные."""
+    loads = BACKENDS[backend or default_backend()][1]
+    return loads(decompress(data))
+
+
+def is_compressed_file(file_path):
+    """Сжат ли файл gzip или zstd (по первым байтам)."""
+    with open(file_path, "rb") as file:
+        return detect_compression(file.read(len(ZSTD_MAGIC))) is not None
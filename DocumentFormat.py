@@ -0,0 +1,149 @@
+"""Формат документа текстового редактора.
+
+Версия 2 хранит текст одной строкой, таблицу уникальных стилей и список
+отрезков [start, end, style_id] со смещениями в символах текста. Файлы
+старого формата (список словарей на каждый символ) читаются через
+legacy_to_document().
+
+Версия 3 добавляет встроенные картинки. Картинка занимает в тексте один
+символ IMAGE_CHAR; "images" — таблица картинок {hash, width, height},
+"image_runs" — отрезки [start, end, image_id], а "image_data" хранит
+содержимое файла каждой картинки (base64) один раз на хеш, сколько бы раз
+и в каком бы размере она ни встречалась. Документ без картинок этих
+ключей не содержит.
+"""
+
+FORMAT_NAME = "texteditor-document"
+FORMAT_VERSION = 3
+
+IMAGE_CHAR = "\ufffc"  # Символ на месте встроенной картинки
+
+# Стиль символа без форматирования (совпадает со шрифтом текстового виджета)
+DEFAULT_STYLE = {
+    "font": "Arial",
+    "size": 12,
+    "bold": False,
+    "italic": False,
+    "underline": False,
+    "color": "#000000",
+}
+STYLE_KEYS = tuple(DEFAULT_STYLE)
+
+
+def style_key(style):
+    """Возвращает хешируемый ключ стиля (кортеж значений в порядке STYLE_KEYS)."""
+    return tuple(style.get(key, DEFAULT_STYLE[key]) for key in STYLE_KEYS)
+
+
+def style_from_key(key):
+    """Восстанавливает словарь стиля из ключа."""
+    return dict(zip(STYLE_KEYS, key))
+
+
+DEFAULT_STYLE_KEY = style_key(DEFAULT_STYLE)
+
+
+class StyleTable:
+    """Таблица уникальных стилей: каждому стилю соответствует один номер."""
+
+    def __init__(self):
+        self.styles = []
+        self._ids = {}
+
+    def intern(self, style):
+        """Возвращает номер стиля, добавляя его в таблицу при первом обращении."""
+        key = style_key(style)
+        style_id = self._ids.get(key)
+        if style_id is None:
+            style_id = len(self.styles)
+            self._ids[key] = style_id
+            self.styles.append(style_from_key(key))
+        return style_id
+
+
+class RunBuilder:
+    """Собирает отрезки стилей, склеивая соседние отрезки с одинаковым стилем."""
+
+    def __init__(self, table=None):
+        self.table = table or StyleTable()
+        self.runs = []
+
+    def add(self, start, end, style):
+        if end <= start:
+            return
+        style_id = self.table.intern(style)
+        if self.runs and self.runs[-1][2] == style_id and self.runs[-1][1] == start:
+            self.runs[-1][1] = end
+        else:
+            self.runs.append([start, end, style_id])
+
+
+def make_document(text, styles, runs, images=(), image_runs=(), image_data=None):
+    """Собирает словарь документа; ключи картинок добавляются, только если картинки есть."""
+    document = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "text": text,
+        "styles": styles,
+        "runs": runs,
+    }
+    if images:
+        document["images"] = list(images)
+        document["image_runs"] = list(image_runs)
+        document["image_data"] = dict(image_data or {})
+    return document
+
+
+def is_legacy(json_data):
+    """Старый формат — это список словарей с описанием каждого символа."""
+    return isinstance(json_data, list)
+
+
+def legacy_to_document(chars):
+    """Конвертирует посимвольный JSON старого формата в документ версии 2."""
+    # Старый text_to_json сохранял и завершающий перевод строки виджета
+    if chars and chars[-1].get("text") == "\n":
+        chars = chars[:-1]
+
+    builder = RunBuilder()
+    parts = []
+    offset = 0
+    for char_data in chars:
+        text = char_data.get("text", "")
+        parts.append(text)
+        builder.add(offset, offset + len(text), char_data)
+        offset += len(text)
+
+    return make_document("".join(parts), builder.table.styles, builder.runs)
+
+
+def load_document(json_data):
+    """Возвращает документ версии 2, при необходимости конвертируя старый формат."""
+    if is_legacy(json_data):
+        return legacy_to_document(json_data)
+
+    if not isinstance(json_data, dict) or json_data.get("format") != FORMAT_NAME:
+        raise ValueError("Неизвестный формат документа")
+    if json_data.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"Версия документа {json_data['version']} не поддерживается")
+
+    styles = [style_from_key(style_key(style)) for style in json_data.get("styles", [])]
+    text = json_data.get("text", "")
+    runs = []
+    for start, end, style_id in json_data.get("runs", []):
+        if not 0 <= start < end <= len(text) or not 0 <= style_id < len(styles):
+            raise ValueError(f"Некорректный отрезок стиля: {[start, end, style_id]}")
+        runs.append([start, end, style_id])
+
+    images = [{"hash": str(image["hash"]), "width": int(image["width"]), "height": int(image["height"])}
+              for image in json_data.get("images", [])]
+    image_data = json_data.get("image_data", {})
+    image_runs = []
+    for start, end, image_id in json_data.get("image_runs", []):
+        if not 0 <= start < end <= len(text) or not 0 <= image_id < len(images):
+            raise ValueError(f"Некорректный отрезок картинки: {[start, end, image_id]}")
+        if images[image_id]["hash"] not in image_data:
+            raise ValueError(f"Нет данных картинки {images[image_id]['hash']}")
+        image_runs.append([start, end, image_id])
+
+    return make_document(text, styles, runs, images, image_runs, image_data)
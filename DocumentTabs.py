@@ -0,0 +1,120 @@
+"""Вкладки документов и бюджет памяти неактивных вкладок.
+
+Все вкладки показываются в одном текстовом виджете: при переключении
+виджет заполняется документом вкладки, поэтому реестр стилей, кэш
+картинок и список шрифтов общие. Вкладка хранит модель документа,
+историю правок и положение курсора и прокрутки.
+
+Когда вкладки вместе занимают больше бюджета памяти, давно не
+использованные неактивные вкладки усыпляются: документ сжимается в JSON
+(gzip) и модель освобождается. Спящая вкладка разворачивается обратно,
+когда её снова выбирают.
+"""
+import time
+
+import DocumentCodec
+from Document import Document
+from UndoHistory import UndoHistory
+
+MEMORY_BUDGET = 128 * 1024 * 1024  # Байт на все вкладки вместе
+RUN_OVERHEAD = 64  # Примерный размер одного отрезка стиля или картинки, байт
+PIECE_OVERHEAD = 96  # Примерный размер одного куска таблицы кусков, байт
+CHAR_BYTES = 2  # Примерный размер символа текста: латиница занимает 1 байт, кириллица — 2
+UNTITLED = "Без имени"
+
+
+def pack_document(document):
+    """Сжатое представление документа спящей вкладки."""
+    return DocumentCodec.encode(document.to_json(), "gzip")
+
+
+def unpack_document(data):
+    return Document.from_json(DocumentCodec.decode(data))
+
+
+def document_size(document):
+    """Примерный объём памяти модели документа, байт.
+
+    Текст оценивается по длине таблицы фрагментов: собирать его в одну строку ради оценки дорого.
+    """
+    runs = len(document.styles.starts) + len(document.images.starts)
+    return (
+        CHAR_BYTES * len(document)
+        + RUN_OVERHEAD * runs
+        + PIECE_OVERHEAD * document.buffer.piece_count
+        + sum(len(data) for data in document.image_data.values())
+    )
+
+
+class DocumentTab:
+    """Документ одной вкладки и её состояние вне виджета."""
+
+    def __init__(self, title=UNTITLED, document=None, history=None, history_limit=32 * 1024 * 1024):
+        self.title = title
+        self.document = document if document is not None else Document()
+        self.packed = None  # Сжатый документ спящей вкладки
+        self.packing = False  # Идёт фоновое сжатие
+        self.history = history if history is not None else UndoHistory(max_bytes=history_limit)
+        self.cursor = 0
+        self.yview = 0.0
+        self.lexer = None  # Имя лексера подсветки (None — без подсветки)
+        self.shared = False  # Документ совместной правки: к нему приходят чужие правки, вкладка не усыпляется
+        self.autosave = None  # Журнал автосохранения вкладки (Autosave), если автосохранение включено
+        self.journaled = None  # Документ, с которого начат журнал; другой документ — журнал начинается заново
+        self.last_active = time.monotonic()
+
+    @property
+    def hibernated(self):
+        return self.document is None
+
+    def memory_size(self):
+        document_bytes = len(self.packed) if self.hibernated else document_size(self.document)
+        return document_bytes + self.history.memory_bytes
+
+
+class TabManager:
+    """Порядок вкладок, активная вкладка и выбор вкладок для усыпления."""
+
+    def __init__(self, budget=MEMORY_BUDGET):
+        self.budget = budget
+        self.tabs = []
+        self.active = None
+
+    def __len__(self):
+        return len(self.tabs)
+
+    def __iter__(self):
+        return iter(self.tabs)
+
+    def add(self, tab, index=None):
+        self.tabs.insert(len(self.tabs) if index is None else index, tab)
+        return tab
+
+    def remove(self, tab):
+        self.tabs.remove(tab)
+        if self.active is tab:
+            self.active = None
+
+    def index(self, tab):
+        return self.tabs.index(tab)
+
+    def activate(self, tab):
+        tab.last_active = time.monotonic()
+        self.active = tab
+
+    def memory_size(self):
+        return sum(tab.memory_size() for tab in self.tabs)
+
+    def hibernation_candidates(self):
+        """Неактивные вкладки, которые нужно усыпить, чтобы уложиться в бюджет (давно открытые первыми)."""
+        total = self.memory_size()
+        candidates = []
+        awake = sorted((tab for tab in self.tabs if tab is not self.active and not tab.hibernated
+                        and not tab.packing and not tab.shared), key=lambda tab: tab.last_active)
+        for tab in awake:
+            if total <= self.budget:
+                break
+            candidates.append(tab)
+            # Сжатый JSON обычно в несколько раз меньше модели — считаем, что память освободится
+            total -= document_size(tab.document)
+        return candidates
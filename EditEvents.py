@@ -0,0 +1,136 @@
+"""Диспетчер событий правки с отложенной рассылкой подписчикам.
+
+Перехватчик команд виджета сообщает диспетчеру о каждой вставке и
+удалении, а обработчики клавиш и мыши — о перемещении курсора. Диспетчер
+лишь запоминает изменённые участки и один раз взводит таймер root.after;
+подписчики (строка состояния, подсветка поиска, пересчёт статистики)
+вызываются, когда правки стихли на delay мс, но не реже чем раз в
+max_delay мс при непрерывном наборе. Поэтому стоимость нажатия клавиши не
+зависит от числа подписчиков.
+
+Подписчик получает список изменённых участков (start, end) в смещениях
+текущего документа, объединённых и упорядоченных; удаление оставляет
+участок нулевой длины в точке удаления. Пустой список означает, что
+текст не менялся, а сдвинулся только курсор или выделение.
+"""
+import time
+
+DEBOUNCE_DELAY = 80  # мс тишины перед рассылкой
+MAX_DELAY = 400  # мс, дольше которых рассылка не откладывается
+MAX_RANGES = 64  # Больше участков объединяются в один охватывающий
+
+
+class EditDispatcher:
+    """Накопление изменённых участков и отложенный вызов подписчиков."""
+
+    def __init__(self, root, delay=DEBOUNCE_DELAY, max_delay=MAX_DELAY):
+        self.root = root
+        self.delay = delay
+        self.max_delay = max_delay
+        self._subscribers = []
+        self._ranges = []  # Изменённые участки [start, end] после всех накопленных правок
+        self._pending = False
+        self._first_event = 0.0  # Время первого события в текущей пачке
+        self._last_event = 0.0
+        self._job = None
+
+    def subscribe(self, callback):
+        """Добавляет подписчика callback(ranges)."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    # --- События ---
+
+    def record_insert(self, offset, length):
+        """Вставлено length символов в позицию offset."""
+        if length:
+            for changed in self._ranges:
+                if changed[0] >= offset:
+                    changed[0] += length
+                if changed[1] >= offset:
+                    changed[1] += length
+            self._add_range(offset, offset + length)
+        self._notify()
+
+    def record_delete(self, offset, length):
+        """Удалено length символов начиная с offset."""
+        if length:
+            end = offset + length
+            for changed in self._ranges:
+                for i in (0, 1):
+                    if changed[i] >= end:
+                        changed[i] -= length
+                    elif changed[i] > offset:
+                        changed[i] = offset
+            self._add_range(offset, offset)
+        self._notify()
+
+    def record_cursor(self, event=None):
+        """Сдвинулся курсор или выделение (текст не менялся)."""
+        self._notify()
+
+    def flush(self):
+        """Немедленно рассылает накопленные события, если они есть."""
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        if not self._pending:
+            return
+        ranges = [(start, end) for start, end in self._ranges]
+        self._ranges = []
+        self._pending = False
+        for callback in list(self._subscribers):
+            try:
+                callback(ranges)
+            except Exception as e:
+                print(f"[ERROR] Ошибка обработчика правок: {e}")
+
+    def cancel(self):
+        """Отбрасывает накопленные события (например, когда документ заменён целиком)."""
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        self._ranges = []
+        self._pending = False
+
+    # --- Внутреннее ---
+
+    def _add_range(self, start, end):
+        """Добавляет участок, сливая его с пересекающимися и соседними."""
+        merged = []
+        for changed in self._ranges:
+            if changed[1] < start or changed[0] > end:
+                merged.append(changed)
+            else:
+                start = min(start, changed[0])
+                end = max(end, changed[1])
+        merged.append([start, end])
+        merged.sort()
+        if len(merged) > MAX_RANGES:
+            merged = [[merged[0][0], max(changed[1] for changed in merged)]]
+        self._ranges = merged
+
+    def _notify(self):
+        now = time.monotonic()
+        self._last_event = now
+        if not self._pending:
+            self._pending = True
+            self._first_event = now
+        if self._job is None:
+            # Таймер не переставляется на каждое событие: сработав, он сам
+            # решает, ждать ли ещё, поэтому нажатие клавиши не вызывает after_cancel
+            self._job = self.root.after(self.delay, self._fire)
+
+    def _fire(self):
+        self._job = None
+        now = time.monotonic()
+        quiet = (now - self._last_event) * 1000
+        waited = (now - self._first_event) * 1000
+        if quiet < self.delay and waited < self.max_delay:
+            wait = min(self.delay - quiet, self.max_delay - waited)
+            self._job = self.root.after(max(1, int(wait)), self._fire)
+            return
+        self.flush()
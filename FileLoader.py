@@ -0,0 +1,156 @@
+"""Потоковая загрузка больших текстовых файлов.
+
+Файл читается блоками и декодируется инкрементальным декодером, поэтому
+многобайтовые символы UTF-8 и пары \\r\\n на границе блоков не
+разрываются. ChunkedLoader читает и декодирует блоки в рабочем потоке, а
+вставляет их в виджет через root.after, чтобы интерфейс оставался
+отзывчивым; он сообщает о прогрессе и может быть отменён.
+"""
+import codecs
+import os
+import queue
+import threading
+import time
+
+FIRST_CHUNK_SIZE = 64 * 1024  # Первый экран текста вставляется сразу
+CHUNK_SIZE = 1024 * 1024
+SLICE_BUDGET = 0.03  # Секунд работы за один вызов after
+QUEUE_CHUNKS = 8  # Прочитанных, но ещё не вставленных блоков
+POLL_DELAY = 20  # мс между проверками очереди, когда она пуста
+
+
+class TextChunkReader:
+    """Читает файл блоками и возвращает декодированный текст с переводами строк "\\n"."""
+
+    def __init__(self, file_path, encoding="utf-8"):
+        self.file = open(file_path, "rb")
+        self.total = os.fstat(self.file.fileno()).st_size
+        self.bytes_read = 0
+        self.finished = False
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._pending_cr = False
+
+    def read_chunk(self, size=CHUNK_SIZE):
+        """Возвращает следующий блок текста или None, когда файл прочитан полностью."""
+        while not self.finished:
+            data = self.file.read(size)
+            self.bytes_read += len(data)
+            final = not data
+            text = self._decoder.decode(data, final=final)
+
+            # \r в конце блока может оказаться началом пары \r\n
+            if self._pending_cr:
+                text = "\r" + text
+            self._pending_cr = not final and text.endswith("\r")
+            if self._pending_cr:
+                text = text[:-1]
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+            if final:
+                self.close()
+            if text:
+                return text
+        return None
+
+    def close(self):
+        self.finished = True
+        self.file.close()
+
+
+class ChunkedLoader:
+    """Вставляет содержимое файла частями в промежутках цикла событий Tk.
+
+    on_chunk(text) вставляет блок, on_progress(bytes_read, total) обновляет
+    индикатор, on_done(cancelled) вызывается по завершении или отмене,
+    on_error(exception) — при ошибке чтения.
+    """
+
+    def __init__(self, root, file_path, on_chunk, on_progress, on_done, on_error):
+        self.root = root
+        self.reader = TextChunkReader(file_path)
+        self.on_chunk = on_chunk
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.job = None
+        self.done = False
+        self._chunks = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read, daemon=True)
+
+    def start(self):
+        """Синхронно вставляет первый блок и запускает чтение остального в рабочем потоке."""
+        text = self.reader.read_chunk(FIRST_CHUNK_SIZE)
+        if text is not None:
+            self.on_chunk(text)
+        self.on_progress(self.reader.bytes_read, self.reader.total)
+        if self.reader.finished:
+            self._finish(False)
+            return
+        self._thread.start()
+        self.job = self.root.after(POLL_DELAY, self._load_slice)
+
+    def cancel(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+        self._stop.set()
+        if not self.done:
+            self._finish(True)
+
+    def _finish(self, cancelled):
+        self.done = True
+        self.on_done(cancelled)
+
+    def _read(self):
+        """Рабочий поток: читает блоки в очередь, пока файл не кончится или загрузку не отменят."""
+        try:
+            while not self._stop.is_set():
+                text = self.reader.read_chunk()
+                if text is None:
+                    self._put(("done", None))
+                    return
+                self._put(("chunk", (text, self.reader.bytes_read)))
+        except Exception as e:
+            self._put(("error", e))
+        finally:
+            if not self.reader.finished:
+                self.reader.close()
+
+    def _put(self, item):
+        """Кладёт item в очередь; пока она заполнена, ждёт, но не дольше отмены загрузки."""
+        while not self._stop.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _load_slice(self):
+        """Вставляет прочитанные блоки, пока не истечёт бюджет времени."""
+        self.job = None
+        started = time.perf_counter()
+        bytes_read = None
+        while time.perf_counter() - started < SLICE_BUDGET:
+            try:
+                kind, value = self._chunks.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "chunk":
+                text, bytes_read = value
+                self.on_chunk(text)
+            elif kind == "done":
+                self.on_progress(self.reader.total, self.reader.total)
+                self._finish(False)
+                return
+            else:
+                self._stop.set()
+                self.done = True
+                self.on_error(value)
+                return
+
+        if bytes_read is not None:
+            self.on_progress(bytes_read, self.reader.total)
+            self.job = self.root.after(1, self._load_slice)
+        else:
+            self.job = self.root.after(POLL_DELAY, self._load_slice)
@@ -0,0 +1,170 @@
+"""Фоновые операции с файлами: открытие и сохранение документов.
+
+BackgroundTask выполняет функцию в рабочем потоке, а поток интерфейса
+опрашивает его через root.after и получает прогресс, результат или ошибку.
+Рабочая функция сообщает о прогрессе через task.report и вызывает
+task.check, чтобы прерваться по отмене. Файлы записываются во временный
+файл и переименовываются, поэтому отменённое или неудачное сохранение не
+портит прежнюю версию.
+"""
+import os
+import queue
+import threading
+
+import DocumentCodec
+from Document import Document, OBJECT_REPLACEMENT
+
+POLL_DELAY = 50  # мс между проверками рабочего потока
+BLOCK_SIZE = 1024 * 1024
+
+
+class TaskCancelled(Exception):
+    """Операция прервана пользователем."""
+
+
+class BackgroundTask:
+    """Функция work(task), выполняемая в рабочем потоке, с передачей результата в поток Tk.
+
+    on_done(result) вызывается по завершении, on_error(exception) — при ошибке,
+    on_progress(done, total) — при обновлении прогресса, on_cancel() — после отмены.
+    Все обратные вызовы выполняются в потоке интерфейса.
+    """
+
+    def __init__(self, root, work, on_done, on_error, on_progress=None, on_cancel=None):
+        self.root = root
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.cancelled = False
+        self.job = None
+        self._events = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self.job = self.root.after(POLL_DELAY, self._poll)
+
+    def cancel(self):
+        """Просит рабочую функцию прерваться; on_cancel будет вызван, когда поток завершится."""
+        self.cancelled = True
+
+    # --- Рабочий поток ---
+
+    def report(self, done, total):
+        self._events.put(("progress", (done, total)))
+
+    def check(self):
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def _run(self):
+        try:
+            self._events.put(("done", self.work(self)))
+        except TaskCancelled:
+            self._events.put(("cancelled", None))
+        except Exception as e:
+            self._events.put(("error", e))
+
+    # --- Поток интерфейса ---
+
+    def _poll(self):
+        self.job = None
+        progress = None
+        while True:
+            try:
+                kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                progress = value  # Из накопившихся обновлений важно только последнее
+                continue
+            if kind == "done":
+                self.on_done(value)
+            elif kind == "error":
+                self.on_error(value)
+            elif self.on_cancel is not None:
+                self.on_cancel()
+            return
+
+        if progress is not None and self.on_progress is not None:
+            self.on_progress(*progress)
+        self.job = self.root.after(POLL_DELAY, self._poll)
+
+
+def read_file(file_path, task):
+    """Читает файл блоками, сообщая о прогрессе."""
+    with open(file_path, "rb") as file:
+        total = os.fstat(file.fileno()).st_size
+        blocks = []
+        done = 0
+        while True:
+            task.check()
+            block = file.read(BLOCK_SIZE)
+            if not block:
+                break
+            blocks.append(block)
+            done += len(block)
+            task.report(done, total)
+    return b"".join(blocks)
+
+
+def write_file(file_path, data, task):
+    """Записывает data блоками во временный файл и атомарно заменяет им file_path."""
+    temp_path = f"{file_path}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            for start in range(0, len(data), BLOCK_SIZE):
+                task.check()
+                file.write(data[start:start + BLOCK_SIZE])
+                task.report(min(start + BLOCK_SIZE, len(data)), len(data))
+            file.flush()
+            os.fsync(file.fileno())
+        task.check()
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_document(file_path, task):
+    """Читает и разбирает JSON-документ (сжатый или нет); возвращает Document."""
+    data = read_file(file_path, task)
+    task.check()
+    return Document.from_json(DocumentCodec.decode(data))
+
+
+def write_document(file_path, document, task):
+    """Сохраняет document (снимок, который не меняется во время записи) в JSON; .gz и .zst сжимаются."""
+    data = DocumentCodec.encode(document.to_json(), DocumentCodec.compression_for_path(file_path))
+    write_file(file_path, data, task)
+
+
+def write_text(file_path, document, task):
+    """Сохраняет текст document без форматирования и картинок."""
+    content = document.text().replace(OBJECT_REPLACEMENT, "").strip()
+    write_file(file_path, content.encode("utf-8"), task)
+
+
+def copy_file(source_path, file_path, task):
+    """Копирует файл блоками (сохранение файла, открытого в режиме просмотра)."""
+    temp_path = f"{file_path}.tmp"
+    try:
+        with open(source_path, "rb") as source, open(temp_path, "wb") as target:
+            total = os.fstat(source.fileno()).st_size
+            done = 0
+            while True:
+                task.check()
+                block = source.read(BLOCK_SIZE)
+                if not block:
+                    break
+                target.write(block)
+                done += len(block)
+                task.report(done, total)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,89 @@
+"""Кэш списка установленных шрифтов.
+
+font.families() на системах с большим числом шрифтов выполняется заметное
+время, поэтому список сохраняется на диск вместе с отпечатком каталогов
+шрифтов (пути и время изменения). Пока отпечаток не изменился, список
+берётся из файла; установка или удаление шрифта меняет время изменения
+каталога, и список строится заново.
+"""
+import hashlib
+import json
+import os
+import sys
+
+CACHE_VERSION = 1
+
+
+def default_cache_path():
+    return os.path.join(os.path.expanduser("~"), ".texteditor", "fonts.json")
+
+
+def font_directories():
+    """Каталоги, в которые ставятся шрифты на текущей платформе."""
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        windir = os.environ.get("WINDIR", r"C:\Windows")
+        local = os.environ.get("LOCALAPPDATA", os.path.join(home, "AppData", "Local"))
+        return [os.path.join(windir, "Fonts"), os.path.join(local, "Microsoft", "Windows", "Fonts")]
+    if sys.platform == "darwin":
+        return ["/System/Library/Fonts", "/Library/Fonts", os.path.join(home, "Library", "Fonts")]
+    return [
+        "/usr/share/fonts",
+        "/usr/local/share/fonts",
+        os.path.join(home, ".fonts"),
+        os.path.join(home, ".local", "share", "fonts"),
+    ]
+
+
+def fonts_fingerprint(directories=None):
+    """Отпечаток каталогов шрифтов: меняется при добавлении или удалении файла шрифта."""
+    digest = hashlib.sha1(str(CACHE_VERSION).encode())
+    for directory in directories or font_directories():
+        # Обходятся только каталоги: время изменения каталога меняется, когда в нём
+        # появляется или исчезает файл, поэтому stat каждого шрифта не нужен
+        for path, _, _ in os.walk(directory):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            digest.update(f"{path}\0{mtime}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+def normalize_families(families):
+    """Убирает повторы и служебные шрифты (начинающиеся с "@"), сортирует без учёта регистра."""
+    return sorted({name for name in families if name and not name.startswith("@")}, key=str.casefold)
+
+
+def load_families(fingerprint, cache_path=None):
+    """Список шрифтов из кэша; None, если кэша нет или он устарел."""
+    try:
+        with open(cache_path or default_cache_path(), "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get("fingerprint") != fingerprint:
+        return None
+    families = cache.get("families")
+    if not isinstance(families, list):
+        return None
+    return families
+
+
+def save_families(families, fingerprint, cache_path=None):
+    """Сохраняет список шрифтов; ошибка записи не мешает работе редактора."""
+    cache_path = cache_path or default_cache_path()
+    temp_path = f"{cache_path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"fingerprint": fingerprint, "families": families}, file, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"[ERROR] Не удалось сохранить кэш шрифтов: {e}")
+
+
+def read_cache(cache_path=None):
+    """Отпечаток каталогов шрифтов и список из кэша (None вместо списка, если кэш устарел)."""
+    fingerprint = fonts_fingerprint()
+    return fingerprint, load_families(fingerprint, cache_path)
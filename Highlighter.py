@@ -0,0 +1,365 @@
+"""Инкрементальная подсветка синтаксиса и шаблонов (журналы, конфигурации, Python).
+
+Лексер разбирает текст построчно регулярными выражениями и переносит со
+строки на строку состояние (например, «внутри многострочной строки»).
+Для каждой строки хранится состояние в её начале, поэтому после правки
+заново разбираются только изменённые строки и следующие за ними — пока
+состояние в конце строки не совпадёт с прежним.
+
+Сначала подсвечивается видимая область, остальной текст — порциями по
+SLICE_BUDGET секунд в паузах цикла событий. Каждому виду лексемы
+соответствует один тег виджета ("hl_keyword", "hl_string", ...), так что
+число тегов не зависит от размера текста. Теги ставятся в обход перехвата
+правок: в документ, историю и журнал автосохранения подсветка не попадает.
+
+Теги подсветки ниже тегов форматирования: цвет, заданный пользователем,
+важнее цвета лексемы. Текст берётся командой get виджета, которая
+пропускает встроенные картинки, — в строке с картинкой лексемы после неё
+сдвинуты на позицию.
+"""
+import os
+import re
+import time
+
+TAG_PREFIX = "hl_"
+SLICE_BUDGET = 0.008  # Секунд работы за одну порцию
+SLICE_DELAY = 5  # мс между порциями фоновой подсветки
+BLOCK_LINES = 200  # Строк, которые читаются из виджета одним вызовом get
+GUESS_LINES = 20  # Непустых строк, по которым угадывается лексер текстового файла
+
+# Вид лексемы -> настройки тега
+TOKEN_STYLES = {
+    "keyword": {"foreground": "#0033b3"},
+    "string": {"foreground": "#067d17"},
+    "comment": {"foreground": "#8c8c8c"},
+    "number": {"foreground": "#1750eb"},
+    "literal": {"foreground": "#871094"},
+    "section": {"foreground": "#9e5000"},
+    "key": {"foreground": "#174ad4"},
+    "timestamp": {"foreground": "#00627a"},
+    "error": {"foreground": "#d00000"},
+    "warning": {"foreground": "#c77700"},
+    "info": {"foreground": "#1e7b1e"},
+    "debug": {"foreground": "#8c8c8c"},
+}
+
+
+class RegexLexer:
+    """Лексер на регулярных выражениях с состояниями.
+
+    rules: {состояние: [(шаблон, вид лексемы или None, новое состояние или None), ...]}.
+    В каждом состоянии шаблоны объединяются в одно выражение; из совпадающих
+    в одной позиции выигрывает первый по списку.
+    """
+
+    def __init__(self, name, title, rules, initial="root"):
+        self.name = name
+        self.title = title
+        self.initial = initial
+        self._patterns = {}
+        self._actions = {}
+        for state, state_rules in rules.items():
+            self._patterns[state] = re.compile("|".join(
+                f"(?P<r{i}>{pattern})" for i, (pattern, _, _) in enumerate(state_rules)))
+            self._actions[state] = [(token, next_state) for _, token, next_state in state_rules]
+
+    def tokenize(self, line, state):
+        """Возвращает лексемы строки [(начало, конец, вид), ...] и состояние в конце строки."""
+        tokens = []
+        position = 0
+        length = len(line)
+        while position < length:
+            match = self._patterns[state].search(line, position)
+            if match is None:
+                break
+            token, next_state = self._actions[state][int(match.lastgroup[1:])]
+            start, end = match.span()
+            if token is not None and end > start:
+                tokens.append((start, end, token))
+            if next_state is not None:
+                state = next_state
+            position = end if end > start else end + 1
+        return tokens, state
+
+
+NUMBER = r"\b-?\d+(?:\.\d+)?\b"
+DOUBLE_QUOTED = r'"(?:[^"\\]|\\.)*"'
+SINGLE_QUOTED = r"'(?:[^'\\]|\\.)*'"
+
+LOG_LEXER = RegexLexer("log", "Журнал", {
+    "root": [
+        (r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?", "timestamp", None),
+        (r"\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b", "timestamp", None),
+        (r"\b(?:FATAL|CRITICAL|SEVERE|ERROR|ERR|EXCEPTION|Traceback)\b", "error", None),
+        (r"\b(?:WARNING|WARN)\b", "warning", None),
+        (r"\b(?:INFO|NOTICE)\b", "info", None),
+        (r"\b(?:DEBUG|TRACE)\b", "debug", None),
+        (r"\bhttps?://\S+", "literal", None),
+        (r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b", "literal", None),
+        (r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b", "literal", None),
+        (DOUBLE_QUOTED, "string", None),
+        (NUMBER, "number", None),
+    ],
+})
+
+CONFIG_LEXER = RegexLexer("config", "Конфигурация", {
+    "root": [
+        (r"^\s*[#;].*|(?<=\s)#.*", "comment", None),
+        (r"^\s*\[\[?[^\]]*\]\]?", "section", None),
+        (r"^\s*[\w.\-]+(?=\s*[=:])", "key", None),
+        (r'"""', "string", "string3"),
+        (DOUBLE_QUOTED + "|" + SINGLE_QUOTED, "string", None),
+        (r"(?i:\b(?:true|false|yes|no|on|off|null|none)\b)", "literal", None),
+        (NUMBER, "number", None),
+    ],
+    "string3": [
+        (r'.*?"""', "string", "root"),
+        (r".+", "string", None),
+    ],
+})
+
+PYTHON_KEYWORDS = (
+    "False None True and as assert async await break class continue def del elif else except finally for "
+    "from global if import in is lambda nonlocal not or pass raise return try while with yield"
+).split()
+
+PYTHON_LEXER = RegexLexer("python", "Python", {
+    "root": [
+        (r"#.*", "comment", None),
+        (r'\b[rbuRBU]{0,2}"""', "string", "double3"),
+        (r"\b[rbuRBU]{0,2}'''", "string", "single3"),
+        (r'"""', "string", "double3"),
+        (r"'''", "string", "single3"),
+        (DOUBLE_QUOTED + "|" + SINGLE_QUOTED, "string", None),
+        (r"\b(?:" + "|".join(PYTHON_KEYWORDS) + r")\b", "keyword", None),
+        (r"@[\w.]+", "literal", None),
+        (NUMBER, "number", None),
+    ],
+    "double3": [
+        (r'.*?"""', "string", "root"),
+        (r".+", "string", None),
+    ],
+    "single3": [
+        (r".*?'''", "string", "root"),
+        (r".+", "string", None),
+    ],
+})
+
+LEXERS = {lexer.name: lexer for lexer in (LOG_LEXER, CONFIG_LEXER, PYTHON_LEXER)}
+
+# Расширение файла -> лексер
+EXTENSIONS = {
+    ".log": "log",
+    ".ini": "config", ".cfg": "config", ".conf": "config", ".toml": "config",
+    ".properties": "config", ".yaml": "config", ".yml": "config", ".env": "config",
+    ".py": "python",
+}
+
+LOG_LINE = re.compile(r"\d{2}:\d{2}:\d{2}|\b(?:ERROR|WARN(?:ING)?|INFO|DEBUG|TRACE)\b")
+SECTION_LINE = re.compile(r"\s*\[[^\]]+\]\s*$")
+PYTHON_LINE = re.compile(r"(?:from \S+ )?import \w|def \w+\(|class \w+[(:]")
+
+
+def guess_lexer(file_path, sample=""):
+    """Имя лексера по расширению файла или, для текстовых файлов, по первым строкам sample (None — без подсветки)."""
+    name = os.path.basename(file_path).lower()
+    if name.endswith(".txt"):
+        name = name[:-4]  # app.log.txt подсвечивается как журнал
+    extension = os.path.splitext(name)[1]
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    lines = [line for line in sample.splitlines() if line.strip()][:GUESS_LINES]
+    if not lines:
+        return None
+    if sum(1 for line in lines if LOG_LINE.search(line)) * 2 > len(lines):
+        return "log"
+    if any(PYTHON_LINE.match(line) for line in lines):
+        return "python"
+    if any(SECTION_LINE.match(line) for line in lines):
+        return "config"
+    return None
+
+
+class Highlighter:
+    """Подсветка текстового виджета: состояния строк, грязные строки и фоновые порции.
+
+    Редактор сообщает о правках (on_insert/on_delete) сразу после изменения
+    виджета — это только сдвиг списка состояний. Подсветка выполняется по
+    schedule(): видимые строки первыми, затем остальные в паузах.
+
+    states[i] — состояние лексера в начале строки i + 1 для строк до frontier;
+    строки от frontier до конца ещё не разбирались. dirty — номера строк до
+    frontier, которые нужно разобрать заново.
+    """
+
+    def __init__(self, root, text, command):
+        self.root = root
+        self.text = text
+        self.command = command  # Исходная Tcl-команда виджета, в обход перехвата правок
+        self.lexer = None
+        self.states = []
+        self.frontier = 1
+        self.dirty = set()
+        self._job = None
+        for token, options in TOKEN_STYLES.items():
+            text.tag_configure(TAG_PREFIX + token, **options)
+            text.tag_lower(TAG_PREFIX + token)
+
+    @staticmethod
+    def owns(tag):
+        """Тег подсветки (не форматирование)."""
+        return tag.startswith(TAG_PREFIX)
+
+    @property
+    def lexer_name(self):
+        return self.lexer.name if self.lexer is not None else None
+
+    def set_lexer(self, name):
+        """Выбирает лексер по имени (None — без подсветки) и подсвечивает текст заново."""
+        self.lexer = LEXERS.get(name) if name else None
+        self.reset()
+
+    def reset(self):
+        """Текст виджета заменён целиком: снимаем подсветку и начинаем разбор с первой строки."""
+        self._clear("1.0", "end")
+        self.states = [self.lexer.initial] if self.lexer is not None else []
+        self.frontier = 1
+        self.dirty = set()
+        self.schedule()
+
+    # --- Правки ---
+
+    def on_insert(self, index, text):
+        """Вставлен text в позицию index виджета."""
+        if self.lexer is None:
+            return
+        line = int(index.split(".")[0])
+        if line >= self.frontier:
+            return
+        added = text.count("\n")
+        if added > BLOCK_LINES:
+            # Большая вставка: проще разобрать заново всё от строки правки, чем помечать каждую строку
+            del self.states[line:]
+            self.frontier = line
+            self.dirty = {row for row in self.dirty if row < line}
+            return
+        if added:
+            # Новые строки получают состояние строки правки как предположение; разбор его уточнит
+            self.states[line:line] = [self.states[line - 1]] * added
+            self.frontier += added
+            self.dirty = {row + added if row > line else row for row in self.dirty}
+        self.dirty.update(range(line, line + added + 1))
+
+    def on_delete(self, index, text):
+        """Удалён text, начинавшийся в позиции index виджета."""
+        if self.lexer is None:
+            return
+        line = int(index.split(".")[0])
+        if line >= self.frontier:
+            return
+        removed = text.count("\n")
+        if removed:
+            if line + removed >= self.frontier:
+                del self.states[line:]
+                self.frontier = line
+            else:
+                del self.states[line:line + removed]
+                self.frontier -= removed
+            shifted = (row - removed if row > line + removed else row
+                       for row in self.dirty if not line < row <= line + removed)
+            self.dirty = {row for row in shifted if row < self.frontier}
+        if line < self.frontier:
+            self.dirty.add(line)
+
+    # --- Разбор ---
+
+    def schedule(self):
+        """Запускает подсветку в ближайшую паузу, если есть неразобранные строки."""
+        if self._job is None and self.lexer is not None:
+            self._job = self.root.after_idle(self.run)
+
+    def cancel(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def run(self):
+        """Порция подсветки: видимые строки целиком, остальные — пока не вышло SLICE_BUDGET."""
+        self._job = None
+        if self.lexer is None:
+            return
+        deadline = time.perf_counter() + SLICE_BUDGET
+        last_line = int(self._call("index", "end -1c").split(".")[0])
+        first_visible = int(self._call("index", "@0,0").split(".")[0])
+        last_visible = int(self._call("index", f"@0,{self.text.winfo_height()}").split(".")[0])
+
+        # Видимая область — сразу, без ограничения по времени
+        while True:
+            line = min((row for row in self.dirty if first_visible <= row <= last_visible), default=None)
+            if line is None:
+                break
+            self._highlight(line, last_visible)
+        if self.frontier <= min(last_visible, last_line):
+            if self.frontier + BLOCK_LINES >= first_visible:
+                while self.frontier <= min(last_visible, last_line):
+                    self._highlight(self.frontier, last_visible)
+            else:
+                # До видимой области далеко: разбираем её от последнего известного состояния,
+                # а точный разбор дойдёт до неё в фоне
+                self._highlight(first_visible, last_visible, self.states[-1], track=False)
+
+        # Остальной текст — пока не вышло время порции
+        while time.perf_counter() < deadline:
+            if self.dirty:
+                self._highlight(min(self.dirty), last_line)
+            elif self.frontier <= last_line:
+                self._highlight(self.frontier, last_line)
+            else:
+                return
+        self._job = self.root.after(SLICE_DELAY, self.run)
+
+    def _highlight(self, first, last, state=None, track=True):
+        """Разбирает строки от first (не дальше last и BLOCK_LINES строк) и расставляет теги.
+
+        track=True: состояние берётся из states, список обновляется, а разбор
+        останавливается, когда состояние в конце строки совпало с прежним.
+        """
+        last = min(last, first + BLOCK_LINES - 1)
+        if track:
+            state = self.states[first - 1]
+        lines = self._call("get", f"{first}.0", f"{last}.0 lineend").split("\n")
+        ranges = {}
+        line = first
+        for text in lines:
+            tokens, state = self.lexer.tokenize(text, state)
+            for start, end, token in tokens:
+                ranges.setdefault(TAG_PREFIX + token, []).extend((f"{line}.{start}", f"{line}.{end}"))
+            if track and not self._advance(line, state):
+                break
+            line += 1
+        else:
+            line -= 1
+            if track and line + 1 < self.frontier:
+                self.dirty.add(line + 1)  # Блок кончился раньше, чем состояние сошлось
+
+        self._clear(f"{first}.0", f"{line}.0 lineend")
+        for tag, indices in ranges.items():
+            self._call("tag", "add", tag, *indices)
+
+    def _advance(self, line, state):
+        """Записывает состояние в конце строки line; False — разбор дальше не нужен."""
+        self.dirty.discard(line)
+        if line == self.frontier:
+            self.states.append(state)
+            self.frontier += 1
+            return True
+        converged = self.states[line] == state
+        self.states[line] = state
+        return not converged or line + 1 in self.dirty
+
+    def _clear(self, start, end):
+        for token in TOKEN_STYLES:
+            self._call("tag", "remove", TAG_PREFIX + token, start, end)
+
+    def _call(self, *args):
+        return self.text.tk.call(self.command, *args)
@@ -0,0 +1,183 @@
+"""Встроенные картинки: декодирование в фоне, кэш и ссылки на PhotoImage.
+
+Файл картинки читается, хешируется, декодируется и масштабируется в пуле
+рабочих потоков; в потоке Tk создаётся только PhotoImage. Готовые
+PhotoImage хранятся в LRU-кэше по ключу (хеш содержимого, ширина, высота).
+Ссылки на картинки, встроенные в текст, дополнительно хранятся в shown,
+сколько бы их ни было: PhotoImage, на которую не осталось ссылок, удаляет
+и картинку Tk, и в тексте она пропала бы. Из shown картинка уходит, когда
+её больше нет в тексте. Пока картинка не декодирована, на её месте стоит
+пустая заглушка того же размера.
+
+Каждому ключу картинки соответствует тег "image_N" на её позиции в тексте:
+по тегу картинка находится при прокрутке, а история правок восстанавливает
+её так же, как теги форматирования.
+
+PIL импортируется при первой картинке, а не при загрузке модуля, чтобы не
+замедлять запуск редактора.
+"""
+import hashlib
+import io
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+WORKERS = 2
+CACHE_SIZE = 32  # PhotoImage, которые не показаны в тексте, но остаются в кэше
+POLL_DELAY = 30  # мс между проверками готовых картинок
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def decode_image(data, width, height):
+    """Декодирует и масштабирует картинку (в рабочем потоке)."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def read_image_file(file_path, width, height):
+    """Читает файл картинки; возвращает (ключ картинки, содержимое файла, готовое изображение)."""
+    with open(file_path, "rb") as file:
+        data = file.read()
+    return (content_hash(data), width, height), data, decode_image(data, width, height)
+
+
+class ImageManager:
+    """Пул декодирования, LRU-кэш PhotoImage и теги картинок."""
+
+    def __init__(self, root, workers=WORKERS, cache_size=CACHE_SIZE, prefix="image_"):
+        self.root = root
+        self.cache_size = cache_size
+        self.prefix = prefix
+        self.cache = OrderedDict()  # (хеш, ширина, высота) -> PhotoImage
+        self.shown = {}  # Ключ -> PhotoImage, встроенная в текст
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image")
+        self._results = queue.Queue()
+        self._pending = 0  # Заданий в пуле, результат которых ещё не передан
+        self._waiting = {}  # Ключ картинки -> обратные вызовы, ждущие её декодирования
+        self._poll_job = None
+        self._placeholders = {}  # (ширина, высота) -> пустая PhotoImage
+        self._placeholder_names = set()
+        self._tag_by_ref = {}
+        self._ref_by_tag = {}
+
+    # --- Теги картинок ---
+
+    def __contains__(self, tag):
+        return tag in self._ref_by_tag
+
+    def tag(self, ref):
+        """Тег картинки с ключом ref, заводя новый при первом обращении."""
+        tag = self._tag_by_ref.get(ref)
+        if tag is None:
+            tag = f"{self.prefix}{len(self._tag_by_ref)}"
+            self._tag_by_ref[ref] = tag
+            self._ref_by_tag[tag] = ref
+        return tag
+
+    def ref(self, tag):
+        return self._ref_by_tag.get(tag)
+
+    # --- Картинки ---
+
+    def placeholder(self, ref):
+        """Пустая картинка размера ref — занимает место, пока настоящая не декодирована."""
+        size = ref[1], ref[2]
+        photo = self._placeholders.get(size)
+        if photo is None:
+            from PIL import ImageTk
+
+            photo = self._placeholders[size] = ImageTk.PhotoImage("RGBA", size)
+            self._placeholder_names.add(str(photo))
+        return photo
+
+    def is_placeholder(self, image_name):
+        return image_name in self._placeholder_names
+
+    def submit(self, work, on_done, on_error):
+        """Выполняет work() в пуле; on_done(результат) или on_error(исключение) вызываются в потоке Tk."""
+        future = self._executor.submit(work)
+        self._pending += 1
+        future.add_done_callback(lambda done: self._results.put((done, on_done, on_error)))
+        self._schedule_poll()
+
+    def request(self, ref, data, callback):
+        """Передаёт callback(PhotoImage) картинку ref: сразу из кэша или после декодирования data."""
+        photo = self.cache.get(ref)
+        if photo is not None:
+            self.cache.move_to_end(ref)
+            callback(photo)
+            return
+        if ref in self._waiting:
+            self._waiting[ref].append(callback)
+            return
+        self._waiting[ref] = [callback]
+
+        def decoded(image):
+            callbacks = self._waiting.pop(ref, [])
+            photo = self.add(ref, image)
+            for waiting in callbacks:
+                waiting(photo)
+
+        def failed(error):
+            self._waiting.pop(ref, None)
+            print(f"[ERROR] Не удалось декодировать картинку {ref[0][:12]}: {error}")
+
+        self.submit(lambda: decode_image(data, ref[1], ref[2]), decoded, failed)
+
+    def add(self, ref, image):
+        """Создаёт PhotoImage из декодированного изображения и кладёт её в кэш."""
+        from PIL import ImageTk
+
+        photo = ImageTk.PhotoImage(image)
+        self.cache[ref] = photo
+        # Новая картинка ещё не встроена в текст, но её сейчас встроят — её не вытесняем
+        self._trim(keep=ref)
+        return photo
+
+    def show(self, ref, photo):
+        """Картинка встроена в текст: ссылка на PhotoImage хранится, пока картинка в тексте."""
+        self.shown[ref] = photo
+
+    def _in_use(self, photo):
+        return self.root.tk.getboolean(self.root.tk.call("image", "inuse", str(photo)))
+
+    def _trim(self, keep=None):
+        """Отпускает картинки, которых больше нет в тексте, и вытесняет давно не использованные сверх лимита."""
+        for ref in [ref for ref, photo in self.shown.items() if ref != keep and not self._in_use(photo)]:
+            del self.shown[ref]
+        excess = len(self.cache) - self.cache_size
+        for ref in list(self.cache):
+            if excess <= 0:
+                break
+            if ref != keep and not self._in_use(self.cache[ref]):
+                del self.cache[ref]
+                excess -= 1
+
+    def _schedule_poll(self):
+        if self._poll_job is None:
+            self._poll_job = self.root.after(POLL_DELAY, self._poll)
+
+    def _poll(self):
+        self._poll_job = None
+        while True:
+            try:
+                future, on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            try:
+                result = future.result()
+            except Exception as e:
+                on_error(e)
+            else:
+                on_done(result)
+        if self._pending:
+            self._schedule_poll()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
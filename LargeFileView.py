@@ -0,0 +1,260 @@
+"""Режим просмотра больших файлов.
+
+Файл отображается в память (mmap), а индекс начал строк строится в фоновом
+потоке. Индекс разреженный: хранится смещение каждой INDEX_STEP-й строки,
+остальные находятся поиском перевода строки от ближайшей опорной точки.
+В текстовый виджет загружается только окно строк вокруг видимой области;
+при прокрутке к краю окна оно перестраивается вокруг новой позиции.
+"""
+import mmap
+import os
+import threading
+import tkinter as tk
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, islice
+
+INDEX_STEP = 64  # Опорная точка индекса на каждую INDEX_STEP-ю строку
+INDEX_BLOCK_SIZE = 16 * 1024 * 1024
+WINDOW_MARGIN = 300  # Строк сверху и снизу от видимой области
+INDEX_POLL_DELAY = 250  # мс между обновлениями индикатора индексации
+
+
+class LargeFileIndex:
+    """Отображённый в память файл и разреженный индекс начал строк."""
+
+    def __init__(self, file_path, step=INDEX_STEP):
+        self.file = open(file_path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        # Пустой файл отобразить в память нельзя
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.step = step
+        self.checkpoints = array("q", [0])  # Смещение строки с номером i * step
+        self.newlines = 0  # Переводов строки в проиндексированной части
+        self.bytes_indexed = 0
+        self.complete = False
+        self._stop = False
+        self._thread = threading.Thread(target=self._build, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        self._stop = True
+        if self._thread.is_alive():
+            self._thread.join()
+        if self.size:
+            self.mm.close()
+        self.file.close()
+
+    def _build(self):
+        """Фоновое построение индекса: split по блокам быстрее, чем поиск каждой строки."""
+        step = self.step
+        position = 0
+        while position < self.size and not self._stop:
+            block = self.mm[position:position + INDEX_BLOCK_SIZE]
+            parts = block.split(b"\n")[:-1]
+            if parts:
+                # Начала строк, которые открываются в этом блоке
+                starts = accumulate((len(part) + 1 for part in parts), initial=position)
+                next(starts)
+                first_line = self.newlines + 1
+                skip = -first_line % step
+                self.checkpoints.extend(islice(starts, skip, None, step))
+            self.newlines += len(parts)
+            position += len(block)
+            self.bytes_indexed = position
+        self.complete = not self._stop
+
+    @property
+    def line_count(self):
+        """Число строк (точное после завершения индексации, до этого — оценка)."""
+        lines = self.newlines + 1
+        if self.complete or not self.bytes_indexed:
+            return lines
+        return max(lines, lines * self.size // self.bytes_indexed)
+
+    @property
+    def indexed_lines(self):
+        return self.newlines + 1
+
+    def line_offset(self, line):
+        """Смещение начала строки (с нуля) или None, если строка ещё не проиндексирована."""
+        checkpoint = line // self.step
+        if line >= self.indexed_lines or checkpoint >= len(self.checkpoints):
+            return None
+        position = self.checkpoints[checkpoint]
+        for _ in range(line % self.step):
+            position = self.mm.find(b"\n", position) + 1
+            if position == 0:
+                return None
+        return position
+
+    def line_of_offset(self, offset):
+        """Номер строки (с нуля), содержащей байт со смещением offset."""
+        checkpoint = bisect_right(self.checkpoints, offset) - 1
+        start = self.checkpoints[checkpoint]
+        return checkpoint * self.step + self.mm[start:offset].count(b"\n")
+
+    def read_lines(self, first, count):
+        """Возвращает текст строк [first, first + count) и фактическое число прочитанных строк."""
+        start = self.line_offset(first)
+        if start is None:
+            return "", 0
+        end = start
+        lines = 0
+        while lines < count and end < self.size:
+            newline = self.mm.find(b"\n", end)
+            end = self.size if newline == -1 else newline + 1
+            lines += 1
+        text = self.mm[start:end].decode("utf-8", errors="replace")
+        if text.endswith("\n"):
+            text = text[:-1]
+        return text.replace("\r\n", "\n"), max(lines, 1)
+
+    def find(self, pattern, start):
+        """Ищет байты pattern с позиции start; возвращает смещение или -1."""
+        if not self.size:
+            return -1
+        return self.mm.find(pattern, start)
+
+
+class LargeFileView:
+    """Окно строк большого файла в текстовом виджете, следующее за прокруткой."""
+
+    def __init__(self, root, text_area, file_path, on_progress):
+        self.root = root
+        self.text_area = text_area
+        self.file_path = file_path
+        self.on_progress = on_progress  # Вызывается, пока идёт индексация
+        self.index = LargeFileIndex(file_path)
+        self.window_start = 0  # Номер первой строки окна (с нуля)
+        self.window_lines = 0
+        self.recenter_job = None
+        self.poll_job = None
+
+        self.previous_yscrollcommand = text_area.cget("yscrollcommand")
+        self.scrollbar = tk.Scrollbar(text_area.master, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, before=text_area)
+        self.text_area.configure(yscrollcommand=self.on_text_scrolled)
+
+    def start(self):
+        """Запускает индексацию и показывает начало файла.
+
+        Отдельно от конструктора: редактор должен узнать о режиме просмотра до того,
+        как окно строк попадёт в виджет, иначе оно пройдёт через перехват правок.
+        """
+        self.index.start()
+        self.load_window(0)
+        self.poll_index()
+
+    def close(self):
+        for job in (self.recenter_job, self.poll_job):
+            if job is not None:
+                self.root.after_cancel(job)
+        self.text_area.configure(yscrollcommand=self.previous_yscrollcommand, state=tk.NORMAL)
+        self.scrollbar.destroy()
+        self.index.close()
+
+    def visible_lines(self):
+        top = int(self.text_area.index("@0,0").split(".")[0])
+        bottom = int(self.text_area.index(f"@0,{self.text_area.winfo_height()}").split(".")[0])
+        return top - 1, bottom - 1
+
+    def top_line(self):
+        """Номер первой видимой строки файла (с нуля)."""
+        return self.window_start + self.visible_lines()[0]
+
+    def load_window(self, top_line, cursor_line=None):
+        """Загружает окно строк вокруг top_line и прокручивает виджет к ней."""
+        top_line = max(0, min(top_line, self.index.indexed_lines - 1))
+        visible = max(1, self.visible_lines()[1] - self.visible_lines()[0] + 1)
+        start = max(0, top_line - WINDOW_MARGIN)
+        text, lines = self.index.read_lines(start, top_line - start + visible + WINDOW_MARGIN)
+
+        self.text_area.configure(state=tk.NORMAL)
+        self.text_area.delete("1.0", tk.END)
+        self.text_area.insert("1.0", text)
+        self.text_area.configure(state=tk.DISABLED)
+        self.window_start = start
+        self.window_lines = lines
+
+        self.text_area.yview(f"{top_line - start + 1}.0")
+        if cursor_line is not None:
+            self.text_area.mark_set(tk.INSERT, f"{cursor_line - start + 1}.0")
+
+    def on_text_scrolled(self, first, last):
+        """yscrollcommand виджета: обновляет полосу прокрутки и перестраивает окно у его краёв."""
+        top, bottom = self.visible_lines()
+        total = max(1, self.index.line_count)
+        self.scrollbar.set((self.window_start + top) / total, (self.window_start + bottom + 1) / total)
+
+        near_top = top < WINDOW_MARGIN // 3 and self.window_start > 0
+        more_below = self.window_start + self.window_lines < self.index.indexed_lines
+        near_bottom = bottom > self.window_lines - WINDOW_MARGIN // 3 and more_below
+        if (near_top or near_bottom) and self.recenter_job is None:
+            self.recenter_job = self.root.after_idle(self.recenter)
+
+    def recenter(self):
+        self.recenter_job = None
+        cursor_line = self.window_start + int(self.text_area.index(tk.INSERT).split(".")[0]) - 1
+        self.load_window(self.top_line(), cursor_line)
+
+    def on_scrollbar(self, command, *args):
+        """Команда полосы прокрутки: moveto — по всему файлу, scroll — внутри виджета."""
+        if command == tk.MOVETO:
+            self.load_window(int(float(args[0]) * self.index.line_count))
+        else:
+            self.text_area.yview(command, *args)
+
+    def poll_index(self):
+        """Следит за фоновой индексацией, пока она не завершится."""
+        self.poll_job = None
+        self.on_progress()
+        if not self.index.complete:
+            self.poll_job = self.root.after(INDEX_POLL_DELAY, self.poll_index)
+
+    def cursor_position(self):
+        """Строка (с единицы) и столбец курсора в координатах всего файла."""
+        row, col = map(int, self.text_area.index(tk.INSERT).split("."))
+        return self.window_start + row, col
+
+    def goto_line(self, line):
+        """Переходит к строке файла (с единицы). Возвращает False, если строка ещё не проиндексирована."""
+        if line < 1 or line > self.index.indexed_lines:
+            return False
+        self.load_window(line - 1 - WINDOW_MARGIN // 2, line - 1)
+        self.text_area.see(tk.INSERT)
+        return True
+
+    def find_next(self, query):
+        """Ищет query по всему файлу после курсора и выделяет найденное.
+
+        Возвращает False, если не найдено или найденная строка ещё не проиндексирована.
+        """
+        pattern = query.encode("utf-8")
+        row, col = self.cursor_position()
+        line_text = self.text_area.get(f"{row - self.window_start}.0", f"{row - self.window_start}.{col}")
+        start = self.index.line_offset(row - 1) + len(line_text.encode("utf-8")) + 1
+
+        found = self.index.find(pattern, start)
+        if found == -1:
+            found = self.index.find(pattern, 0)  # Продолжаем с начала файла
+        if found == -1:
+            return False
+
+        line = self.index.line_of_offset(found)
+        line_start = self.index.line_offset(line)
+        if line_start is None:
+            return False
+        column = len(self.index.mm[line_start:found].decode("utf-8", errors="replace"))
+        if not self.goto_line(line + 1):
+            return False
+
+        local = line - self.window_start + 1
+        self.text_area.tag_remove("highlight", "1.0", tk.END)
+        self.text_area.tag_add("highlight", f"{local}.{column}", f"{local}.{column} + {len(query)}c")
+        self.text_area.tag_configure("highlight", background="yellow", foreground="black")
+        self.text_area.mark_set(tk.INSERT, f"{local}.{column}")
+        self.text_area.see(tk.INSERT)
+        return True
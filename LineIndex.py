@@ -0,0 +1,205 @@
+"""Индекс начал строк: перевод смещений в позиции "строка.столбец" и обратно за O(log n).
+
+Длины строк (вместе с переводом строки; у последней строки — без него)
+хранятся блоками по BLOCK_LINES строк. Над числом символов и числом строк
+в блоках построены деревья Фенвика, поэтому блок, содержащий смещение или
+строку, находится за O(log n), а внутри блока поиск идёт по готовым суммам.
+
+Правка меняет длины строк одного блока и обновляет деревья. Только если
+блок разросся или правка задела несколько блоков, блоки перестраиваются
+заново — это O(число блоков), а не O(длина текста).
+
+Строки нумеруются с 1, столбцы с 0, как в индексах текстового виджета.
+"""
+from bisect import bisect_right
+from itertools import accumulate
+
+BLOCK_LINES = 128  # Строк в блоке после перестройки; блок делится, когда вдвое больше
+SPLIT_CHUNK = 1024 * 1024  # Символов текста, которые делятся на строки за один раз
+
+
+def line_lengths(text):
+    """Длины строк text с переводом строки (у последней строки — без него)."""
+    lengths = []
+    pending = 0  # Длина начала строки, которая продолжается в следующем блоке текста
+    for start in range(0, len(text), SPLIT_CHUNK):
+        parts = list(map(len, text[start:start + SPLIT_CHUNK].split("\n")))
+        parts[0] += pending
+        pending = parts.pop()
+        lengths.extend([length + 1 for length in parts])
+    lengths.append(pending)
+    return lengths
+
+
+class FenwickTree:
+    """Префиксные суммы с обновлением элемента и поиском по сумме за O(log n)."""
+
+    def __init__(self, values):
+        self.size = len(values)
+        self.tree = [0] + list(values)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        self.top = 1 << self.size.bit_length() >> 1 if self.size else 0
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index):
+        """Сумма первых index элементов."""
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, target):
+        """Номер элемента, на который приходится target (сумма предыдущих <= target), и остаток."""
+        position = 0
+        step = self.top
+        while step:
+            following = position + step
+            if following <= self.size and self.tree[following] <= target:
+                position = following
+                target -= self.tree[following]
+            step >>= 1
+        return position, target
+
+
+class LineIndex:
+    """Длины строк текста и перевод между смещениями и позициями (строка, столбец)."""
+
+    def __init__(self, text=""):
+        self.reset(text)
+
+    def reset(self, text):
+        lengths = line_lengths(text)
+        self._blocks = [lengths[i:i + BLOCK_LINES] for i in range(0, len(lengths), BLOCK_LINES)]
+        self._rebuild()
+
+    def _rebuild(self):
+        self._block_chars = [sum(block) for block in self._blocks]
+        self._block_lines = [len(block) for block in self._blocks]
+        self._chars = FenwickTree(self._block_chars)
+        self._lines = FenwickTree(self._block_lines)
+        self._length = sum(self._block_chars)
+        self._line_count = sum(self._block_lines)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def line_count(self):
+        return self._line_count
+
+    # --- Поиск ---
+
+    def _locate(self, offset):
+        """(блок, строка в блоке, столбец) символа offset; конец текста — конец последней строки."""
+        if offset >= self._length:
+            block = len(self._blocks) - 1
+            return block, len(self._blocks[block]) - 1, self._blocks[block][-1]
+        block, inner = self._chars.find(max(0, offset))
+        ends = list(accumulate(self._blocks[block]))
+        line = bisect_right(ends, inner)
+        return block, line, inner - (ends[line - 1] if line else 0)
+
+    def position(self, offset):
+        """Позиция (строка с 1, столбец с 0) смещения offset."""
+        block, line, column = self._locate(offset)
+        return self._lines.prefix(block) + line + 1, column
+
+    def index(self, offset):
+        """Индекс виджета "строка.столбец" смещения offset."""
+        line, column = self.position(offset)
+        return f"{line}.{column}"
+
+    def offset(self, line, column=0):
+        """Смещение позиции; строка и столбец ограничиваются текстом, как в индексах виджета."""
+        if line > self._line_count:
+            return self._length
+        block, inner = self._lines.find(max(0, line - 1))
+        lengths = self._blocks[block]
+        start = self._chars.prefix(block) + sum(lengths[:inner])
+        last = block == len(self._blocks) - 1 and inner == len(lengths) - 1
+        return start + max(0, min(column, lengths[inner] - (0 if last else 1)))
+
+    def index_offset(self, index):
+        """Смещение индекса виджета в виде "строка.столбец"."""
+        line, column = index.split(".")
+        return self.offset(int(line), int(column))
+
+    def indices(self, offsets):
+        """Индексы "строка.столбец" для списка смещений (например, границ совпадений поиска).
+
+        Соседние смещения обычно попадают в один блок: он ищется заново, только
+        когда смещение выходит за его пределы.
+        """
+        result = []
+        block_start = block_end = 0
+        line_base = 0
+        ends = None
+        for offset in offsets:
+            offset = max(0, min(offset, self._length))
+            if ends is None or not block_start <= offset < block_end:
+                block, _, _ = self._locate(offset)
+                block_start = self._chars.prefix(block)
+                block_end = block_start + self._block_chars[block]
+                line_base = self._lines.prefix(block) + 1
+                ends = list(accumulate(self._blocks[block]))
+            inner = offset - block_start
+            line = min(bisect_right(ends, inner), len(ends) - 1)
+            result.append(f"{line_base + line}.{inner - (ends[line - 1] if line else 0)}")
+        return result
+
+    # --- Правки ---
+
+    def insert(self, offset, text):
+        """Вставлен text в позицию offset."""
+        if not text:
+            return
+        block, line, column = self._locate(offset)
+        lengths = self._blocks[block]
+        if "\n" not in text:
+            lengths[line] += len(text)
+            self._update(block, len(text), 0)
+            return
+        inserted = line_lengths(text)
+        inserted[0] += column
+        inserted[-1] += lengths[line] - column
+        lengths[line:line + 1] = inserted
+        self._update(block, len(text), len(inserted) - 1)
+        if len(lengths) > 2 * BLOCK_LINES:
+            self._blocks[block:block + 1] = [lengths[i:i + BLOCK_LINES] for i in range(0, len(lengths), BLOCK_LINES)]
+            self._rebuild()
+
+    def delete(self, offset, length):
+        """Удалено length символов начиная с offset."""
+        end = min(offset + length, self._length)
+        if offset >= end:
+            return
+        first_block, first_line, first_column = self._locate(offset)
+        last_block, last_line, last_column = self._locate(end)
+        merged = first_column + self._blocks[last_block][last_line] - last_column
+        if first_block == last_block:
+            self._blocks[first_block][first_line:last_line + 1] = [merged]
+            self._update(first_block, offset - end, first_line - last_line)
+            return
+        # Удаление задело несколько блоков: они сливаются и делятся заново
+        lengths = self._blocks[first_block][:first_line] + [merged] + self._blocks[last_block][last_line + 1:]
+        self._blocks[first_block:last_block + 1] = [lengths[i:i + BLOCK_LINES]
+                                                   for i in range(0, len(lengths), BLOCK_LINES)]
+        self._rebuild()
+
+    def _update(self, block, chars, lines):
+        self._block_chars[block] += chars
+        self._chars.add(block, chars)
+        self._length += chars
+        if lines:
+            self._block_lines[block] += lines
+            self._lines.add(block, lines)
+            self._line_count += lines
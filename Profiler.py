@@ -0,0 +1,270 @@
+"""Встроенное профилирование: время обработчиков, вызовы Tcl и задержка цикла событий.
+
+Обработчики редактора оборачиваются один раз при создании окна; пока
+профилирование выключено, обёртка только проверяет флаг. Включённое
+профилирование:
+    * подменяет объект tk у виджетов на CountingTk, который считает и
+      замеряет вызовы Tcl и относит их к выполняющемуся обработчику;
+    * хранит последние длительности каждого обработчика (p50/p99);
+    * раз в LAG_INTERVAL мс замеряет, насколько опоздал таймер after —
+      это задержка цикла событий;
+    * ведёт cProfile окнами по TRACE_WINDOW секунд и журнал вложенности
+      обработчиков, чтобы сохранить профиль последних секунд работы.
+
+Профиль сохраняется либо в формате cProfile (.prof, для pstats и snakeviz),
+либо свёрнутыми стеками (flamegraph.pl, speedscope): строка "внешний;внутренний
+микросекунды".
+"""
+import cProfile
+import functools
+import pstats
+import time
+import tkinter as tk
+from collections import deque
+
+ENV_VARIABLE = "TEXTEDITOR_PROFILE"
+SAMPLES = 1000  # Последних замеров на обработчик для процентилей
+LAG_INTERVAL = 50  # мс между замерами задержки цикла событий
+OVERLAY_INTERVAL = 500  # мс между обновлениями панели
+TRACE_WINDOW = 30.0  # Секунд, за которые сохраняется профиль
+TRACE_EVENTS = 200_000  # Предел записей журнала вложенности
+OVERLAY_ROWS = 12
+LAG_NAME = "<цикл событий>"
+OTHER_NAME = "<вне обработчиков>"
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class HandlerStats:
+    """Счётчики одного обработчика."""
+
+    __slots__ = ("calls", "durations", "tcl_calls", "tcl_time")
+
+    def __init__(self):
+        self.calls = 0
+        self.durations = deque(maxlen=SAMPLES)
+        self.tcl_calls = 0
+        self.tcl_time = 0.0
+
+    def summary(self):
+        """(p50, p99) длительности в секундах."""
+        values = sorted(self.durations)
+        return percentile(values, 0.5), percentile(values, 0.99)
+
+
+class CountingTk:
+    """Обёртка интерпретатора Tcl: считает вызовы и их время, остальное передаёт как есть."""
+
+    def __init__(self, interpreter, profiler):
+        self._tk = interpreter
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._tk, name)
+
+    def _timed(self, method, args):
+        if not self._profiler.enabled:
+            return method(*args)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._profiler.count_tcl(time.perf_counter() - started)
+
+    def call(self, *args):
+        return self._timed(self._tk.call, args)
+
+    def eval(self, *args):
+        return self._timed(self._tk.eval, args)
+
+    def getvar(self, *args):
+        return self._timed(self._tk.getvar, args)
+
+    def setvar(self, *args):
+        return self._timed(self._tk.setvar, args)
+
+    def globalgetvar(self, *args):
+        return self._timed(self._tk.globalgetvar, args)
+
+    def globalsetvar(self, *args):
+        return self._timed(self._tk.globalsetvar, args)
+
+
+class Profiler:
+    """Замеры обработчиков, вызовов Tcl и задержки цикла событий."""
+
+    def __init__(self, root):
+        self.root = root
+        self.enabled = False
+        self.stats = {}  # Имя обработчика -> HandlerStats
+        self._real_tk = root.tk
+        self._counting_tk = CountingTk(root.tk, self)
+        self._stack = []  # [имя, начало, время вложенных обработчиков]
+        self._trace = deque(maxlen=TRACE_EVENTS)  # (конец, "a;b;c", собственное время в мкс)
+        self._profiles = [None, None]  # cProfile предыдущего и текущего окна
+        self._window_started = 0.0
+        self._lag_job = None
+        self._lag_expected = 0.0
+        self._overlay = None
+        self._overlay_job = None
+
+    # --- Инструментирование ---
+
+    def instrument(self, owner, names):
+        """Заменяет методы owner с именами names обёртками, которые замеряют их при включённом профилировании."""
+        for name in names:
+            setattr(owner, name, self.wrap(name, getattr(owner, name)))
+
+    def wrap(self, name, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            frame = [name, time.perf_counter(), 0.0]
+            self._stack.append(frame)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._stack.pop()
+                ended = time.perf_counter()
+                duration = ended - frame[1]
+                stats = self._stats(name)
+                stats.calls += 1
+                stats.durations.append(duration)
+                if self._stack:
+                    self._stack[-1][2] += duration
+                path = ";".join(item[0] for item in self._stack + [frame])
+                self._trace.append((ended, path, int((duration - frame[2]) * 1_000_000)))
+        return wrapper
+
+    def count_tcl(self, duration):
+        """Вызов Tcl относится к обработчику, который выполняется сейчас."""
+        stats = self._stats(self._stack[-1][0] if self._stack else OTHER_NAME)
+        stats.tcl_calls += 1
+        stats.tcl_time += duration
+
+    def _stats(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = HandlerStats()
+        return stats
+
+    # --- Включение и выключение ---
+
+    def set_enabled(self, enabled):
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        self._install_tk(self._counting_tk if enabled else self._real_tk)
+        if enabled:
+            self.stats = {}
+            self._trace.clear()
+            self._profiles = [None, cProfile.Profile()]
+            self._profiles[1].enable()
+            self._window_started = time.monotonic()
+            self._lag_expected = time.perf_counter() + LAG_INTERVAL / 1000
+            self._lag_job = self.root.after(LAG_INTERVAL, self._measure_lag)
+            self._show_overlay()
+        else:
+            self._profiles[1].disable()
+            for job in (self._lag_job, self._overlay_job):
+                if job is not None:
+                    self.root.after_cancel(job)
+            self._lag_job = self._overlay_job = None
+            if self._overlay is not None:
+                self._overlay.destroy()
+                self._overlay = None
+
+    def _install_tk(self, interpreter):
+        """Подменяет объект tk у корня и всех существующих виджетов; новые виджеты берут его у родителя."""
+        widgets = [self.root]
+        while widgets:
+            widget = widgets.pop()
+            widget.tk = interpreter
+            widgets.extend(widget.children.values())
+
+    # --- Задержка цикла событий и окна cProfile ---
+
+    def _measure_lag(self):
+        now = time.perf_counter()
+        stats = self._stats(LAG_NAME)
+        stats.calls += 1
+        stats.durations.append(max(0.0, now - self._lag_expected))
+
+        if time.monotonic() - self._window_started >= TRACE_WINDOW:
+            # Новое окно cProfile; предыдущее хранится, чтобы профиль покрывал не меньше TRACE_WINDOW секунд
+            self._profiles[1].disable()
+            self._profiles = [self._profiles[1], cProfile.Profile()]
+            self._profiles[1].enable()
+            self._window_started = time.monotonic()
+
+        self._lag_expected = time.perf_counter() + LAG_INTERVAL / 1000
+        self._lag_job = self.root.after(LAG_INTERVAL, self._measure_lag)
+
+    # --- Панель ---
+
+    def _show_overlay(self):
+        self._overlay = tk.Label(self.root, font=("Courier", 9), justify=tk.LEFT, anchor=tk.NW,
+                                 bg="#ffffe0", fg="black", bd=1, relief=tk.SOLID)
+        self._overlay.place(relx=1.0, y=40, anchor=tk.NE, x=-20)
+        self._update_overlay()
+
+    def report_lines(self, rows=OVERLAY_ROWS):
+        """Строки таблицы: самые затратные обработчики по суммарному времени последних замеров."""
+        lines = [f"{'обработчик':<26}{'вызовы':>8}{'p50 мс':>9}{'p99 мс':>9}{'Tcl/вызов':>11}"]
+        ranked = sorted(self.stats.items(), key=lambda item: -sum(item[1].durations))
+        for name, stats in ranked[:rows]:
+            p50, p99 = stats.summary()
+            per_call = stats.tcl_calls / stats.calls if stats.calls else stats.tcl_calls
+            lines.append(f"{name[:25]:<26}{stats.calls:>8}{p50 * 1000:>9.2f}{p99 * 1000:>9.2f}{per_call:>11.1f}")
+        return lines
+
+    def _update_overlay(self):
+        self._overlay_job = None
+        if self._overlay is None:
+            return
+        # Обновление панели не должно попадать в собственную статистику
+        self.enabled = False
+        try:
+            self._overlay.config(text="\n".join(self.report_lines()))
+            self._overlay.lift()
+        finally:
+            self.enabled = True
+        self._overlay_job = self.root.after(OVERLAY_INTERVAL, self._update_overlay)
+
+    # --- Сохранение профиля ---
+
+    def dump(self, file_path, seconds=TRACE_WINDOW):
+        """Сохраняет профиль последних секунд: .prof — cProfile, иначе свёрнутые стеки."""
+        if file_path.lower().endswith(".prof"):
+            self.dump_cprofile(file_path)
+        else:
+            self.dump_folded(file_path, seconds)
+
+    def dump_cprofile(self, file_path):
+        if self._profiles[1] is None:
+            raise ValueError("Профилирование не включалось")
+        current = self._profiles[1]
+        current.disable()
+        try:
+            stats = pstats.Stats(current)
+            if self._profiles[0] is not None:
+                stats.add(self._profiles[0])
+            stats.dump_stats(file_path)
+        finally:
+            if self.enabled:
+                current.enable()
+
+    def dump_folded(self, file_path, seconds=TRACE_WINDOW):
+        since = time.perf_counter() - seconds
+        folded = {}
+        for ended, path, micros in self._trace:
+            if ended >= since and micros > 0:
+                folded[path] = folded.get(path, 0) + micros
+        with open(file_path, "w", encoding="utf-8") as file:
+            for path, micros in sorted(folded.items()):
+                file.write(f"{path} {micros}\n")
@@ -0,0 +1,139 @@
+"""Поиск по тексту документа средствами модуля re.
+
+Поиск идёт по обычной строке Python, а не вызовами search текстового
+виджета. Совпадения хранятся как отсортированный список смещений, поэтому
+выбор совпадений в видимой области и переход к следующему/предыдущему
+выполняются двоичным поиском. Если новый запрос лишь дописывает старый
+(набор в строке поиска), по возможности проверяются только прежние совпадения.
+"""
+import re
+from bisect import bisect_left
+
+
+class SearchOptions:
+    """Параметры поиска: регулярное выражение, учёт регистра, слово целиком."""
+
+    __slots__ = ("regex", "case_sensitive", "whole_word")
+
+    def __init__(self, regex=False, case_sensitive=True, whole_word=False):
+        self.regex = regex
+        self.case_sensitive = case_sensitive
+        self.whole_word = whole_word
+
+    def key(self):
+        return self.regex, self.case_sensitive, self.whole_word
+
+
+def compile_pattern(query, options):
+    """Компилирует запрос в регулярное выражение (re.error при ошибке в выражении)."""
+    pattern = query if options.regex else re.escape(query)
+    if options.whole_word:
+        pattern = rf"(?<!\w)(?:{pattern})(?!\w)"
+    flags = re.MULTILINE
+    if not options.case_sensitive:
+        flags |= re.IGNORECASE
+    return re.compile(pattern, flags)
+
+
+def has_border(query):
+    """Есть ли у строки собственный префикс, совпадающий с суффиксом (как "aba" или "aa")."""
+    return any(query[:size] == query[-size:] for size in range(1, len(query)))
+
+
+def find_replacements(text, query, replacement, options, start=0, end=None):
+    """Возвращает замены (начало, конец, новый текст) для всех совпадений на участке [start, end).
+
+    В режиме регулярного выражения replacement может ссылаться на группы (\\1, \\g<имя>).
+    """
+    pattern = compile_pattern(query, options)
+    end = len(text) if end is None else end
+    if not options.regex:
+        return [(match.start(), match.end(), replacement) for match in pattern.finditer(text, start, end)]
+    return [(match.start(), match.end(), match.expand(replacement)) for match in pattern.finditer(text, start, end)]
+
+
+class SearchEngine:
+    """Совпадения запроса в тексте и навигация по ним."""
+
+    def __init__(self):
+        self.text = None  # Текст, по которому найдены совпадения (None — нужно перечитать)
+        self.query = ""
+        self.options = SearchOptions()
+        self.pattern = None
+        self.starts = []  # Начала совпадений по возрастанию
+        self.ends = []
+        self.current = -1  # Номер текущего совпадения
+
+    def invalidate(self):
+        """Текст изменился — при следующем поиске его нужно прочитать заново."""
+        self.text = None
+
+    def search(self, text, query, options):
+        """Находит все совпадения query в text; возвращает их число."""
+        refine = (
+            self.text is text and options.key() == self.options.key() == (False, True, False)
+            and self.query and query.startswith(self.query) and not has_border(self.query)
+        )
+        if refine:
+            self._refine(query)
+        else:
+            self.pattern = compile_pattern(query, options) if query else None
+            self.starts, self.ends = [], []
+            if self.pattern is not None:
+                for match in self.pattern.finditer(text):
+                    if match.end() > match.start():  # Пустые совпадения не подсвечиваются
+                        self.starts.append(match.start())
+                        self.ends.append(match.end())
+
+        self.text = text
+        self.query = query
+        self.options = options
+        self.current = -1
+        return len(self.starts)
+
+    def _refine(self, query):
+        """Оставляет прежние совпадения, которые продолжаются до нового, более длинного запроса.
+
+        Прежний запрос без бордюра (префикса, равного суффиксу) не может перекрываться сам
+        с собой, поэтому его совпадения — это все его вхождения, и каждое вхождение нового
+        запроса начинается с одного из них.
+        """
+        text = self.text
+        length = len(query)
+        starts = []
+        last_end = 0
+        for start in self.starts:
+            if start >= last_end and text.startswith(query, start):
+                starts.append(start)
+                last_end = start + length
+        self.pattern = compile_pattern(query, self.options)
+        self.starts = starts
+        self.ends = [start + length for start in starts]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def matches_between(self, start, end):
+        """Совпадения, пересекающиеся с участком [start, end), как список (начало, конец)."""
+        first = bisect_left(self.ends, start + 1)
+        last = bisect_left(self.starts, end)
+        return list(zip(self.starts[first:last], self.ends[first:last]))
+
+    def next_match(self, offset):
+        """Номер первого совпадения, начинающегося не раньше offset (по кругу), или -1."""
+        if not self.starts:
+            return -1
+        index = bisect_left(self.starts, offset)
+        self.current = index if index < len(self.starts) else 0
+        return self.current
+
+    def previous_match(self, offset):
+        """Номер последнего совпадения, начинающегося раньше offset (по кругу), или -1."""
+        if not self.starts:
+            return -1
+        index = bisect_left(self.starts, offset) - 1
+        self.current = index if index >= 0 else len(self.starts) - 1
+        return self.current
+
+    def span(self, index):
+        return self.starts[index], self.ends[index]
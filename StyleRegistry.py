@@ -0,0 +1,57 @@
+"""Реестр стилей форматирования.
+
+Каждое уникальное сочетание шрифта, размера, жирности, курсива,
+подчёркивания и цвета получает один составной тег. Тег настраивается
+один раз, а стиль по имени тега находится поиском в словаре.
+"""
+import DocumentFormat
+
+
+class StyleRegistry:
+    """Взаимно однозначное соответствие «стиль — составной тег»."""
+
+    def __init__(self, prefix="style_"):
+        self.prefix = prefix
+        self._tag_by_key = {}
+        self._key_by_tag = {}
+
+    def __len__(self):
+        return len(self._tag_by_key)
+
+    def __contains__(self, tag):
+        return tag in self._key_by_tag
+
+    def intern(self, style):
+        """Возвращает составной тег стиля, заводя новый при первом обращении."""
+        return self.intern_key(DocumentFormat.style_key(style))
+
+    def intern_key(self, key):
+        """То же, что intern, для ключа стиля."""
+        tag = self._tag_by_key.get(key)
+        if tag is None:
+            tag = f"{self.prefix}{len(self._tag_by_key)}"
+            self._tag_by_key[key] = tag
+            self._key_by_tag[tag] = key
+        return tag
+
+    def style(self, tag):
+        """Стиль составного тега или None, если тег не из реестра."""
+        key = self._key_by_tag.get(tag)
+        return None if key is None else DocumentFormat.style_from_key(key)
+
+    def key(self, tag):
+        return self._key_by_tag.get(tag)
+
+    def tags(self):
+        return self._key_by_tag.keys()
+
+    @staticmethod
+    def tag_options(key):
+        """Параметры tag_configure для стиля с ключом key."""
+        font_name, size, bold, italic, underline, color = key
+        font_spec = [font_name, size]
+        if bold:
+            font_spec.append("bold")
+        if italic:
+            font_spec.append("italic")
+        return {"font": tuple(font_spec), "underline": underline, "foreground": color}
@@ -0,0 +1,169 @@
+"""Клиент совместной правки: соединение с сервером SyncServer из редактора.
+
+Сетевой обмен идёт в цикле asyncio в отдельном потоке; полученные сообщения
+передаются в поток Tk через очередь, которую он опрашивает, как BackgroundTask.
+SyncSession хранит состояние клиента (ClientState): локальные правки
+отправляются по одной пачке за раз, правки других клиентов преобразуются
+относительно ещё не подтверждённых локальных.
+"""
+import asyncio
+import json
+import queue
+import threading
+
+from FileTasks import POLL_DELAY
+from SyncOperations import ClientState, Delta
+from SyncServer import MESSAGE_LIMIT, encode_message
+
+
+class SyncConnection:
+    """Соединение в рабочем потоке; on_message(message) и on_closed(error) вызываются в потоке Tk."""
+
+    def __init__(self, root, address, hello, on_message, on_closed):
+        self.root = root
+        self.address = address
+        self.hello = hello
+        self.on_message = on_message
+        self.on_closed = on_closed
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.job = None
+        self.closing = False
+        self._loop = None
+        self._writer = None
+        self._events = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self.job = self.root.after(POLL_DELAY, self._poll)
+
+    def send(self, message):
+        data = encode_message(message)
+        self.bytes_sent += len(data)
+        self._call(self._writer.write, data)
+
+    def close(self):
+        self.closing = True
+        if self._writer is not None:
+            self._call(self._writer.close)
+
+    def _call(self, callback, *args):
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass  # Цикл уже завершён: о закрытии соединения сообщит _poll
+
+    # --- Рабочий поток ---
+
+    def _run(self):
+        try:
+            asyncio.run(self._main())
+            self._events.put(("closed", None))
+        except Exception as e:
+            self._events.put(("closed", e))
+
+    async def _main(self):
+        if self.address[0] == "unix":
+            reader, writer = await asyncio.open_unix_connection(self.address[1], limit=MESSAGE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(self.address[1], self.address[2], limit=MESSAGE_LIMIT)
+        self._loop = asyncio.get_running_loop()
+        self._writer = writer
+        if self.closing:
+            writer.close()
+            return
+        data = encode_message(self.hello)
+        self.bytes_sent += len(data)
+        writer.write(data)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.bytes_received += len(line)
+                self._events.put(("message", json.loads(line)))
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # --- Поток интерфейса ---
+
+    def _poll(self):
+        self.job = None
+        while True:
+            try:
+                kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "closed":
+                self.on_closed(value)
+                return
+            self.on_message(value)
+        self.job = self.root.after(POLL_DELAY, self._poll)
+
+
+class SyncSession:
+    """Совместная правка одного документа.
+
+    on_welcome(document_json) — сервер прислал документ (None — принят наш),
+    on_remote(deltas) — правки других клиентов для применения к документу,
+    on_closed(error) — соединение закрыто.
+    """
+
+    def __init__(self, root, address, document_json, on_welcome, on_remote, on_closed):
+        self.address = address
+        self.on_welcome = on_welcome
+        self.on_remote = on_remote
+        self.on_closed = on_closed
+        self.state = None  # ClientState после приветствия сервера
+        self._early = []  # Правки, сделанные до приветствия
+        self.connection = SyncConnection(root, address, {"t": "hello", "doc": document_json},
+                                         self._on_message, self._on_connection_closed)
+
+    def start(self):
+        self.connection.start()
+
+    def close(self):
+        self.connection.close()
+
+    @property
+    def connected(self):
+        return self.state is not None
+
+    def record(self, delta):
+        """Локальная правка документа."""
+        if self.state is None:
+            self._early.append(delta)
+            return
+        batch = self.state.local(delta)
+        if batch:
+            self._send(batch)
+
+    def _send(self, deltas):
+        self.connection.send({"t": "op", "rev": self.state.revision, "ops": [delta.to_json() for delta in deltas]})
+
+    def _on_message(self, message):
+        kind = message["t"]
+        if kind == "welcome":
+            self.state = ClientState(message["rev"])
+            self.on_welcome(message["doc"])
+            early, self._early = self._early, []
+            if message["doc"] is None:
+                # Сервер принял наш документ: правки, сделанные после его отправки, ещё нужны
+                for delta in early:
+                    self.record(delta)
+        elif self.state is None:
+            return
+        elif kind == "ack":
+            batch = self.state.ack(message["rev"])
+            if batch:
+                self._send(batch)
+        elif kind == "op":
+            deltas = self.state.remote([Delta.from_json(data) for data in message["ops"]], message["rev"])
+            self.on_remote(deltas)
+
+    def _on_connection_closed(self, error):
+        self.state = None
+        self.on_closed(error)
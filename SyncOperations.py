@@ -0,0 +1,254 @@
+"""Операции совместной правки и их преобразование (operational transformation).
+
+Правка описывается дельтой — последовательностью компонентов от начала
+текста:
+    ("r", n, key)   — пропустить n символов; если key не None — назначить им стиль key;
+    ("i", text, key) — вставить text со стилем key;
+    ("d", n)        — удалить n символов.
+Хвост текста после последнего компонента не меняется, поэтому размер
+дельты зависит от правки, а не от длины документа.
+
+Порядок правок задаёт сервер. Клиент отправляет правки вместе с номером
+ревизии, от которой они сделаны; сервер преобразует их относительно правок,
+принятых после этой ревизии, и рассылает остальным. При вставке в одну
+позицию и при форматировании одного участка выигрывает правка, которую
+сервер принял раньше, — так все копии документа сходятся.
+
+В JSON компонент записывается компактно: n — пропуск, -n — удаление,
+[n, ключ] — форматирование, [текст, ключ] — вставка.
+"""
+import DocumentFormat
+
+INFINITY = float("inf")
+
+
+class _Cursor:
+    """Чтение компонентов дельты частями заданной длины."""
+
+    def __init__(self, ops):
+        self.ops = ops
+        self.index = 0
+        self.offset = 0  # Сколько символов текущего компонента уже прочитано
+
+    def has_next(self):
+        return self.index < len(self.ops)
+
+    def peek_type(self):
+        return self.ops[self.index][0] if self.has_next() else "r"
+
+    def peek_length(self):
+        if not self.has_next():
+            return INFINITY
+        return op_length(self.ops[self.index]) - self.offset
+
+    def next(self, length=INFINITY):
+        if not self.has_next():
+            return ("r", length, None)
+        op = self.ops[self.index]
+        start = self.offset
+        take = min(length, op_length(op) - start)
+        if start + take == op_length(op):
+            self.index += 1
+            self.offset = 0
+        else:
+            self.offset += take
+        if op[0] == "i":
+            return ("i", op[1][start:start + take], op[2])
+        if op[0] == "d":
+            return ("d", take)
+        return ("r", take, op[2])
+
+
+def op_length(op):
+    return len(op[1]) if op[0] == "i" else op[1]
+
+
+class Delta:
+    """Правка документа: компоненты пропуска, вставки и удаления (см. описание модуля)."""
+
+    __slots__ = ("ops",)
+
+    def __init__(self, ops=None):
+        self.ops = []
+        for op in ops or ():
+            self.push(op)
+
+    def __repr__(self):
+        return f"Delta({self.ops!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Delta) and self.ops == other.ops
+
+    # --- Построение ---
+
+    def push(self, op):
+        """Добавляет компонент, сливая его с предыдущим; вставка ставится перед соседним удалением."""
+        if op_length(op) <= 0:
+            return self
+        ops = self.ops
+        if op[0] == "i" and ops and ops[-1][0] == "d":
+            deleted = ops.pop()
+            self.push(op)
+            ops.append(deleted)
+            return self
+        if ops and ops[-1][0] == op[0]:
+            last = ops[-1]
+            if op[0] == "d":
+                ops[-1] = ("d", last[1] + op[1])
+                return self
+            if last[2] == op[2]:
+                ops[-1] = (op[0], last[1] + op[1], op[2])
+                return self
+        ops.append(op)
+        return self
+
+    def retain(self, length, key=None):
+        return self.push(("r", length, key))
+
+    def insert(self, text, key=DocumentFormat.DEFAULT_STYLE_KEY):
+        return self.push(("i", text, key))
+
+    def delete(self, length):
+        return self.push(("d", length))
+
+    def chop(self):
+        """Убирает пропуск в конце: он ничего не меняет."""
+        if self.ops and self.ops[-1][0] == "r" and self.ops[-1][2] is None:
+            self.ops.pop()
+        return self
+
+    def is_empty(self):
+        return not self.chop().ops
+
+    # --- Преобразование и применение ---
+
+    def transform(self, other, priority):
+        """Преобразует other, сделанную от того же состояния, чтобы её можно было применить после self.
+
+        priority — self считается принятой раньше: её вставка в ту же позицию
+        стоит левее, а её стиль на общем участке сохраняется.
+        """
+        mine, theirs, result = _Cursor(self.ops), _Cursor(other.ops), Delta()
+        while mine.has_next() or theirs.has_next():
+            if mine.peek_type() == "i" and (priority or theirs.peek_type() != "i"):
+                result.retain(op_length(mine.next()))
+            elif theirs.peek_type() == "i":
+                result.push(theirs.next())
+            else:
+                length = min(mine.peek_length(), theirs.peek_length())
+                my_op = mine.next(length)
+                their_op = theirs.next(length)
+                if my_op[0] == "d":
+                    continue  # Участок уже удалён — их пропуск или удаление ему не нужны
+                if their_op[0] == "d":
+                    result.delete(length)
+                elif priority and my_op[2] is not None:
+                    result.retain(length)
+                else:
+                    result.retain(length, their_op[2])
+        return result.chop()
+
+    def apply(self, document):
+        """Применяет дельту к модели документа (Document)."""
+        position = 0
+        for op in self.ops:
+            if op[0] == "r":
+                if op[2] is not None:
+                    document.set_style(position, position + op[1], op[2])
+                position += op[1]
+            elif op[0] == "i":
+                document.insert(position, op[1], op[2])
+                position += len(op[1])
+            else:
+                document.delete(position, op[1])
+
+    # --- JSON ---
+
+    def to_json(self):
+        data = []
+        for op in self.ops:
+            if op[0] == "d":
+                data.append(-op[1])
+            elif op[0] == "i":
+                data.append([op[1], list(op[2])])
+            elif op[2] is None:
+                data.append(op[1])
+            else:
+                data.append([op[1], list(op[2])])
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        delta = cls()
+        for item in data:
+            if isinstance(item, int):
+                delta.push(("r", item, None) if item > 0 else ("d", -item))
+            elif isinstance(item[0], str):
+                delta.push(("i", item[0], tuple(item[1])))
+            else:
+                delta.push(("r", item[0], tuple(item[1])))
+        return delta
+
+
+def insert_delta(offset, text, key=DocumentFormat.DEFAULT_STYLE_KEY):
+    return Delta().retain(offset).insert(text, key)
+
+
+def delete_delta(offset, length):
+    return Delta().retain(offset).delete(length)
+
+
+def format_delta(start, end, key):
+    return Delta().retain(start).retain(end - start, key)
+
+
+def transform_lists(client, server):
+    """Преобразует две серии дельт от общего состояния: (client после server, server после client).
+
+    Правки server приняты сервером раньше и имеют приоритет.
+    """
+    result = []
+    for delta in client:
+        transformed = []
+        for other in server:
+            delta, other = other.transform(delta, True), delta.transform(other, False)
+            transformed.append(other)
+        server = transformed
+        result.append(delta)
+    return result, server
+
+
+class ClientState:
+    """Состояние клиента: ревизия сервера, отправленные без подтверждения правки и правки, ждущие отправки.
+
+    Одновременно на сервере обрабатывается одна пачка правок клиента; новые
+    копятся в buffer и уходят после подтверждения.
+    """
+
+    def __init__(self, revision=0):
+        self.revision = revision
+        self.pending = []  # Отправлены, подтверждения ещё нет
+        self.buffer = []  # Ждут отправки
+
+    def local(self, delta):
+        """Локальная правка; возвращает пачку для отправки (или None, если ждём подтверждения)."""
+        if self.pending:
+            self.buffer.append(delta)
+            return None
+        self.pending = [delta]
+        return self.pending
+
+    def ack(self, revision):
+        """Сервер принял пачку; возвращает следующую пачку для отправки или None."""
+        self.revision = revision
+        self.pending, self.buffer = self.buffer, []
+        return self.pending or None
+
+    def remote(self, deltas, revision):
+        """Правки другого клиента; возвращает их в виде, применимом к локальному документу."""
+        self.revision = revision
+        if self.pending:
+            self.pending, deltas = transform_lists(self.pending, deltas)
+        if self.buffer:
+            self.buffer, deltas = transform_lists(self.buffer, deltas)
+        return deltas
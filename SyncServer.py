@@ -0,0 +1,210 @@
+"""Сервер совместной правки: asyncio-ретранслятор правок поверх TCP или Unix-сокета.
+
+Сервер хранит копию документа и журнал последних правок. Сообщения — строки
+JSON, по одной на строку:
+    клиент -> сервер:
+        {"t": "hello", "doc": документ или null} — документ передаёт первый
+            клиент, открывший доступ; остальные получают копию сервера;
+        {"t": "op", "rev": ревизия, "ops": [дельта, ...]} — правки, сделанные
+            от ревизии rev;
+    сервер -> клиент:
+        {"t": "welcome", "rev": ревизия, "doc": документ или null} — null, если
+            принят документ самого клиента;
+        {"t": "ack", "rev": ревизия} — правки отправителя приняты;
+        {"t": "op", "rev": ревизия, "ops": [...]} — правки другого клиента.
+Правки, сделанные от ревизии, которой уже нет в журнале, не принимаются:
+клиенту заново отправляется документ (welcome).
+
+Запуск отдельно от редактора:
+    python TextEditorCore.py sync-server [--host 127.0.0.1] [--port 8765] [--unix ПУТЬ]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from collections import deque
+
+from Document import Document
+from SyncOperations import Delta, transform_lists
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+LOG_LIMIT = 1000  # Ревизий в журнале сервера
+MESSAGE_LIMIT = 256 * 1024 * 1024  # Наибольшая длина строки сообщения (документ целиком)
+START_TIMEOUT = 5  # Секунд на запуск локального сервера
+
+
+def parse_address(text):
+    """Адрес из строки: "unix:ПУТЬ", "хост:порт" или "порт" -> ("unix", путь) или ("tcp", хост, порт)."""
+    text = text.strip()
+    if text.startswith("unix:"):
+        return ("unix", text[len("unix:"):])
+    host, _, port = text.rpartition(":")
+    return ("tcp", host or DEFAULT_HOST, int(port))
+
+
+def format_address(address):
+    return f"unix:{address[1]}" if address[0] == "unix" else f"{address[1]}:{address[2]}"
+
+
+def encode_message(message):
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class SyncServer:
+    """Документ, журнал правок и подключённые клиенты; работает в одном цикле asyncio."""
+
+    def __init__(self, document=None, log_limit=LOG_LIMIT):
+        self.document = document
+        self.revision = 0
+        self.log = deque(maxlen=log_limit)  # Списки дельт ревизий revision - len(log) + 1 ... revision
+        self.clients = {}  # Номер клиента -> StreamWriter
+        self.next_client = 1
+
+    async def handle(self, reader, writer):
+        client = self.next_client
+        self.next_client += 1
+        self.clients[client] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message["t"] == "hello":
+                    await self.welcome(writer, message.get("doc"))
+                elif message["t"] == "op":
+                    await self.receive(client, writer, message)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"[ERROR] Неверное сообщение клиента {client}: {e}")
+        finally:
+            del self.clients[client]
+            writer.close()
+
+    async def welcome(self, writer, data=None):
+        if self.document is None and data is not None:
+            self.document = Document.from_json(data)
+            document = None  # Клиент уже работает с этим документом
+        else:
+            if self.document is None:
+                self.document = Document()
+            document = self.document.to_json()
+        writer.write(encode_message({"t": "welcome", "rev": self.revision, "doc": document}))
+        await writer.drain()
+
+    async def receive(self, client, writer, message):
+        base = message["rev"]
+        missed = self.revision - base
+        if self.document is None or missed < 0 or missed > len(self.log):
+            await self.welcome(writer)
+            return
+        deltas = [Delta.from_json(data) for data in message["ops"]]
+        concurrent = [delta for index in range(len(self.log) - missed, len(self.log)) for delta in self.log[index]]
+        if concurrent:
+            deltas, _ = transform_lists(deltas, concurrent)
+        for delta in deltas:
+            delta.apply(self.document)
+        self.revision += 1
+        self.log.append(deltas)
+        writer.write(encode_message({"t": "ack", "rev": self.revision}))
+        data = encode_message({"t": "op", "rev": self.revision, "ops": [delta.to_json() for delta in deltas]})
+        for other, other_writer in self.clients.items():
+            if other != client:
+                other_writer.write(data)
+        await writer.drain()
+
+
+async def start(address, server):
+    """Начинает слушать адрес; возвращает asyncio.Server."""
+    if address[0] == "unix":
+        if os.path.exists(address[1]):
+            os.remove(address[1])
+        return await asyncio.start_unix_server(server.handle, path=address[1], limit=MESSAGE_LIMIT)
+    return await asyncio.start_server(server.handle, address[1], address[2], limit=MESSAGE_LIMIT)
+
+
+async def serve(address, server=None):
+    listener = await start(address, server or SyncServer())
+    async with listener:
+        await listener.serve_forever()
+
+
+class LocalServer:
+    """Сервер в отдельном потоке внутри редактора: открыть доступ без запуска отдельного процесса."""
+
+    def __init__(self, address):
+        self.address = address
+        self.server = SyncServer()
+        self._loop = None
+        self._listener = None
+        self._started = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """Запускает сервер и ждёт, пока он начнёт слушать; ошибка запуска выбрасывается здесь."""
+        self._thread.start()
+        if not self._started.wait(START_TIMEOUT):
+            raise TimeoutError("Сервер не запустился")
+        if self._error is not None:
+            raise self._error
+        if self.address[0] == "tcp":
+            # Порт 0 — система выбирает свободный порт
+            self.address = ("tcp", self.address[1], self._listener.sockets[0].getsockname()[1])
+        return self.address
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._listener = self._loop.run_until_complete(start(self.address, self.server))
+        except Exception as e:
+            self._error = e
+            self._started.set()
+            self._loop.close()
+            return
+        self._started.set()
+        try:
+            self._loop.run_until_complete(self._listener.serve_forever())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    def stop(self):
+        if self._listener is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._close)
+
+    def _close(self):
+        self._listener.close()
+        for writer in list(self.server.clients.values()):
+            writer.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="sync-server", description="Сервер совместной правки документов")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="адрес для TCP")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="порт TCP")
+    parser.add_argument("--unix", help="путь Unix-сокета (вместо TCP)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    address = ("unix", args.unix) if args.unix else ("tcp", args.host, args.port)
+    print(f"Сервер совместной правки: {format_address(address)}")
+    try:
+        asyncio.run(serve(address))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"[ERROR] Не удалось запустить сервер: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,121 @@
-import json
 import os
+import re
+import sys
+import time
 import tkinter as tk
-
-from tkinter import filedialog, font, messagebox, colorchooser
-from PIL import Image, ImageTk
+from functools import partial
+
+from tkinter import filedialog, font, messagebox, colorchooser, ttk
+
+import DocumentCodec
+import DocumentFormat
+import FontCache
+from Autosave import Autosave, AutosaveSession, default_directory, orphaned_sessions, recover_session, remove_session
+from Document import Document, OBJECT_REPLACEMENT
+from DocumentTabs import MEMORY_BUDGET, UNTITLED, DocumentTab, TabManager, pack_document, unpack_document
+from EditEvents import EditDispatcher
+import FileTasks
+from FileLoader import ChunkedLoader
+from FileTasks import BackgroundTask
+from Highlighter import EXTENSIONS as LEXER_EXTENSIONS, LEXERS, Highlighter, guess_lexer
+from ImageManager import ImageManager, read_image_file
+from LargeFileView import LargeFileView
+import Profiler
+from SearchEngine import SearchEngine, SearchOptions, find_replacements
+from StyleRegistry import StyleRegistry
+from SyncClient import SyncSession
+from SyncOperations import delete_delta, format_delta, insert_delta
+from SyncServer import DEFAULT_HOST, DEFAULT_PORT, LocalServer, format_address, parse_address
+from TextStats import TextStats
+from UndoHistory import FormatDelta, UndoHistory, describe_entry
+
+
+# Теги, которые не относятся к форматированию и не попадают в историю
+NON_FORMAT_TAGS = ("sel", "highlight", "current_match")
+
+# Задержки (мс) полного пересчёта статистики и подсчёта статистики выделения
+STATS_RECOUNT_DELAY = 3000
+SELECTION_STATS_DELAY = 100
+# Выше этого числа символов полный пересчёт статистики не выполняется
+STATS_RECOUNT_LIMIT = 20_000_000
+
+# Файлы от этого размера (байт) предлагается открыть в режиме просмотра
+LARGE_FILE_THRESHOLD = 100 * 1024 * 1024
+
+# Поиск: задержка перед поиском при наборе (мс), запас строк вокруг видимой области
+# и число диапазонов в одном вызове tag_add
+SEARCH_DELAY = 150
+SEARCH_MARGIN_LINES = 50
+HIGHLIGHT_BATCH = 500
+
+# Задержка (мс) перед удалением неиспользуемых составных тегов
+PRUNE_TAGS_DELAY = 5000
+
+# Записей истории в списке окна "История правок"
+HISTORY_LIST_SIZE = 200
+
+# Задержка (мс) перед усыплением неактивных вкладок сверх бюджета памяти
+HIBERNATE_DELAY = 2000
+
+# Период (мс) проверки ошибок записи автосохранения и заголовок вкладки восстановленного документа
+AUTOSAVE_CHECK_DELAY = 5000
+RECOVERED_TITLE = "Восстановленный документ"
+
+# Текстовые файлы: кроме TXT открываются журналы и конфигурации, для которых есть подсветка;
+# по началу файла угадывается лексер
+TEXT_EXTENSIONS = (".txt",) + tuple(LEXER_EXTENSIONS)
+TEXT_FILE_PATTERNS = " ".join(f"*{extension}" for extension in TEXT_EXTENSIONS)
+LEXER_SAMPLE_SIZE = 4096
+
+# Иконка кнопки цвета ищется рядом с модулем, а не в текущем каталоге
+PALETTE_ICON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "palette.png")
+PALETTE_ICON_SIZE = (24, 24)
+
+# Обработчики, время и вызовы Tcl которых замеряет профилирование (меню "Вид")
+PROFILED_HANDLERS = (
+    "text_proxy", "update_status_bar", "on_view_scrolled", "run_search", "highlight_visible_matches",
+    "search_after_edit", "recount_after_edit", "recount_stats", "update_selection_stats",
+    "text_to_json", "json_to_text", "show_document", "open_document", "insert_loaded_chunk",
+    "undo", "redo", "apply_history_entry", "restyle_selection", "apply_replacements",
+    "load_visible_images", "embed_image", "prune_tags", "show_tab",
+)
+
+
+def add_range(ranges_by_tag, tag, start, end):
+    """Добавляет диапазон тега, сливая его с предыдущим, если они соприкасаются."""
+    ranges = ranges_by_tag.setdefault(tag, [])
+    if ranges and ranges[-1][1] == start:
+        ranges[-1] = (ranges[-1][0], end)
+    else:
+        ranges.append((start, end))
 
 
 class TextEditor:
-    def __init__(self, root):
+    def __init__(self, root, history_limit=32 * 1024 * 1024, autosave=True, autosave_dir=None,
+                 tab_memory_budget=MEMORY_BUDGET):
         self.root = root
         self.root.title("Текстовый редактор")
         self.root.geometry("1500x700")
         self.root.resizable(False, False)
 
+        # Обработчики оборачиваются до того, как попадут в привязки и команды виджетов
+        self.profiler = Profiler.Profiler(self.root)
+        self.profiler.instrument(self, PROFILED_HANDLERS)
+
         self.is_fullscreen = False  # Флаг для отслеживания полноэкранного режима
 
         # Создание текстового виджета (но не pack)
-        self.text_area = tk.Text(self.root, wrap=tk.WORD, undo=True, font=("Arial", 12))
+        self.text_area = tk.Text(self.root, wrap=tk.WORD, undo=False, font=("Arial", 12))
+        self.text_command = self.text_area._w  # Tcl-команда виджета (после перехвата — исходная)
 
         # Панель инструментов
         self.create_toolbar()
 
+        # Вкладки документов: все они показываются в одном текстовом виджете
+        self.tab_bar = ttk.Notebook(self.root)
+        self.tab_bar.pack(side=tk.TOP, fill=tk.X, padx=5)
+        self.tab_bar.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
         # Текстовый виджет
         self.text_area.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 0))
 
@@ -28,32 +123,192 @@ class TextEditor:
         self.status_bar = tk.Label(self.root, text="Строк: 1 Слов: 0 Символов: 0", anchor=tk.E)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
-        # Обновление статуса
-        self.text_area.bind("<KeyRelease>", self.update_status_bar)
-        self.text_area.bind("<Control-z>", lambda event: self.undo())
+        # Индикатор фоновой операции с файлом и кнопка её отмены (показываются только во время операции)
+        self.progress_frame = tk.Frame(self.root)
+        self.progress_label = tk.Label(self.progress_frame, anchor=tk.W)
+        self.progress_label.pack(side=tk.LEFT, padx=5)
+        self.progress_bar = ttk.Progressbar(self.progress_frame, length=300, maximum=100)
+        self.progress_bar.pack(side=tk.LEFT, padx=5)
+        tk.Button(self.progress_frame, text="Отмена", command=self.cancel_loading).pack(side=tk.LEFT, padx=5)
+
+        # Модель документа: виджет лишь отображает её, правки в виджете зеркалируются в неё
+        self.document = Document()
+
+        # Статистика документа обновляется по каждой правке, а не пересчётом всего текста
+        self.stats = TextStats()
+        self.selection_stats = None
+        self.recount_job = None
+        self.selection_job = None
+
+        # Правки и перемещения курсора копятся и раз в паузу рассылаются подписчикам
+        self.edit_events = EditDispatcher(self.root)
+        self.edit_events.subscribe(lambda ranges: self.update_status_bar())
+        self.edit_events.subscribe(self.recount_after_edit)
+        self.edit_events.subscribe(self.search_after_edit)
+        self.edit_events.subscribe(lambda ranges: self.refresh_history())
+
+        self.loader = None  # Потоковая загрузка TXT-файла, если она идёт
+        self.file_task = None  # Фоновое открытие или сохранение файла, если оно идёт
+        self.large_file = None  # Режим просмотра большого файла
+
+        # Поиск по тексту
+        self.search_engine = SearchEngine()
+        self.search_window = None
+        self.search_label = None
+        self.search_query = tk.StringVar()
+        self.search_regex = tk.BooleanVar(value=False)
+        self.search_case = tk.BooleanVar(value=True)
+        self.search_word = tk.BooleanVar(value=False)
+        self.search_job = None
+        self.highlight_job = None
+
+        # Окно истории правок
+        self.history_window = None
+        self.history_summary = None
+        self.history_list = None
+        self.text_area.configure(yscrollcommand=self.on_view_scrolled)
+        self.text_area.bind("<Configure>", self.on_view_scrolled)
+
+        # Обновление статуса: курсор сдвинулся — строка состояния обновится после паузы
+        self.text_area.bind("<KeyRelease>", self.edit_events.record_cursor)
+        self.text_area.bind("<ButtonRelease-1>", self.edit_events.record_cursor)
+        self.text_area.bind("<<Selection>>", self.on_selection_changed)
+        self.text_area.bind("<Control-z>", self.undo)
+        self.text_area.bind("<Control-y>", self.redo)
 
         # Главное меню
         self.create_menu()
 
-        self.history = []  # Стек для хранения истории действий
-        self.redo_stack = []  # Стек для повторения отменённых действий
-        self.is_restoring = False  # Флаг, чтобы избежать зацикливания
-
-        # Сохранение действий
-        self.text_area.bind("<KeyRelease>", lambda event: self.record_change(event, "text"))
-        self.text_area.bind("<ButtonRelease-1>", lambda event: self.record_change(event, "format"))
+        self.history_limit = history_limit
+        self.history = UndoHistory(max_bytes=history_limit)  # История правок в виде дельт
+
+        # Автосохранение: у каждой вкладки свой журнал, правки пишутся в фоновом потоке.
+        # Журналы лежат в каталоге сеанса, чтобы несколько редакторов не затирали журналы друг друга.
+        # autosave=False отключает автосохранение, autosave_dir=None — каталог по умолчанию в домашнем каталоге
+        self.autosave_dir = autosave_dir if autosave_dir is not None else default_directory()
+        self.autosave_session = None  # None — автосохранение отключено
+        self.autosave = None  # Журнал текущей вкладки
+        self.autosave_warned = False  # Об ошибке записи предупреждаем окном один раз
+        if autosave:
+            try:
+                self.autosave_session = AutosaveSession(self.autosave_dir)
+            except OSError as e:
+                print(f"[ERROR] Автосохранение отключено: {e}")
+            else:
+                self.root.after(AUTOSAVE_CHECK_DELAY, self.check_autosave)
+
+        # Первая вкладка — текущий документ; неактивные вкладки сверх бюджета сжимаются
+        self.tabs = TabManager(tab_memory_budget)
+        self.tab_frames = {}  # Вкладка -> пустая рамка вкладки в tab_bar
+        self.hibernate_job = None
+        self.tabs.activate(self.add_tab(DocumentTab(UNTITLED, self.document, self.history)))
+        self.autosave = self.tabs.active.autosave
+        self.is_restoring = False  # Флаг, чтобы собственные правки не попадали в историю
+        self.is_loading = False  # Флаг, чтобы загрузка документа не попадала в журнал автосохранения
+
+        # Совместная правка: сессия, вкладка с общим документом и сервер, если доступ открыт из редактора
+        self.sync = None
+        self.sync_tab = None
+        self.sync_server = None
+        self.applying_remote = False  # Флаг, чтобы чужие правки не отправлялись обратно
+
+        self.style_registry = StyleRegistry()  # Стиль <-> составной тег
+        self.configured_tags = set()  # Составные теги, настроенные в виджете
+        self.prune_job = None
+
+        self.images = ImageManager(self.root)  # Декодирование и кэш встроенных картинок
+        self.image_load_job = None
+        self.image_marks = 0  # Счётчик меток мест, куда вставляются картинки
+
+        # Сохранение действий: перехватываем вставку и удаление текста в самом виджете
+        self.install_text_hook()
+
+        # Подсветка синтаксиса: теги ставятся исходной командой виджета, мимо документа и истории
+        self.highlighter = Highlighter(self.root, self.text_area, self.text_command)
+        self.highlighter.run = self.profiler.wrap("highlighter.run", self.highlighter.run)
+        self.edit_events.subscribe(lambda ranges: self.highlighter.schedule())
 
         # Привязка горячих клавиш
         self.bind_shortcuts()
 
+        if self.profiling_var.get():
+            self.toggle_profiling()
+
+        self.root.protocol("WM_DELETE_WINDOW", self.confirm_exit)
+
+        # Список шрифтов, иконка и восстановление после сбоя — после первой отрисовки окна
+        self.text_area.bind("<Expose>", self.on_first_paint)
+
+    def on_first_paint(self, event=None):
+        """Окно отрисовано: запускаем то, что не нужно для его первого показа."""
+        self.text_area.unbind("<Expose>")
+        # Отложенный вызов выполнится после перерисовки, запланированной этим событием
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        self.load_palette_icon()
+        self.load_font_families()
+        self.offer_recovery()
+
+    def load_palette_icon(self):
+        try:
+            from PIL import Image, ImageTk
+
+            with Image.open(PALETTE_ICON) as image:
+                palette_icon = ImageTk.PhotoImage(image.resize(PALETTE_ICON_SIZE))
+        except Exception as e:
+            print(f"[ERROR] Не удалось загрузить иконку цвета: {e}")
+            return
+        self.color_button.config(image=palette_icon)
+        self.color_button.image = palette_icon  # Сохраняем ссылку на изображение
+
+    def load_font_families(self):
+        """Читает список шрифтов из кэша в фоне; при устаревшем кэше строит его заново."""
+        def failed(error):
+            print(f"[ERROR] Не удалось прочитать кэш шрифтов: {error}")
+            self.set_font_families(None, None)
+
+        BackgroundTask(
+            self.root, lambda task: FontCache.read_cache(),
+            lambda result: self.set_font_families(*result), failed,
+        ).start()
+
+    def set_font_families(self, fingerprint, families):
+        if families is None:
+            families = FontCache.normalize_families(font.families(self.root))
+            if fingerprint is not None:
+                FontCache.save_families(families, fingerprint)
+        self.font_families = families
+        self.filter_font_families()
+
+    def filter_font_families(self, event=None):
+        """Оставляет в списке шрифты, название которых содержит введённый текст."""
+        if event is not None and event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        query = self.font_var.get().strip().casefold()
+        if query in (family.casefold() for family in self.font_families):
+            query = ""  # Выбран шрифт целиком — показываем весь список
+        matches = [family for family in self.font_families if query in family.casefold()]
+        self.font_box["values"] = matches or self.font_families
+
     def create_menu(self):
         menu = tk.Menu(self.root)
 
         # Меню Файл
         file_menu = tk.Menu(menu, tearoff=0)
+        file_menu.add_command(label="Новая вкладка", command=self.new_tab, accelerator="Ctrl+N")
+        file_menu.add_command(label="Закрыть вкладку", command=self.close_tab, accelerator="Ctrl+W")
+        file_menu.add_separator()
         file_menu.add_command(label="Открыть", command=self.open_file)
+        file_menu.add_command(label="Открыть большой файл", command=self.open_large_file)
         file_menu.add_command(label="Сохранить как", command=self.save_file)
         file_menu.add_separator()
+        sync_menu = tk.Menu(file_menu, tearoff=0)
+        sync_menu.add_command(label="Открыть доступ...", command=self.share_document)
+        sync_menu.add_command(label="Подключиться...", command=self.join_shared_document)
+        sync_menu.add_command(label="Отключиться", command=self.stop_sync)
+        file_menu.add_cascade(label="Совместная правка", menu=sync_menu)
+        file_menu.add_separator()
         file_menu.add_command(label="Выход", command=self.confirm_exit)
         menu.add_cascade(label="Файл", menu=file_menu)
 
@@ -61,9 +316,11 @@ class TextEditor:
         edit_menu = tk.Menu(menu, tearoff=0)
         edit_menu.add_command(label="Отменить", command=self.undo, accelerator="Ctrl+Z")
         edit_menu.add_command(label="Повторить", command=self.redo, accelerator="Ctrl+Y")
+        edit_menu.add_command(label="История правок", command=self.show_history)
         edit_menu.add_separator()
         edit_menu.add_command(label="Поиск", command=self.search_text, accelerator="Ctrl+F")
         edit_menu.add_command(label="Поиск и замена", command=self.find_and_replace, accelerator="Ctrl+H")
+        edit_menu.add_command(label="Перейти к строке", command=self.goto_line, accelerator="Ctrl+G")
         menu.add_cascade(label="Правка", menu=edit_menu)
 
         # Меню Вид
@@ -72,6 +329,19 @@ class TextEditor:
         self.view_menu.add_command(label="Светлая тема", command=self.light_mode)
         self.view_menu.add_separator()
         self.view_menu.add_command(label="Полноэкранный режим", command=self.toggle_fullscreen)
+        self.view_menu.add_separator()
+        highlight_menu = tk.Menu(self.view_menu, tearoff=0)
+        self.lexer_var = tk.StringVar(value="")
+        highlight_menu.add_radiobutton(label="Нет", value="", variable=self.lexer_var, command=self.choose_lexer)
+        for name, lexer in LEXERS.items():
+            highlight_menu.add_radiobutton(label=lexer.title, value=name, variable=self.lexer_var,
+                                           command=self.choose_lexer)
+        self.view_menu.add_cascade(label="Подсветка", menu=highlight_menu)
+        self.view_menu.add_separator()
+        self.profiling_var = tk.BooleanVar(value=bool(os.environ.get(Profiler.ENV_VARIABLE)))
+        self.view_menu.add_checkbutton(label="Профилирование", variable=self.profiling_var,
+                                       command=self.toggle_profiling)
+        self.view_menu.add_command(label="Сохранить профиль...", command=self.save_profile)
         menu.add_cascade(label="Вид", menu=self.view_menu)
 
         # Установка меню
@@ -81,12 +351,13 @@ class TextEditor:
         toolbar = tk.Frame(self.root, bd=1, relief=tk.RAISED, bg="#f0f0f0")
         toolbar.pack(side=tk.TOP, fill=tk.X)
 
-        # Шрифт
+        # Шрифт: список заполняется после первой отрисовки окна, ввод в поле фильтрует его
         tk.Label(toolbar, text="Шрифт:").pack(side=tk.LEFT, padx=5)
-        font_list = list(font.families())
         self.font_var = tk.StringVar(value="Arial")
-        font_menu = tk.OptionMenu(toolbar, self.font_var, *font_list)
-        font_menu.pack(side=tk.LEFT, padx=5)
+        self.font_families = []
+        self.font_box = ttk.Combobox(toolbar, textvariable=self.font_var, width=24)
+        self.font_box.bind("<KeyRelease>", self.filter_font_families)
+        self.font_box.pack(side=tk.LEFT, padx=5)
 
         # Разделитель
         separator = tk.Frame(toolbar, width=2, bd=1, relief=tk.SUNKEN, bg="gray")
@@ -102,14 +373,9 @@ class TextEditor:
         separator = tk.Frame(toolbar, width=2, bd=1, relief=tk.SUNKEN, bg="gray")
         separator.pack(side=tk.LEFT, fill=tk.Y, padx=5, pady=2)
 
-        # Загрузка иконки для цвета текста
-        image = Image.open("palette.png").resize((24, 24))
-        palette_icon = ImageTk.PhotoImage(image)
-
-        # Кнопка цвета текста с иконкой
-        color_button = tk.Button(toolbar, image=palette_icon, command=self.change_text_color)
-        color_button.image = palette_icon  # Сохраняем ссылку на изображение
-        color_button.pack(side=tk.LEFT, padx=5)
+        # Кнопка цвета текста: иконка загружается после первой отрисовки окна
+        self.color_button = tk.Button(toolbar, text="Цвет", command=self.change_text_color)
+        self.color_button.pack(side=tk.LEFT, padx=5)
 
         # Разделитель
         separator = tk.Frame(toolbar, width=2, bd=1, relief=tk.SUNKEN, bg="gray")
@@ -159,25 +425,145 @@ class TextEditor:
         # Обновляем текст пункта меню
         self.view_menu.entryconfig(3, label="Оконный режим" if self.is_fullscreen else "Полноэкранный режим")
 
+    def choose_lexer(self):
+        """Пользователь выбрал подсветку в меню "Вид"."""
+        if self.large_file is not None:
+            self.lexer_var.set("")
+            messagebox.showwarning("Подсветка", "В режиме просмотра большого файла подсветка недоступна.")
+            return
+        self.set_tab_lexer(self.lexer_var.get() or None)
+
+    def set_tab_lexer(self, name):
+        """Запоминает лексер во вкладке и подсвечивает текст заново."""
+        self.tabs.active.lexer = name
+        self.lexer_var.set(name or "")
+        self.highlighter.set_lexer(name)
+
+    def toggle_profiling(self):
+        """Включает или выключает замеры обработчиков и панель с задержками."""
+        try:
+            self.profiler.set_enabled(self.profiling_var.get())
+        except Exception as e:
+            self.profiling_var.set(self.profiler.enabled)
+            messagebox.showerror("Ошибка", f"Не удалось включить профилирование: {e}")
+
+    def save_profile(self):
+        """Сохраняет профиль последних секунд: .prof — для pstats, .folded — для flamegraph."""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".prof",
+            filetypes=[("cProfile", "*.prof"), ("Свёрнутые стеки (flamegraph)", "*.folded")],
+        )
+        if not file_path:
+            return
+        try:
+            self.profiler.dump(file_path)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить профиль: {e}")
+
     def insert_image(self):
-        """Вставляет изображение в позицию курсора."""
+        """Вставляет изображение в позицию курсора; файл читается и масштабируется в фоне."""
+        if self.large_file is not None:
+            messagebox.showwarning("Ошибка", "Файл открыт только для просмотра.")
+            return
         file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg;*.gif;*.bmp")])
         if file_path:
             try:
                 # Запрос ширины и высоты изображения
                 width = int(self.simple_input("Введите ширину картинки:", "400"))
                 height = int(self.simple_input("Введите высоту картинки:", "300"))
-
-                # Открытие и изменение размера изображения
-                image = Image.open(file_path)
-                image = image.resize((width, height), Image.Resampling.LANCZOS)
-                self.photo_image = ImageTk.PhotoImage(image)
-
-                # Получаем текущую позицию курсора и вставляем изображение
-                cursor_position = self.text_area.index(tk.INSERT)
-                self.text_area.image_create(cursor_position, image=self.photo_image)
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось вставить изображение: {e}")
+                return
+
+            # Метка запоминает позицию курсора, пока картинка готовится
+            self.image_marks += 1
+            mark = f"image_insert_{self.image_marks}"
+            self.text_area.mark_set(mark, tk.INSERT)
+            self.text_area.mark_gravity(mark, tk.LEFT)
+            self.images.submit(
+                partial(read_image_file, file_path, width, height),
+                partial(self.image_loaded, mark, self.document), partial(self.image_failed, mark),
+            )
+
+    def image_loaded(self, mark, document, result):
+        """Встраивает прочитанную в фоне картинку на место метки mark."""
+        ref, data, image = result
+        index = self.text_area.index(mark)
+        self.text_area.mark_unset(mark)
+        if document is not self.document or self.large_file is not None:
+            return  # Пока картинка готовилась, открыли другой документ
+        self.document.add_image_data(ref[0], data)
+        self.embed_image(index, ref, self.images.add(ref, image))
+
+    def image_failed(self, mark, error):
+        self.text_area.mark_unset(mark)
+        messagebox.showerror("Ошибка", f"Не удалось вставить изображение: {error}")
+
+    def embed_image(self, index, ref, photo):
+        """Встраивает картинку с тегом её ключа; вставка отменяется одним шагом."""
+        self.history.begin_group()
+        try:
+            self.text_area.image_create(index, image=photo)
+            self.images.show(ref, photo)
+            change = self.begin_format_change(index, f"{index} +1c")
+            self.text_area.tag_add(self.images.tag(ref), index)
+            self.end_format_change(change)
+        finally:
+            self.history.end_group()
+        self.update_status_bar()
+
+    def show_images(self, start, end):
+        """Заменяет символы-заместители на участке [start, end) встроенными картинками-заглушками.
+
+        Правка идёт в обход перехвата: в документе картинки на этих местах уже есть.
+        """
+        call = self.root.tk.call
+        widget = self.text_command
+        for run_start, run_end, ref in self.document.images.runs(start, end):
+            if ref is None:
+                continue
+            for offset in range(run_start, run_end):
+                index = call(widget, "index", self.offset_to_index(offset))
+                if call(widget, "get", index) != OBJECT_REPLACEMENT:
+                    continue  # На этом месте уже встроенная картинка
+                tags = set(self.root.tk.splitlist(call(widget, "tag", "names", index)))
+                tags.add(self.images.tag(ref))
+                call(widget, "delete", index)
+                call(widget, "image", "create", index, "-image", str(self.images.placeholder(ref)))
+                for tag in tags:
+                    call(widget, "tag", "add", tag, index)
+        self.schedule_image_load()
+
+    def schedule_image_load(self):
+        if self.image_load_job is None:
+            self.image_load_job = self.root.after_idle(self.load_visible_images)
+
+    def load_visible_images(self):
+        """Декодирует картинки видимой области; картинки за её пределами остаются заглушками."""
+        self.image_load_job = None
+        if self.large_file is not None:
+            return
+        call = self.root.tk.call
+        widget = self.text_command
+        first = call(widget, "index", "@0,0")
+        last = call(widget, "index", f"@0,{self.text_area.winfo_height()} lineend")
+        items = self.root.tk.splitlist(call(widget, "dump", "-image", first, last))
+        for i in range(0, len(items), 3):
+            name, index = items[i + 1], items[i + 2]
+            if not self.images.is_placeholder(str(call(widget, "image", "cget", index, "-image"))):
+                continue
+            ref = self.document.image_at(self.index_to_offset(index))
+            data = self.document.image_data.get(ref[0]) if ref else None
+            if data is not None:
+                self.images.request(ref, data, partial(self.set_embedded_image, name, ref))
+
+    def set_embedded_image(self, name, ref, photo):
+        """Показывает декодированную картинку вместо заглушки (если картинку ещё не удалили)."""
+        try:
+            self.root.tk.call(self.text_command, "image", "configure", name, "-image", str(photo))
+        except tk.TclError:
+            return
+        self.images.show(ref, photo)
 
     def simple_input(self, prompt, default_value=""):
         """Запрашивает ввод у пользователя через окно."""
@@ -196,61 +582,199 @@ class TextEditor:
         input_window.wait_window()
         return input_var.get()
 
-    def search_text(self):
-        """Осуществляет поиск текста и подсвечивает найденные фрагменты."""
-
-        def find():
-            # Удаляем старое выделение
-            self.text_area.tag_remove("highlight", "1.0", tk.END)
-            search_query = search_entry.get()
-
-            if search_query:
-                start_pos = "1.0"
-                while True:
-                    # Ищем текст в тексте
-                    start_pos = self.text_area.search(search_query, start_pos, stopindex=tk.END)
-                    if not start_pos:
-                        break
-                    end_pos = f"{start_pos}+{len(search_query)}c"
-                    self.text_area.tag_add("highlight", start_pos, end_pos)
-                    start_pos = end_pos
-
-                # Настройка тега для подсветки
-                self.text_area.tag_configure("highlight", background="yellow", foreground="black")
+    def search_text(self, event=None):
+        """Открывает панель поиска: совпадения подсвечиваются по мере ввода запроса."""
+        if self.search_window is not None:
+            self.search_window.lift()
+            return
 
         # Создаём диалоговое окно для поиска
         search_window = tk.Toplevel(self.root)
         search_window.title("Поиск")
-        search_window.geometry("300x100")
+        search_window.geometry("360x190")
         search_window.transient(self.root)
         search_window.resizable(False, False)
+        search_window.protocol("WM_DELETE_WINDOW", self.close_search)
+        self.search_window = search_window
 
         tk.Label(search_window, text="Введите текст для поиска:").pack(pady=5)
-        search_entry = tk.Entry(search_window, width=30)
+        search_entry = tk.Entry(search_window, width=30, textvariable=self.search_query)
         search_entry.pack(pady=5)
+        search_entry.focus()
+        search_entry.bind("<KeyRelease>", self.schedule_search)
+        search_entry.bind("<Return>", lambda event: self.goto_search_match(forward=True))
+        search_entry.bind("<Shift-Return>", lambda event: self.goto_search_match(forward=False))
+
+        # Параметры поиска
+        options_frame = tk.Frame(search_window)
+        options_frame.pack()
+        for text, variable in (("Регулярное выражение", self.search_regex),
+                               ("Учитывать регистр", self.search_case),
+                               ("Слово целиком", self.search_word)):
+            tk.Checkbutton(options_frame, text=text, variable=variable,
+                           command=self.schedule_search).pack(side=tk.LEFT)
+
+        # Навигация по совпадениям и счётчик
+        buttons_frame = tk.Frame(search_window)
+        buttons_frame.pack(pady=5)
+        tk.Button(buttons_frame, text="◀ Предыдущее",
+                  command=lambda: self.goto_search_match(forward=False)).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons_frame, text="Следующее ▶",
+                  command=lambda: self.goto_search_match(forward=True)).pack(side=tk.LEFT, padx=5)
+        self.search_label = tk.Label(search_window, text="")
+        self.search_label.pack()
+
+        # Настройка тегов для подсветки
+        self.text_area.tag_configure("highlight", background="yellow", foreground="black")
+        self.text_area.tag_configure("current_match", background="orange", foreground="black")
+
+    def close_search(self):
+        """Закрывает панель поиска и снимает подсветку."""
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+            self.search_job = None
+        self.text_area.tag_remove("highlight", "1.0", tk.END)
+        self.text_area.tag_remove("current_match", "1.0", tk.END)
+        self.search_window.destroy()
+        self.search_window = None
+
+    def search_options(self):
+        return SearchOptions(self.search_regex.get(), self.search_case.get(), self.search_word.get())
+
+    def schedule_search(self, event=None):
+        """Откладывает поиск до паузы в наборе запроса или в правке текста."""
+        if self.search_window is None or self.large_file is not None:
+            return
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DELAY, self.run_search)
+
+    def run_search(self):
+        """Ищет запрос по тексту документа и подсвечивает совпадения в видимой области."""
+        self.search_job = None
+        engine = self.search_engine
+        text = self.document.text()  # Пока текст не менялся, возвращается тот же объект строки
+        try:
+            count = engine.search(text, self.search_query.get(), self.search_options())
+        except re.error:
+            self.search_label.config(text="Ошибка в регулярном выражении")
+            engine.search(text, "", self.search_options())
+            count = None
+        if count is not None:
+            self.search_label.config(text=f"Найдено: {count}" if self.search_query.get() else "")
+        self.highlight_visible_matches()
+
+    def highlight_visible_matches(self):
+        """Подсвечивает совпадения только в видимой области и запасе строк вокруг неё."""
+        self.highlight_job = None
+        if self.search_window is None or self.large_file is not None:
+            return
+        self.text_area.tag_remove("highlight", "1.0", tk.END)
+        self.text_area.tag_remove("current_match", "1.0", tk.END)
+        engine = self.search_engine
+        if not len(engine) or engine.text is None:
+            return
 
-        find_button = tk.Button(search_window, text="Найти", command=find)
-        find_button.pack(pady=5)
+        first_line = int(self.text_area.index("@0,0").split(".")[0])
+        last_line = int(self.text_area.index(f"@0,{self.text_area.winfo_height()}").split(".")[0])
+        view_start = f"{max(1, first_line - SEARCH_MARGIN_LINES)}.0"
+        view_end = self.text_area.index(f"{last_line + SEARCH_MARGIN_LINES}.0 lineend")
+        start_offset = self.index_to_offset(view_start)
+        end_offset = self.index_to_offset(view_end)
+
+        # Границы совпадений переводятся в индексы одним проходом по индексу строк, теги добавляются пачками
+        offsets = []
+        for match_start, match_end in engine.matches_between(start_offset, end_offset):
+            offsets += (match_start, match_end)
+        ranges = self.document.lines.indices(offsets)
+        for i in range(0, len(ranges), 2 * HIGHLIGHT_BATCH):
+            self.text_area.tag_add("highlight", *ranges[i:i + 2 * HIGHLIGHT_BATCH])
+
+        if engine.current >= 0:
+            match_start, match_end = engine.span(engine.current)
+            self.text_area.tag_add("current_match", self.offset_to_index(match_start),
+                                   self.offset_to_index(match_end))
+        self.text_area.tag_raise("highlight")
+        self.text_area.tag_raise("current_match")
+
+    def on_view_scrolled(self, first=None, last=None):
+        """Прокрутка или изменение размера: подсветку нужно перестроить для новой видимой области."""
+        if self.search_window is not None and self.highlight_job is None:
+            self.highlight_job = self.root.after_idle(self.highlight_visible_matches)
+        self.schedule_image_load()
+        self.highlighter.schedule()
+
+    def goto_search_match(self, forward):
+        """Переходит к следующему или предыдущему совпадению относительно курсора."""
+        query = self.search_query.get()
+        if not query:
+            return "break"
+        if self.large_file is not None:
+            # В режиме большого файла ищем следующее вхождение по всему файлу
+            if not self.large_file.find_next(query):
+                message = f"'{query}' не найдено."
+                if not self.large_file.index.complete:
+                    message += " Файл ещё индексируется — повторите поиск позже."
+                messagebox.showinfo("Поиск", message, parent=self.search_window)
+            return "break"
+
+        engine = self.search_engine
+        stale = engine.query != query or engine.options.key() != self.search_options().key()
+        if self.search_job is not None or engine.text is None or stale:
+            if self.search_job is not None:
+                self.root.after_cancel(self.search_job)
+            self.run_search()
+        if not len(engine):
+            return "break"
+
+        cursor = self.index_to_offset(tk.INSERT)
+        if forward:
+            on_match = engine.current >= 0 and engine.span(engine.current)[0] == cursor
+            current = engine.next_match(cursor + 1 if on_match else cursor)
+        else:
+            current = engine.previous_match(cursor)
+
+        match_start, _ = engine.span(current)
+        self.text_area.mark_set(tk.INSERT, self.offset_to_index(match_start))
+        self.text_area.see(tk.INSERT)
+        self.search_label.config(text=f"{current + 1} из {len(engine)}")
+        self.highlight_visible_matches()
+        self.update_status_bar()
+        return "break"
 
     def find_and_replace(self):
         """Осуществляет поиск и замену текста."""
+        if self.large_file is not None:
+            messagebox.showwarning("Ошибка", "Большой файл открыт только для просмотра.")
+            return
 
         def replace():
             search_query = search_entry.get()
             replace_query = replace_entry.get()
 
             if search_query:
-                content = self.text_area.get("1.0", tk.END)
-                new_content = content.replace(search_query, replace_query)
-                self.text_area.delete("1.0", tk.END)
-                self.text_area.insert("1.0", new_content)
-
-                messagebox.showinfo("Завершено", f"Все вхождения '{search_query}' заменены на '{replace_query}'.")
+                options = SearchOptions(regex_var.get(), case_var.get(), word_var.get())
+                text = self.document.text()
+                start, end = 0, len(text)
+                if selection_var.get():
+                    if not self.text_area.tag_ranges(tk.SEL):
+                        result_label.config(text="Нет выделенного текста")
+                        return
+                    start = self.index_to_offset(tk.SEL_FIRST)
+                    end = self.index_to_offset(tk.SEL_LAST)
+
+                try:
+                    replacements = find_replacements(text, search_query, replace_query, options, start, end)
+                except (re.error, IndexError) as e:
+                    result_label.config(text=f"Ошибка в выражении: {e}")
+                    return
+                self.apply_replacements(replacements)
+                result_label.config(text=f"Заменено: {len(replacements)}")
 
         # Создаём диалоговое окно для поиска и замены
         replace_window = tk.Toplevel(self.root)
         replace_window.title("Поиск и замена")
-        replace_window.geometry("350x150")
+        replace_window.geometry("380x260")
         replace_window.transient(self.root)
         replace_window.resizable(False, False)
 
@@ -262,436 +786,1246 @@ class TextEditor:
         replace_entry = tk.Entry(replace_window, width=30)
         replace_entry.pack(pady=5)
 
-        replace_button = tk.Button(replace_window, text="Заменить", command=replace)
-        replace_button.pack(pady=10)
+        # Параметры замены
+        regex_var = tk.BooleanVar(value=False)
+        case_var = tk.BooleanVar(value=True)
+        word_var = tk.BooleanVar(value=False)
+        selection_var = tk.BooleanVar(value=False)
+        for row in ((("Регулярное выражение", regex_var), ("Учитывать регистр", case_var)),
+                    (("Слово целиком", word_var), ("Только в выделении", selection_var))):
+            options_frame = tk.Frame(replace_window)
+            options_frame.pack()
+            for text, variable in row:
+                tk.Checkbutton(options_frame, text=text, variable=variable).pack(side=tk.LEFT)
+
+        replace_button = tk.Button(replace_window, text="Заменить все", command=replace)
+        replace_button.pack(pady=5)
+        result_label = tk.Label(replace_window, text="")
+        result_label.pack()
+
+    def apply_replacements(self, replacements):
+        """Применяет замены (начало, конец, новый текст) с конца к началу одним шагом истории.
+
+        Каждая замена — локальная правка; новый текст получает теги первого заменяемого символа.
+        """
+        self.history.begin_group()
+        try:
+            for start, end, new_text in reversed(replacements):
+                first = self.offset_to_index(start)
+                last = self.offset_to_index(end)
+                tag_source = first if end > start else self.offset_to_index(max(0, start - 1))
+                tags = tuple(tag for tag in self.text_area.tag_names(tag_source)
+                             if tag not in NON_FORMAT_TAGS and not Highlighter.owns(tag))
+                if end > start:
+                    self.text_area.replace(first, last, new_text, tags)
+                elif new_text:
+                    self.text_area.insert(first, new_text, tags)
+        finally:
+            self.history.end_group()
+        self.update_status_bar()
 
-    def open_file(self):
+    def open_file(self, event=None):
         """Открывает текстовый или JSON файл с текстом и форматированием."""
         file_path = filedialog.askopenfilename(
-            filetypes=[("JSON Files", "*.json"), ("Text Files", "*.txt"), ("All Files", "*.*")]
+            filetypes=[("JSON Files", "*.json *.json.gz *.json.zst"), ("Text Files", TEXT_FILE_PATTERNS),
+                       ("All Files", "*.*")]
         )
         if file_path:
             file_extension = os.path.splitext(file_path)[1].lower()
-            try:
-                if file_extension == ".json":
-                    # Загружаем текст и форматирование из JSON
-                    with open(file_path, "r", encoding="utf-8") as file:
-                        json_data = json.load(file)
-                        self.json_to_text(json_data)
-                elif file_extension == ".txt":
-                    # Загружаем текст из текстового файла
-                    with open(file_path, "r", encoding="utf-8") as file:
-                        content = file.read()
-                        self.text_area.delete("1.0", tk.END)  # Очистка текстового поля
-                        self.text_area.insert("1.0", content)  # Вставка текста из файла
-                else:
-                    messagebox.showwarning("Ошибка", "Поддерживаются только файлы формата JSON и TXT.")
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось открыть файл: {e}")
+            self.cancel_loading()
+            if os.path.getsize(file_path) >= LARGE_FILE_THRESHOLD and messagebox.askyesno(
+                    "Большой файл", "Файл очень большой. Открыть его в режиме просмотра?"):
+                self.open_large_file(file_path)
+                return
+            if file_extension == ".json" or DocumentCodec.is_compressed_file(file_path):
+                # Чтение и разбор JSON идут в рабочем потоке; документ заменяется, когда он готов
+                self.start_file_task(
+                    f"Открытие {os.path.basename(file_path)}",
+                    partial(FileTasks.read_document, file_path),
+                    partial(self.open_document, title=os.path.basename(file_path)), "Не удалось открыть файл",
+                )
+            elif file_extension in TEXT_EXTENSIONS:
+                # Загружаем текст из текстового файла частями, не блокируя интерфейс
+                self.close_large_file()
+                self.open_blank_tab(os.path.basename(file_path))
+                self.set_tab_lexer(guess_lexer(file_path, self.read_sample(file_path)))
+                self.is_restoring = True  # Загрузка файла не попадает в историю правок
+                self.is_loading = True
+                try:
+                    self.load_text_file(file_path)
+                    self.history.clear()
+                except Exception as e:
+                    messagebox.showerror("Ошибка", f"Не удалось открыть файл: {e}")
+                    if self.loader is None:
+                        self.restart_autosave()  # Текст мог быть загружен частично
+                finally:
+                    self.is_restoring = False
+                    self.is_loading = self.loader is not None
+            else:
+                messagebox.showwarning("Ошибка", "Поддерживаются только файлы формата JSON и TXT.")
+
+    def read_sample(self, file_path):
+        """Начало текстового файла для выбора подсветки ("" — если прочитать не удалось)."""
+        try:
+            with open(file_path, "rb") as file:
+                return file.read(LEXER_SAMPLE_SIZE).decode("utf-8", errors="replace")
+        except OSError as e:
+            print(f"[ERROR] Не удалось прочитать начало файла: {e}")
+            return ""
+
+    def open_document(self, document, title=UNTITLED):
+        """Показывает документ, прочитанный в фоне: в текущей вкладке, если она пуста, иначе в новой."""
+        self.close_large_file()
+        self.store_tab_state()
+        tab = self.tabs.active
+        if self.is_blank_tab(tab):
+            tab.document, tab.cursor, tab.yview, tab.lexer = document, 0, 0.0, None
+            tab.history.clear()
+            self.rename_tab(tab, title)
+        else:
+            tab = self.add_tab(DocumentTab(title, document, history_limit=self.history_limit))
+        self.show_tab(tab)
+
+    # --- Вкладки ---
+
+    def add_tab(self, tab):
+        """Добавляет вкладку справа от текущей (не переключаясь на неё)."""
+        active = self.tabs.active
+        index = self.tabs.index(active) + 1 if active is not None else len(self.tabs)
+        self.tabs.add(tab, index)
+        if self.autosave_session is not None:
+            tab.autosave = Autosave(self.autosave_session.journal_directory())
+        frame = tk.Frame(self.tab_bar, height=0)
+        self.tab_frames[tab] = frame
+        self.tab_bar.insert(index if index < len(self.tab_bar.tabs()) else "end", frame, text=tab.title)
+        return tab
+
+    def rename_tab(self, tab, title):
+        tab.title = title
+        self.tab_bar.tab(self.tab_frames[tab], text=title)
+
+    def is_blank_tab(self, tab):
+        """Пустая вкладка без истории правок — в неё можно открыть файл, не заводя новую."""
+        return not tab.hibernated and not tab.shared and not len(tab.document) and not len(tab.history)
+
+    def new_tab(self, event=None):
+        """Открывает пустую вкладку и делает её текущей."""
+        if self.can_switch_tab():
+            self.store_tab_state()
+            self.show_tab(self.add_tab(DocumentTab(history_limit=self.history_limit)))
+        return "break"
+
+    def open_blank_tab(self, title):
+        """Делает текущей пустую вкладку с заголовком title (текущую, если она пуста)."""
+        if not self.is_blank_tab(self.tabs.active):
+            self.store_tab_state()
+            self.show_tab(self.add_tab(DocumentTab(history_limit=self.history_limit)))
+        self.rename_tab(self.tabs.active, title)
+        self.root.title(f"Текстовый редактор — {title}")
+
+    def can_switch_tab(self):
+        if self.file_task is not None or self.loader is not None or self.large_file is not None:
+            messagebox.showwarning("Вкладки", "Дождитесь завершения операции с файлом или закройте режим просмотра.")
+            return False
+        return True
+
+    def store_tab_state(self):
+        """Запоминает во вкладке состояние, которое живёт в виджете: курсор и прокрутку."""
+        tab = self.tabs.active
+        if tab is None:
+            return
+        tab.document = self.document
+        tab.history = self.history
+        tab.cursor = self.index_to_offset(tk.INSERT)
+        tab.yview = self.text_area.yview()[0]
+
+    def on_tab_changed(self, event=None):
+        """Пользователь выбрал вкладку в tab_bar."""
+        selected = self.tab_bar.select()
+        tab = next((tab for tab, frame in self.tab_frames.items() if str(frame) == selected), None)
+        if tab is None or self.tabs.active is None or tab is self.tabs.active:
+            return
+        # Пока вкладка не показана, выбранной остаётся текущая
+        self.tab_bar.select(self.tab_frames[self.tabs.active])
+        self.select_tab(tab)
+
+    def select_tab(self, tab):
+        """Переключается на вкладку tab; спящая вкладка сначала разворачивается в фоне."""
+        if not self.can_switch_tab():
+            return
+        if not tab.hibernated:
+            self.store_tab_state()
+            self.show_tab(tab)
+            return
+
+        def unpacked(document):
+            if tab not in self.tab_frames:
+                return  # Вкладку закрыли, пока она разворачивалась
+            tab.document, tab.packed = document, None
+            self.store_tab_state()
+            self.show_tab(tab)
+
+        self.start_file_task(f"Открытие вкладки {tab.title}", lambda task: unpack_document(tab.packed),
+                             unpacked, "Не удалось открыть вкладку")
+
+    def show_tab(self, tab):
+        """Показывает в виджете документ вкладки tab и делает её текущей."""
+        self.tabs.activate(tab)
+        self.tab_bar.select(self.tab_frames[tab])
+        self.history = tab.history
+        self.autosave = tab.autosave
+        self.show_document(tab.document)
+        self.highlighter.set_lexer(tab.lexer)
+        self.lexer_var.set(tab.lexer or "")
+        self.text_area.mark_set(tk.INSERT, self.offset_to_index(tab.cursor))
+        self.text_area.yview_moveto(tab.yview)
+        if tab.journaled is not tab.document:
+            self.restart_autosave()  # Документ вкладки заменён или развёрнут из сжатого
+        self.root.title(f"Текстовый редактор — {tab.title}" if tab.title != UNTITLED else "Текстовый редактор")
+        self.update_status_bar()
+        self.refresh_history()
+        self.schedule_hibernation()
+
+    def close_tab(self, event=None):
+        """Закрывает текущую вкладку; последняя вкладка не закрывается, а очищается."""
+        if not self.can_switch_tab():
+            return "break"
+        tab = self.tabs.active
+        if len(self.history) and not messagebox.askyesno(
+                "Закрыть вкладку", f"Закрыть «{tab.title}»? Несохранённые изменения будут потеряны."):
+            return "break"
+        if tab is self.sync_tab:
+            self.stop_sync()
+        if len(self.tabs) == 1:
+            tab.document, tab.cursor, tab.yview, tab.lexer = Document(), 0, 0.0, None
+            tab.history.clear()
+            self.rename_tab(tab, UNTITLED)
+            self.show_tab(tab)
+            return "break"
+        index = self.tabs.index(tab)
+        self.tabs.remove(tab)
+        tab.history.close()  # Удаляет сегменты истории вкладки с диска
+        if tab.autosave is not None:
+            tab.autosave.close(discard_files=True)
+        frame = self.tab_frames.pop(tab)
+        self.tab_bar.forget(frame)
+        frame.destroy()
+        self.select_tab(self.tabs.tabs[min(index, len(self.tabs) - 1)])
+        return "break"
+
+    def schedule_hibernation(self):
+        if self.hibernate_job is None:
+            self.hibernate_job = self.root.after(HIBERNATE_DELAY, self.hibernate_tabs)
+
+    def hibernate_tabs(self):
+        """Сжимает в фоне давно не использованные вкладки, пока все вкладки не уложатся в бюджет."""
+        self.hibernate_job = None
+        for tab in self.tabs.hibernation_candidates():
+            tab.packing = True
+            document = tab.document
+            BackgroundTask(
+                self.root, lambda task, document=document: pack_document(document),
+                partial(self.tab_packed, tab, document, document.version),
+                partial(self.tab_pack_failed, tab),
+            ).start()
+
+    def tab_packed(self, tab, document, version, data):
+        tab.packing = False
+        # Пока документ сжимался, вкладку могли открыть, изменить или закрыть — тогда сжатие не нужно
+        if tab is self.tabs.active or tab not in self.tab_frames or tab.document is not document \
+                or document.version != version:
+            return
+        tab.packed, tab.document = data, None
+        if tab.autosave is not None:
+            # Журнал остаётся на диске для восстановления, копия документа в потоке записи не нужна
+            tab.autosave.suspend()
+            tab.journaled = None
+
+    def tab_pack_failed(self, tab, error):
+        tab.packing = False
+        print(f"[ERROR] Не удалось сжать вкладку «{tab.title}»: {error}")
+
+    def start_file_task(self, title, work, on_done, error_message):
+        """Запускает work(task) в рабочем потоке с индикатором прогресса и кнопкой отмены."""
+        def finish():
+            self.file_task = None
+            self.hide_progress()
+
+        def done(result):
+            finish()
+            on_done(result)
+
+        def failed(error):
+            finish()
+            messagebox.showerror("Ошибка", f"{error_message}: {error}")
+
+        def cancelled():
+            finish()
+            self.status_bar.config(text=f"{title}: отменено")
+
+        self.file_task = BackgroundTask(
+            self.root, work, done, failed, lambda done_bytes, total: self.show_progress(title, done_bytes, total),
+            cancelled,
+        )
+        self.show_progress(title, 0, 0)
+        self.file_task.start()
+
+    def show_progress(self, title, done, total):
+        """Показывает панель прогресса фоновой операции (total == 0 — объём ещё неизвестен)."""
+        if not self.progress_frame.winfo_ismapped():
+            self.progress_frame.pack(side=tk.BOTTOM, fill=tk.X, before=self.text_area)
+        percent = 100 * done // total if total else 0
+        self.progress_label.config(text=f"{title}: {percent}% (Esc — отмена)")
+        self.progress_bar.config(value=percent)
+
+    def hide_progress(self):
+        self.progress_frame.pack_forget()
+
+    def open_large_file(self, file_path=None):
+        """Открывает файл в режиме просмотра: в виджете только окно строк вокруг видимой области."""
+        if file_path is None:
+            file_path = filedialog.askopenfilename(filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")])
+            if not file_path:
+                return
+        self.cancel_loading()
+        self.close_large_file()
+        self.open_blank_tab(os.path.basename(file_path))
+        self.set_tab_lexer(None)  # Окно строк переписывается в обход перехвата — подсветка не успевала бы за ним
+        try:
+            self.large_file = LargeFileView(self.root, self.text_area, file_path, self.update_status_bar)
+        except Exception as e:
+            self.large_file = None
+            messagebox.showerror("Ошибка", f"Не удалось открыть файл: {e}")
+            return
+        self.history.clear()
+        self.document = Document()
+        if self.autosave is not None:
+            self.autosave.reset(None)  # Файл в режиме просмотра не редактируется
+        try:
+            # Окно строк загружается, когда large_file уже задан: перехват пропускает его мимо документа
+            self.large_file.start()
+        except Exception as e:
+            self.close_large_file()
+            messagebox.showerror("Ошибка", f"Не удалось открыть файл: {e}")
+            return
+        self.root.title(f"Текстовый редактор — {os.path.basename(file_path)} (просмотр)")
+
+    def close_large_file(self):
+        """Выходит из режима просмотра большого файла."""
+        if self.large_file is None:
+            return
+        self.large_file.close()
+        self.large_file = None
+        self.show_document(Document())
+        self.history.clear()
+        self.restart_autosave()
+        self.root.title("Текстовый редактор")
+        self.update_status_bar()
+
+    def goto_line(self, event=None):
+        """Переходит к строке с указанным номером (в режиме просмотра — по всему файлу)."""
+        try:
+            line = int(self.simple_input("Номер строки:", "1"))
+        except ValueError:
+            return "break"
+
+        if self.large_file is not None:
+            if not self.large_file.goto_line(line):
+                messagebox.showinfo("Переход", "Строка ещё не проиндексирована или отсутствует в файле.")
+        else:
+            self.text_area.mark_set(tk.INSERT, f"{line}.0")
+            self.text_area.see(tk.INSERT)
+        self.update_status_bar()
+        return "break"
+
+    def load_text_file(self, file_path):
+        """Загружает TXT-файл блоками; пока идёт загрузка, текст доступен только для чтения."""
+        loader = ChunkedLoader(
+            self.root, file_path,
+            self.insert_loaded_chunk, self.show_load_progress, self.finish_loading, self.loading_failed,
+        )
+        self.text_area.delete("1.0", tk.END)  # Очистка текстового поля
+        self.loader = loader
+        self.is_loading = True
+        try:
+            loader.start()
+        except Exception:
+            loader.reader.close()
+            self.finish_loading(cancelled=False)
+            raise
+
+    def insert_loaded_chunk(self, text):
+        """Дописывает очередной блок файла в конец текста."""
+        was_restoring = self.is_restoring
+        self.is_restoring = True
+        self.text_area.configure(state=tk.NORMAL)
+        try:
+            self.text_area.insert(tk.END, text)
+        finally:
+            self.text_area.configure(state=tk.DISABLED)
+            self.is_restoring = was_restoring
+
+    def show_load_progress(self, bytes_read, total):
+        self.show_progress("Загрузка файла", bytes_read, total)
+
+    def finish_loading(self, cancelled):
+        """Возвращает текст в режим редактирования после загрузки или её отмены."""
+        self.loader = None
+        self.is_loading = False
+        self.hide_progress()
+        self.text_area.configure(state=tk.NORMAL)
+        self.text_area.mark_set(tk.INSERT, "1.0")
+        self.history.clear()
+        self.restart_autosave()
+        self.update_status_bar()
+        if cancelled:
+            self.status_bar.config(text=self.status_bar.cget("text") + " | Загрузка отменена")
+
+    def loading_failed(self, error):
+        self.finish_loading(cancelled=False)
+        messagebox.showerror("Ошибка", f"Не удалось открыть файл: {error}")
+
+    def cancel_loading(self, event=None):
+        """Прерывает загрузку или фоновую операцию с файлом; загруженная часть TXT-файла остаётся в редакторе."""
+        if self.loader is not None:
+            self.loader.cancel()
+        if self.file_task is not None:
+            self.file_task.cancel()
 
     def text_to_json(self):
-        """Конвертирует текст с форматированием в JSON, включая стиль текста, цвет, размер и шрифт."""
-        data = []
-        current_index = "1.0"
+        """Возвращает документ формата версии 2: текст, таблица стилей и отрезки стилей."""
+        return self.document.to_json()
 
-        while current_index != self.text_area.index(tk.END):
-            try:
-                # Получаем текст символа
-                next_index = self.text_area.index(f"{current_index} +1c")
-                char = self.text_area.get(current_index, next_index)
-
-                # Инициализируем параметры
-                font_name = "Arial"
-                font_size = 12
-                color = "#000000"
-                bold = False
-                italic = False
-                underline = False
-
-                # Извлекаем теги символа
-                tags = self.text_area.tag_names(current_index)
-                for tag in tags:
-                    try:
-                        # Извлекаем шрифт
-                        font_config = self.text_area.tag_cget(tag, "font")
-                        if font_config:
-                            parts = font_config.split()
-                            font_name = parts[0]
-                            if len(parts) > 1:
-                                font_size = int(parts[1])
-
-                        # Проверяем жирность
-                        if tag == "bold":
-                            bold = True
-
-                        # Проверяем курсив
-                        if tag == "italic":
-                            italic = True
-
-                        # Проверяем подчёркивание
-                        if tag == "underline":
-                            underline = True
-
-                        # Проверяем и извлекаем цвет текста
-                        if "color" in tag:
-                            color = self.text_area.tag_cget(tag, "foreground")
-                    except tk.TclError as e:
-                        print(f"[ERROR] Ошибка при извлечении данных из тега '{tag}': {e}")
-
-                # Добавляем данные о символе
-                data.append({
-                    "text": char,  # Сохраняем даже пробелы и пустые строки
-                    "font": font_name,
-                    "size": font_size,
-                    "bold": bold,
-                    "italic": italic,
-                    "underline": underline,
-                    "color": color
-                })
-
-                # Обновляем текущий индекс
-                current_index = next_index
+    def tag_style_fields(self, tag):
+        """Возвращает поля стиля, которые задаёт тег (пустой словарь, если тег не влияет на стиль)."""
+        style = self.style_registry.style(tag)
+        if style is not None:
+            return style
+        if tag in NON_FORMAT_TAGS or tag in self.images or Highlighter.owns(tag):
+            return {}
 
-            except Exception as e:
-                print(f"[ERROR] Ошибка обработки символа {current_index}: {e}")
-                break
+        # Отдельные теги шрифта, жирности и цвета из документов прежних версий
 
-        return data
+        fields = {}
+        try:
+            # Извлекаем шрифт
+            font_config = self.text_area.tag_cget(tag, "font")
+            if font_config:
+                parts = font_config.split()
+                fields["font"] = parts[0]
+                if len(parts) > 1:
+                    fields["size"] = int(parts[1])
+
+            # Проверяем жирность, курсив и подчёркивание
+            if tag in ("bold", "italic", "underline"):
+                fields[tag] = True
+
+            # Проверяем и извлекаем цвет текста
+            if "color" in tag:
+                fields["color"] = self.text_area.tag_cget(tag, "foreground")
+        except (tk.TclError, ValueError) as e:
+            print(f"[ERROR] Ошибка при извлечении данных из тега '{tag}': {e}")
+        return fields
 
     def json_to_text(self, json_data):
-        """Восстанавливает текст с форматированием из JSON, включая пустые строки и пробелы."""
-        self.text_area.delete(1.0, tk.END)  # Удаляем существующий текст
-
-        for char_data in json_data:
-
-            start_index = self.text_area.index(tk.INSERT)
-            self.text_area.insert(tk.INSERT, char_data["text"])
-            end_index = self.text_area.index(tk.INSERT)
-
-            # Применяем шрифт и размер
-            font_tag = f"font_{char_data['font']}_{char_data['size']}"
-            self.text_area.tag_configure(font_tag, font=(char_data["font"], char_data["size"]))
-            self.text_area.tag_add(font_tag, start_index, end_index)
-
-            # Применяем жирность
-            if char_data["bold"]:
-                self.text_area.tag_add("bold", start_index, end_index)
-                self.text_area.tag_configure("bold", font=(char_data["font"], char_data["size"], "bold"))
-
-            # Применяем курсив
-            if char_data["italic"]:
-                self.text_area.tag_add("italic", start_index, end_index)
-                self.text_area.tag_configure("italic", font=(char_data["font"], char_data["size"], "italic"))
-
-            # Применяем подчёркивание
-            if char_data["underline"]:
-                self.text_area.tag_add("underline", start_index, end_index)
-                self.text_area.tag_configure("underline", underline=True)
-
-            # Применяем цвет текста
-            if char_data["color"]:
-                color_tag = f"color_{char_data['color']}"
-                self.text_area.tag_configure(color_tag, foreground=char_data["color"])
-                self.text_area.tag_add(color_tag, start_index, end_index)
-
-    def save_file(self):
-        """Сохраняет текст в текстовый файл или файл с форматированием в JSON."""
+        """Восстанавливает текст с форматированием из JSON (новый формат или старый посимвольный)."""
+        self.show_document(Document.from_json(json_data))
+
+    def show_document(self, document):
+        """Делает document текущим и отображает его в виджете в обход перехвата правок."""
+        call = self.root.tk.call
+        widget = self.text_command
+        call(widget, "delete", "1.0", "end")  # Удаляем существующий текст
+        call(widget, "insert", "1.0", document.text())  # Весь текст одной вставкой
+
+        # Один tag add на каждый отрезок стиля; текст без форматирования тегов не получает
+        lines = document.lines  # self.document ещё прежний — индексы считаются по новому документу
+        for start, end, key in document.styles.runs():
+            if key == DocumentFormat.DEFAULT_STYLE_KEY:
+                continue
+            tag = self.style_tag(DocumentFormat.style_from_key(key))
+            call(widget, "tag", "add", tag, *lines.indices((start, end)))
+
+        self.document = document
+        self.edit_events.cancel()  # Накопленные участки относятся к прежнему документу
+        self.highlighter.reset()
+        self.show_images(0, len(document))  # Картинки декодируются, когда попадут в видимую область
+        self.stats.recount(document.text())
+        self.search_engine.invalidate()
+        self.schedule_search()
+        self.schedule_prune_tags()
+
+    def style_tag(self, style):
+        """Возвращает составной тег для стиля из реестра; тег настраивается один раз."""
+        tag = self.style_registry.intern(style)
+        self.ensure_style_tag(tag)
+        return tag
+
+    def ensure_style_tag(self, tag):
+        """Настраивает составной тег в виджете, если он ещё не настроен (или был удалён при очистке)."""
+        if tag not in self.configured_tags and tag in self.style_registry:
+            self.text_area.tag_configure(tag, **StyleRegistry.tag_options(self.style_registry.key(tag)))
+            self.configured_tags.add(tag)
+
+    def schedule_prune_tags(self):
+        """Откладывает удаление составных тегов, которые больше не используются в тексте."""
+        if self.prune_job is None:
+            self.prune_job = self.root.after(PRUNE_TAGS_DELAY, self.prune_tags)
+
+    def prune_tags(self):
+        """Удаляет из виджета составные теги без диапазонов; реестр сохраняет их стили для истории."""
+        self.prune_job = None
+        for tag in list(self.configured_tags):
+            if not self.text_area.tag_ranges(tag):
+                self.text_area.tag_delete(tag)
+                self.configured_tags.discard(tag)
+
+    def save_file(self, event=None):
+        """Сохраняет текст в текстовый файл или файл с форматированием в JSON.
+
+        Запись идёт в рабочем потоке из снимка документа, поэтому во время сохранения можно продолжать набор.
+        """
+        if self.file_task is not None:
+            messagebox.showwarning("Ошибка", "Дождитесь завершения текущей операции с файлом.")
+            return
         file_path = filedialog.asksaveasfilename(
             defaultextension=".json",
-            filetypes=[("JSON Files", "*.json"), ("Text Files", "*.txt")]
+            filetypes=[("JSON Files", "*.json"), ("Compressed JSON", "*.json.gz"), ("Text Files", TEXT_FILE_PATTERNS)]
         )
         if file_path:
             file_extension = os.path.splitext(file_path)[1].lower()
-            try:
-                if file_extension == ".json":
-                    # Сохраняем текст и форматирование в JSON
-                    with open(file_path, "w", encoding="utf-8") as file:
-                        json_data = self.text_to_json()
-                        json.dump(json_data, file, ensure_ascii=False, indent=4)
-                    messagebox.showinfo("Сохранение", "Файл успешно сохранён в формате JSON!")
-                elif file_extension == ".txt":
-                    # Сохраняем текст в текстовый файл
-                    with open(file_path, "w", encoding="utf-8") as file:
-                        content = self.text_area.get("1.0", tk.END).strip()  # Получаем текст из текстового поля
-                        file.write(content)
-                    messagebox.showinfo("Сохранение", "Файл успешно сохранён в формате TXT!")
-                else:
-                    messagebox.showwarning("Ошибка", "Поддерживаются только файлы формата JSON и TXT.")
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {e}")
+            if self.large_file is not None:
+                # Большой файл не редактируется — сохраняем его копию как есть
+                if file_extension != ".txt":
+                    messagebox.showwarning("Ошибка", "Большой файл можно сохранить только в формате TXT.")
+                    return
+                work = partial(FileTasks.copy_file, self.large_file.file_path, file_path)
+                message = "Файл успешно сохранён в формате TXT!"
+            elif file_extension == ".json" or DocumentCodec.compression_for_path(file_path):
+                # Сохраняем текст и форматирование в JSON (.json.gz и .json.zst — сжатый)
+                work = partial(FileTasks.write_document, file_path, self.document.snapshot())
+                message = "Файл успешно сохранён в формате JSON!"
+            elif file_extension in TEXT_EXTENSIONS:
+                # Сохраняем текст в текстовый файл
+                work = partial(FileTasks.write_text, file_path, self.document.snapshot())
+                message = "Файл успешно сохранён в формате TXT!"
+            else:
+                messagebox.showwarning("Ошибка", "Поддерживаются только файлы формата JSON и TXT.")
+                return
+            self.start_file_task(
+                f"Сохранение {os.path.basename(file_path)}", work,
+                lambda result: messagebox.showinfo("Сохранение", message), "Не удалось сохранить файл",
+            )
 
     def change_font(self):
         font_name = self.font_var.get()
         font_size = self.size_var.get()
-        try:
-            start_index = self.text_area.index(tk.SEL_FIRST)
-            end_index = self.text_area.index(tk.SEL_LAST)
-            font_tag = f"font_{font_name}_{font_size}"
-            self.text_area.tag_configure(font_tag, font=(font_name, font_size))
-            self.text_area.tag_add(font_tag, start_index, end_index)
-        except tk.TclError:
+        if not self.restyle_selection(lambda style: dict(style, font=font_name, size=font_size)):
             messagebox.showwarning("Ошибка", "Выделите текст для изменения шрифта.")
 
     def change_text_color(self):
         """Изменяет цвет выделенного текста."""
         color = colorchooser.askcolor()[1]  # Выбираем цвет
         if color:
-            try:
-                start_index = self.text_area.index(tk.SEL_FIRST)
-                end_index = self.text_area.index(tk.SEL_LAST)
-                color_tag = f"color_{color}"
-
-                # Настраиваем и добавляем тег цвета
-                self.text_area.tag_configure(color_tag, foreground=color)
-                self.text_area.tag_add(color_tag, start_index, end_index)
-
-                # Сохраняем изменение в историю
-                self.record_change(change_type="format")
-            except tk.TclError:
+            if not self.restyle_selection(lambda style: dict(style, color=color)):
                 messagebox.showwarning("Ошибка", "Выделите текст для изменения цвета.")
 
     def toggle_bold(self):
         """Добавляет или убирает жирный шрифт."""
-        try:
-            start_index = self.text_area.index(tk.SEL_FIRST)
-            end_index = self.text_area.index(tk.SEL_LAST)
-            if "bold" in self.text_area.tag_names(start_index):
-                self.text_area.tag_remove("bold", start_index, end_index)
-            else:
-                self.text_area.tag_add("bold", start_index, end_index)
-                self.text_area.tag_configure("bold", font=(self.font_var.get(), self.size_var.get(), "bold"))
-        except tk.TclError:
+        if not self.toggle_style_flag("bold"):
             messagebox.showwarning("Ошибка", "Выделите текст для применения жирного шрифта.")
 
     def toggle_italic(self):
         """Добавляет или убирает курсив."""
-        try:
-            start_index = self.text_area.index(tk.SEL_FIRST)
-            end_index = self.text_area.index(tk.SEL_LAST)
-            if "italic" in self.text_area.tag_names(start_index):
-                self.text_area.tag_remove("italic", start_index, end_index)
-            else:
-                self.text_area.tag_add("italic", start_index, end_index)
-                self.text_area.tag_configure("italic", font=(self.font_var.get(), self.size_var.get(), "italic"))
-        except tk.TclError:
+        if not self.toggle_style_flag("italic"):
             messagebox.showwarning("Ошибка", "Выделите текст для применения курсива.")
 
     def toggle_underline(self):
         """Добавляет или убирает подчёркивание."""
-        try:
-            start_index = self.text_area.index(tk.SEL_FIRST)
-            end_index = self.text_area.index(tk.SEL_LAST)
-            if "underline" in self.text_area.tag_names(start_index):
-                self.text_area.tag_remove("underline", start_index, end_index)
-            else:
-                self.text_area.tag_add("underline", start_index, end_index)
-                self.text_area.tag_configure("underline", underline=True)
-        except tk.TclError:
+        if not self.toggle_style_flag("underline"):
             messagebox.showwarning("Ошибка", "Выделите текст для применения подчёркивания.")
 
+    def toggle_style_flag(self, flag):
+        """Переключает флаг стиля (bold, italic, underline) у всего выделения.
+
+        Флаг снимается, только если он уже есть у каждого выделенного символа, иначе ставится всем.
+        """
+        selection = self.selection_offsets()
+        if selection is None:
+            return False
+        enabled = not all(DocumentFormat.style_from_key(key)[flag]
+                          for _, _, key in self.document.styles.runs(*selection))
+        return self.restyle_selection(lambda style: dict(style, **{flag: enabled}))
+
+    def selection_offsets(self):
+        """Смещения (начало, конец) непустого выделения или None."""
+        selection = self.text_area.tag_ranges(tk.SEL)
+        if not selection or self.large_file is not None:
+            return None
+        start, end = self.index_to_offset(selection[0]), self.index_to_offset(selection[1])
+        return (start, end) if start < end else None
+
+    def restyle_selection(self, update):
+        """Заменяет стиль каждого отрезка выделения на update(стиль). Возвращает False без выделения.
+
+        Новые отрезки считаются за один проход по отрезкам стилей документа; в виджете меняются
+        только отрезки, стиль которых изменился, — одним вызовом tag remove и tag add на тег.
+        В историю попадают диапазоны тегов до и после правки на изменённом участке.
+        """
+        selection = self.selection_offsets()
+        if selection is None:
+            return False
+
+        removed, added = {}, {}
+        changed_start = changed_end = None
+        new_keys = {}  # Старый ключ -> новый: у выделения обычно немного разных стилей
+        for run_start, run_end, key in self.document.styles.runs(*selection):
+            new_key = new_keys.get(key)
+            if new_key is None:
+                new_key = new_keys[key] = DocumentFormat.style_key(update(DocumentFormat.style_from_key(key)))
+            if new_key == key:
+                continue
+            if key != DocumentFormat.DEFAULT_STYLE_KEY:
+                add_range(removed, self.style_registry.intern_key(key), run_start, run_end)
+            if new_key != DocumentFormat.DEFAULT_STYLE_KEY:
+                add_range(added, self.tag_for_key(new_key), run_start, run_end)
+            changed_start = run_start if changed_start is None else changed_start
+            changed_end = run_end
+
+        if changed_start is not None:
+            before = self.capture_tags(changed_start, changed_end)
+            self.apply_tag_ranges("remove", removed)
+            self.apply_tag_ranges("add", added)
+            self.history.record_format(changed_start, changed_end, before,
+                                       self.capture_tags(changed_start, changed_end))
+            self.schedule_prune_tags()
+        return True
+
+    def tag_for_key(self, key):
+        """Составной тег стиля с ключом key, настроенный в виджете."""
+        tag = self.style_registry.intern_key(key)
+        self.ensure_style_tag(tag)
+        return tag
+
+    def apply_tag_ranges(self, action, ranges_by_tag):
+        """Выполняет tag add или tag remove одним вызовом на тег для всех его диапазонов (смещений)."""
+        for tag, ranges in ranges_by_tag.items():
+            indices = []
+            for start, end in ranges:
+                indices.append(self.offset_to_index(start))
+                indices.append(self.offset_to_index(end))
+            # Через перехватчик: он повторит каждый диапазон в документе и журнале
+            self.root.tk.call(self.text_area._w, "tag", action, tag, *indices)
+
     def update_status_bar(self, event=None):
+        if self.large_file is not None:
+            row, col = self.large_file.cursor_position()
+            index = self.large_file.index
+            lines = f"{index.line_count}" if index.complete else f"~{index.line_count} (индексация)"
+            self.status_bar.config(
+                text=f"Строка: {row} | Столбец: {col} | Строк: {lines} | Байт: {index.size} | Только чтение"
+            )
+            return
+
         cursor_position = self.text_area.index(tk.INSERT)
         row, col = map(int, cursor_position.split('.'))
-        text_content = self.text_area.get(1.0, tk.END)
-        num_chars = len(text_content) - 1
-        num_words = len(text_content.split())
-        self.status_bar.config(
-            text=f"Строка: {row} | Столбец: {col} | Слов: {num_words} | Символов: {num_chars}"
+        self.document.set_cursor(self.document.lines.offset(row, col))
+        text = (
+            f"Строка: {row} | Столбец: {col} | "
+            f"Строк: {self.stats.lines} | Слов: {self.stats.words} | Символов: {self.stats.chars}"
         )
-
-    def record_change(self, event=None, change_type="text"):
-        """Сохраняет изменения текста или форматирования в историю."""
-        if self.is_restoring:
+        if self.selection_stats is not None:
+            text += f" | Выделено слов: {self.selection_stats.words}, символов: {self.selection_stats.chars}"
+        if self.sync is not None:
+            text += f" | Совместно: {format_address(self.sync.address)}"
+            if not self.sync.connected:
+                text += " (подключение)"
+        self.status_bar.config(text=text)
+
+    def on_selection_changed(self, event=None):
+        """Откладывает подсчёт статистики выделения, пока выделение меняется мышью."""
+        if self.selection_job is not None:
+            self.root.after_cancel(self.selection_job)
+        self.selection_job = self.root.after(SELECTION_STATS_DELAY, self.update_selection_stats)
+
+    def update_selection_stats(self):
+        self.selection_job = None
+        selection = self.text_area.tag_ranges(tk.SEL)
+        if selection and self.large_file is None:
+            self.document.set_selection(self.index_to_offset(selection[0]), self.index_to_offset(selection[1]))
+            self.selection_stats = TextStats.of(self.document.selected_text())
+        elif selection:
+            self.selection_stats = TextStats.of(self.text_area.get(tk.SEL_FIRST, tk.SEL_LAST))
+        else:
+            self.document.set_selection(0, 0)
+            self.selection_stats = None
+        self.update_status_bar()
+
+    def install_text_hook(self):
+        """Подменяет Tcl-команду виджета, чтобы перехватывать insert, delete и replace."""
+        widget = self.text_area._w
+        self.text_command = f"{widget}_orig"
+        self.root.tk.call("rename", widget, self.text_command)
+        self.root.tk.createcommand(widget, self.text_proxy)
+
+    def text_proxy(self, *args):
+        """Передаёт команду исходному виджету и повторяет правку текста или стиля в модели документа."""
+        call = self.root.tk.call
+        command = args[0] if args else ""
+        if self.large_file is not None:
+            return call((self.text_command,) + args)
+        if command == "tag" and len(args) > 3 and args[1] in ("add", "remove") and (
+                args[2] in self.style_registry or args[2] in self.images):
+            return self.proxy_style_tag(args)
+        if command == "image" and len(args) > 2 and args[1] == "create":
+            # Картинка занимает одну позицию в виджете и один символ в документе
+            index = self.clamp_index(args[2])
+            offset = self.index_to_offset(index)
+            result = call((self.text_command,) + args)
+            self.on_text_inserted(offset, OBJECT_REPLACEMENT, index)
+            return result
+        if command not in ("insert", "delete", "replace"):
+            return call((self.text_command,) + args)
+        if call(self.text_command, "cget", "-state") != tk.NORMAL:
+            return call((self.text_command,) + args)
+
+        if command == "insert":
+            index = self.clamp_index(args[1])
+            offset = self.index_to_offset(index)
+            result = call((self.text_command,) + args)
+            self.on_text_inserted(offset, "".join(args[2::2]), index)
+        elif command == "delete":
+            deleted = self.collect_deleted(args[1:])
+            result = call((self.text_command,) + args)
+            for offset, text, tags, index in deleted:
+                self.on_text_deleted(offset, text, tags, index)
+        else:
+            index = self.clamp_index(args[1])
+            deleted = self.collect_deleted(args[1:3])
+            result = call((self.text_command,) + args)
+            for offset, text, tags, _ in deleted:
+                self.on_text_deleted(offset, text, tags, index)
+            offset = deleted[0][0] if deleted else self.index_to_offset(index)
+            self.on_text_inserted(offset, "".join(args[3::2]), index)
+        return result
+
+    def proxy_style_tag(self, args):
+        """Выполняет tag add/remove тега стиля или картинки и повторяет правку в документе и журнале."""
+        result = self.root.tk.call((self.text_command,) + args)
+        _, action, tag, *indices = args
+        if len(indices) % 2:
+            indices.append(f"{indices[-1]} +1c")
+        for i in range(0, len(indices), 2):
+            start = self.index_to_offset(self.clamp_index(indices[i]))
+            end = self.index_to_offset(self.clamp_index(indices[i + 1]))
+            if start >= end:
+                continue
+            if tag in self.images:
+                ref = self.images.ref(tag) if action == "add" else None
+                self.document.set_image(start, end, ref)
+                if self.journal_active():
+                    self.autosave.record_image(start, end, ref, self.document.image_data.get(ref[0]) if ref else None)
+                continue
+            key = self.style_registry.key(tag) if action == "add" else DocumentFormat.DEFAULT_STYLE_KEY
+            self.document.set_style(start, end, key)
+            if self.journal_active():
+                self.autosave.record_format(start, end, key)
+            if self.sync_active():
+                self.sync.record(format_delta(start, end, key))
+        return result
+
+    def clamp_index(self, index):
+        """Нормализует индекс; позиция после последнего перевода строки заменяется на end-1c."""
+        call = self.root.tk.call
+        index = call(self.text_command, "index", index)
+        if self.root.tk.getboolean(call(self.text_command, "compare", index, ">", "end-1c")):
+            index = call(self.text_command, "index", "end-1c")
+        return index
+
+    def collect_deleted(self, indices):
+        """Возвращает удаляемые участки (смещение, текст, теги, индекс) в порядке от конца к началу."""
+        call = self.root.tk.call
+        if len(indices) == 1:
+            indices = (indices[0], f"{indices[0]} +1c")
+
+        deleted = []
+        for i in range(0, len(indices) - 1, 2):
+            first = self.clamp_index(indices[i])
+            last = self.clamp_index(indices[i + 1])
+            if not self.root.tk.getboolean(call(self.text_command, "compare", first, "<", last)):
+                continue
+            offset = self.index_to_offset(first)
+            # Текст берётся из документа: get виджета пропускает картинки
+            text = self.document.text(offset, self.index_to_offset(last))
+            tags = [] if self.is_restoring else self.capture_tags(offset, offset + len(text))
+            deleted.append((offset, text, tags, first))
+        deleted.sort(key=lambda item: item[0], reverse=True)
+        return deleted
+
+    def index_to_offset(self, index):
+        """Переводит индекс виджета в смещение от начала текста.
+
+        Tcl лишь нормализует индекс в "строка.столбец", смещение даёт индекс строк документа.
+        В режиме просмотра большого файла документ пуст — смещение считает сам виджет.
+        """
+        if self.large_file is not None:
+            return int(self.root.tk.call(self.text_command, "count", "-indices", "1.0", index))
+        return self.document.lines.index_offset(str(self.root.tk.call(self.text_command, "index", index)))
+
+    def offset_to_index(self, offset):
+        """Переводит смещение от начала текста в индекс виджета "строка.столбец"."""
+        if self.large_file is not None:
+            return f"1.0 + {offset} indices"
+        return self.document.lines.index(offset)
+
+    def on_text_inserted(self, offset, text, index):
+        """Вызывается после вставки text в позицию index (смещение offset)."""
+        if not text:
             return
-
-        action = None
-
-        if change_type == "text":
-            current_text = self.text_area.get(1.0, tk.END).strip()
-            cursor_position = self.text_area.index(tk.INSERT)
-
-            if self.history and self.history[-1]["type"] == "text" and self.history[-1]["text"] == current_text:
-                return
-
-            action = {
-                "type": "text",
-                "text": current_text,
-                "cursor": cursor_position,
-            }
-
-        elif change_type == "format":
-            if not self.text_area.tag_ranges(tk.SEL):
+        tags = self.root.tk.splitlist(self.root.tk.call(self.text_command, "tag", "names", index))
+        key = DocumentFormat.style_key(self.style_from_tags(tags))
+        self.document.insert(offset, text, key)
+        before, after = self.neighbour_chars(offset, len(text))
+        self.stats.apply_insert(text, before, after)
+        self.search_engine.invalidate()
+        self.highlighter.on_insert(index, text)
+        self.edit_events.record_insert(offset, len(text))
+        if not self.is_restoring:
+            self.history.record_insert(offset, text)
+        if self.journal_active():
+            self.autosave.record_insert(offset, text, key)
+        if self.sync_active():
+            self.sync.record(insert_delta(offset, text, key))
+
+    def on_text_deleted(self, offset, text, tags, index):
+        """Вызывается после удаления text, начинавшегося в позиции index (смещение offset)."""
+        self.document.delete(offset, len(text))
+        before, after = self.neighbour_chars(offset, 0)
+        self.stats.apply_delete(text, before, after)
+        self.search_engine.invalidate()
+        self.highlighter.on_delete(index, text)
+        self.edit_events.record_delete(offset, len(text))
+        if not self.is_restoring:
+            self.history.record_delete(offset, text, tags)
+        if self.journal_active():
+            self.autosave.record_delete(offset, len(text))
+        if self.sync_active():
+            self.sync.record(delete_delta(offset, len(text)))
+
+    def journal_active(self):
+        """Пишутся ли правки в журнал автосохранения (загрузка документа в него не попадает)."""
+        return self.autosave is not None and self.autosave.active and not self.is_loading and self.large_file is None
+
+    def sync_active(self):
+        """Отправляются ли правки виджета участникам совместной правки (чужие правки обратно не уходят)."""
+        return self.sync is not None and self.tabs.active is self.sync_tab and not self.applying_remote \
+            and not self.is_loading
+
+    # --- Совместная правка ---
+
+    def ask_sync_address(self):
+        """Запрашивает адрес сервера; None — если адрес не разобран."""
+        text = self.simple_input("Адрес сервера (хост:порт или unix:путь):", f"{DEFAULT_HOST}:{DEFAULT_PORT}")
+        try:
+            return parse_address(text)
+        except ValueError:
+            messagebox.showerror("Совместная правка", f"Неверный адрес: {text}")
+            return None
+
+    def can_start_sync(self):
+        if self.sync is not None:
+            messagebox.showwarning("Совместная правка", "Сначала отключитесь от текущей совместной правки.")
+            return False
+        return self.can_switch_tab()
+
+    def share_document(self):
+        """Открывает доступ к документу текущей вкладки: запускает сервер в редакторе и подключается к нему."""
+        if not self.can_start_sync():
+            return
+        address = self.ask_sync_address()
+        if address is None:
+            return
+        server = LocalServer(address)
+        try:
+            address = server.start()
+        except Exception as e:
+            messagebox.showerror("Совместная правка", f"Не удалось запустить сервер: {e}")
+            return
+        self.sync_server = server
+        self.sync_tab = self.tabs.active
+        self.sync_tab.shared = True
+        self.start_sync(address, self.text_to_json())
+
+    def join_shared_document(self):
+        """Подключается к серверу; общий документ откроется во вкладке, когда сервер его пришлёт."""
+        if not self.can_start_sync():
+            return
+        address = self.ask_sync_address()
+        if address is not None:
+            self.start_sync(address, None)
+
+    def start_sync(self, address, document_json):
+        self.sync = SyncSession(self.root, address, document_json,
+                                self.on_sync_welcome, self.apply_remote_edits, self.on_sync_closed)
+        self.sync.start()
+        self.update_status_bar()
+
+    def stop_sync(self):
+        """Отключается от совместной правки; документ вкладки остаётся как есть."""
+        if self.sync is None:
+            return
+        self.sync.close()
+        if self.sync_tab is not None:
+            self.sync_tab.shared = False
+            self.sync_tab = None
+
+    def on_sync_welcome(self, data):
+        """Сервер принял подключение; data — общий документ (None — сервер принял наш)."""
+        if data is None:
+            self.update_status_bar()
+            return
+        document = Document.from_json(data)
+        tab = self.sync_tab
+        if tab is None:
+            if self.sync.connection.closing:
                 return
-
-            start_index = self.text_area.index(tk.SEL_FIRST)
-            end_index = self.text_area.index(tk.SEL_LAST)
-            tags = self.text_area.tag_names(start_index)
-
-            # Извлекаем шрифт, размер и атрибуты
-            font = self.get_font_from_tags(tags)
-            size = self.get_font_size_from_tags(tags)
-            bold = "bold" in tags
-            italic = "italic" in tags
-            underline = "underline" in tags
-            color = self.get_color_from_tags(tags)
-
-            action = {
-                "type": "format",
-                "start": start_index,
-                "end": end_index,
-                "tags": tags,
-                "font": font,
-                "size": size,
-                "bold": bold,
-                "italic": italic,
-                "underline": underline,
-                "color": color,
-            }
-
-        if action:
-            self.history.append(action)
-            self.redo_stack.clear()
+            self.open_document(document, f"Совместно: {format_address(self.sync.address)}")
+            self.sync_tab = self.tabs.active
+            self.sync_tab.shared = True
+        elif tab is self.tabs.active:
+            # Сервер не смог принять наши правки и прислал документ заново
+            self.store_tab_state()
+            tab.document = document
+            tab.history.clear()
+            self.show_tab(tab)
+        else:
+            tab.document = document
+            tab.history.clear()
+        self.update_status_bar()
+
+    def apply_remote_edits(self, deltas):
+        """Применяет правки других участников к общему документу.
+
+        Записи истории вкладки переносятся через чужие правки: отмена откатывает только свои правки.
+        """
+        tab = self.sync_tab
+        if tab is None:
+            return
+        if tab is not self.tabs.active:
+            for delta in deltas:
+                delta.apply(tab.document)
+                tab.history.rebase(delta)
+            tab.journaled = None  # Журнал вкладки начнётся заново, когда она станет текущей
+            return
+        self.applying_remote = True
+        self.is_restoring = True
+        try:
+            for delta in deltas:
+                self.apply_remote_delta(delta)
+                self.history.rebase(delta)
+        except Exception as e:
+            print(f"[ERROR] Ошибка при применении правок совместной правки: {e}")
+        finally:
+            self.applying_remote = False
+            self.is_restoring = False
+        self.refresh_history()
+
+    def apply_remote_delta(self, delta):
+        """Повторяет дельту в виджете; перехватчик отразит её в документе, как собственную правку."""
+        position = 0
+        for op in delta.ops:
+            if op[0] == "r":
+                if op[2] is not None:
+                    self.apply_remote_style(position, position + op[1], op[2])
+                position += op[1]
+            elif op[0] == "i":
+                tags = () if op[2] == DocumentFormat.DEFAULT_STYLE_KEY else \
+                    (self.style_tag(DocumentFormat.style_from_key(op[2])),)
+                self.text_area.insert(self.offset_to_index(position), op[1], tags)
+                position += len(op[1])
+            else:
+                self.text_area.delete(self.offset_to_index(position), self.offset_to_index(position + op[1]))
+
+    def apply_remote_style(self, start, end, key):
+        tags = {tag for tag, _, _ in self.capture_tags(start, end) if tag not in self.images}
+        ranges = [] if key == DocumentFormat.DEFAULT_STYLE_KEY else \
+            [(self.style_tag(DocumentFormat.style_from_key(key)), start, end)]
+        self.restore_tags(start, end, ranges, tags)
+
+    def on_sync_closed(self, error):
+        closing = self.sync.connection.closing
+        address = format_address(self.sync.address)
+        if self.sync_tab is not None:
+            self.sync_tab.shared = False
+            self.sync_tab = None
+        self.sync = None
+        if self.sync_server is not None:
+            self.sync_server.stop()
+            self.sync_server = None
+        self.update_status_bar()
+        if error is not None:
+            messagebox.showerror("Совместная правка", f"Соединение с {address} прервано: {error}")
+        elif not closing:
+            messagebox.showwarning("Совместная правка", f"Сервер {address} закрыл соединение.")
+
+    def restart_autosave(self):
+        """Начинает журнал автосохранения текущей вкладки заново от текущего состояния документа."""
+        if self.autosave is not None and self.large_file is None:
+            self.autosave.reset(self.document.snapshot())
+            self.tabs.active.journaled = self.document
+
+    def offer_recovery(self):
+        """При запуске предлагает восстановить документы редакторов, завершившихся со сбоем."""
+        if self.autosave is None:
+            return
+        sessions = orphaned_sessions(self.autosave_dir)
+        documents = []
+        for directory, _ in sessions:
+            documents.extend(recover_session(directory))
+        question = "Найден несохранённый документ. Восстановить его?" if len(documents) == 1 else \
+            f"Найдены несохранённые документы: {len(documents)}. Восстановить их?"
+        if documents and messagebox.askyesno("Восстановление", question):
+            for document in documents:
+                self.open_document(Document.from_json(document), RECOVERED_TITLE)
+        # Восстановленные документы уже в журнале этого сеанса
+        for directory, lock in sessions:
+            remove_session(directory, lock)
+        self.restart_autosave()
+
+    def check_autosave(self):
+        """Сообщает об ошибках записи автосохранения, случившихся в фоновом потоке."""
+        for tab in self.tabs:
+            error = tab.autosave.take_error() if tab.autosave is not None else None
+            if error is None:
+                continue
+            print(f"[ERROR] Не удалось записать автосохранение вкладки «{tab.title}»: {error}")
+            if not self.autosave_warned:
+                self.autosave_warned = True
+                messagebox.showwarning(
+                    "Автосохранение",
+                    f"Не удалось записать автосохранение: {error}\n"
+                    "Пока ошибка не устранена, несохранённые изменения не переживут сбой.")
+        self.root.after(AUTOSAVE_CHECK_DELAY, self.check_autosave)
+
+    def neighbour_chars(self, offset, length):
+        """Возвращает символ перед offset и символ после участка длины length ("" на границе текста)."""
+        document = self.document
+        return document.text(offset - 1, offset) if offset else "", document.text(offset + length, offset + length + 1)
+
+    def recount_after_edit(self, ranges):
+        if ranges:
+            self.schedule_recount()
+
+    def search_after_edit(self, ranges):
+        """После пачки правок поиск повторяется сразу: пауза в наборе уже выдержана диспетчером."""
+        if not ranges or self.search_window is None or self.large_file is not None:
+            return
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.run_search()
+
+    def schedule_recount(self):
+        """Откладывает полный пересчёт статистики до паузы в редактировании."""
+        if self.recount_job is not None:
+            self.root.after_cancel(self.recount_job)
+            self.recount_job = None
+        if self.stats.chars > STATS_RECOUNT_LIMIT:
+            # Для очень больших текстов полная копия буфера дороже возможной погрешности
+            return
+        self.recount_job = self.root.after(STATS_RECOUNT_DELAY, self.recount_stats)
+
+    def recount_stats(self):
+        """Полный пересчёт статистики — страховка от расхождений инкрементального подсчёта."""
+        self.recount_job = None
+        self.stats.recount(self.document.text())
+        self.update_status_bar()
+
+    def capture_tags(self, start, end):
+        """Возвращает диапазоны тегов форматирования на участке [start, end) как (тег, начало, конец).
+
+        Диапазоны берутся из отрезков документа, который повторяет теги виджета, — без вызовов Tcl.
+        """
+        ranges = []
+        for run_start, run_end, key in self.document.styles.runs(start, end):
+            if key != DocumentFormat.DEFAULT_STYLE_KEY:
+                ranges.append((self.style_registry.intern_key(key), run_start, run_end))
+        for run_start, run_end, ref in self.document.images.runs(start, end):
+            if ref is not None:
+                ranges.append((self.images.tag(ref), run_start, run_end))
+        return ranges
+
+    def begin_format_change(self, start_index, end_index):
+        """Запоминает теги участка перед изменением форматирования."""
+        start = self.index_to_offset(start_index)
+        end = self.index_to_offset(end_index)
+        return start, end, self.capture_tags(start, end)
+
+    def end_format_change(self, change):
+        """Записывает изменение форматирования в историю как дельту тегов."""
+        start, end, before = change
+        self.history.record_format(start, end, before, self.capture_tags(start, end))
+
+    def restore_tags(self, start, end, ranges, tags):
+        """Снимает теги tags с участка [start, end) и расставляет диапазоны ranges (по вызову на тег)."""
+        self.apply_tag_ranges("remove", {tag: [(start, end)] for tag in tags})
+        added = {}
+        for tag, tag_start, tag_end in ranges:
+            self.ensure_style_tag(tag)
+            add_range(added, tag, tag_start, tag_end)
+        self.apply_tag_ranges("add", added)
+        for tag, tag_start, tag_end in ranges:
+            if tag in self.images:
+                # Отмена вернула символ-заместитель — на его место снова встраивается картинка
+                self.show_images(tag_start, tag_end)
+
+    def style_from_tags(self, tags):
+        """Возвращает стиль символа с тегами tags (теги перечислены по возрастанию приоритета)."""
+        style = dict(DocumentFormat.DEFAULT_STYLE)
+        for tag in tags:
+            style.update(self.tag_style_fields(tag))
+        return style
 
     def get_font_from_tags(self, tags):
         """Возвращает шрифт из списка тегов."""
-        for tag in tags:
-            try:
-                font_config = self.text_area.tag_cget(tag, "font")
-                if font_config:
-                    return font_config.split()[0]
-            except tk.TclError:
-                continue
-        return "Arial"
+        return self.style_from_tags(tags)["font"]
 
     def get_font_size_from_tags(self, tags):
         """Возвращает размер шрифта из списка тегов."""
-        for tag in tags:
-            try:
-                font_config = self.text_area.tag_cget(tag, "font")
-                if font_config and len(font_config.split()) > 1:
-                    return int(font_config.split()[1])
-            except tk.TclError:
-                continue
-        return 12
+        return self.style_from_tags(tags)["size"]
 
     def get_color_from_tags(self, tags):
         """Возвращает цвет из списка тегов."""
-        for tag in tags:
-            try:
-                if tag.startswith("color_"):
-                    return self.text_area.tag_cget(tag, "foreground")
-            except tk.TclError:
-                continue
-        return "#000000"
+        return self.style_from_tags(tags)["color"]
 
-    def get_affected_range(self, cursor_position, tags):
-        """Возвращает диапазон текста, затронутого изменением."""
-        start_index = cursor_position
-        end_index = f"{cursor_position} +1c"
-
-        for tag in tags:
-            ranges = self.text_area.tag_ranges(tag)
-            for i in range(0, len(ranges), 2):
-                if self.text_area.compare(cursor_position, ">=", ranges[i]) and self.text_area.compare(cursor_position,
-                                                                                                       "<",
-                                                                                                       ranges[i + 1]):
-                    start_index = ranges[i]
-                    end_index = ranges[i + 1]
-                    break
-
-        return start_index, end_index
-
-    def undo(self):
+    def undo(self, event=None):
         """Отменяет последнее действие."""
-        if not self.history:
+        entry = self.history.undo()
+        if entry is None:
             messagebox.showinfo("Отмена", "Нет действий для отмены.")
-            return
+            return "break"
 
-        last_action = self.history.pop()
-        self.is_restoring = True
-        try:
-            if last_action["type"] == "text":
-                self.text_area.delete(1.0, tk.END)
-                self.text_area.insert(1.0, last_action["text"])
-                self.text_area.mark_set(tk.INSERT, last_action["cursor"])
-            elif last_action["type"] == "format":
-                start = last_action["start"]
-                end = last_action["end"]
-                for tag in last_action["tags"]:
-                    self.text_area.tag_remove(tag, start, end)
-
-                # Восстановление шрифта и размера
-                font_tag = f"font_{last_action['font']}_{last_action['size']}"
-                self.text_area.tag_configure(font_tag, font=(last_action["font"], last_action["size"]))
-                self.text_area.tag_add(font_tag, start, end)
-
-                # Восстановление других атрибутов
-                if last_action["bold"]:
-                    self.text_area.tag_add("bold", start, end)
-
-                if last_action["italic"]:
-                    self.text_area.tag_add("italic", start, end)
-
-                if last_action["underline"]:
-                    self.text_area.tag_add("underline", start, end)
-
-                if last_action["color"]:
-                    color_tag = f"color_{last_action['color']}"
-                    self.text_area.tag_configure(color_tag, foreground=last_action["color"])
-                    self.text_area.tag_add(color_tag, start, end)
-
-            self.redo_stack.append(last_action)
-        except Exception as e:
-            print(f"[ERROR] Ошибка в undo: {e}")
-        finally:
-            self.is_restoring = False
+        self.apply_history_entry(entry, reverse=True)
+        self.refresh_history()
+        return "break"
 
-    def redo(self):
+    def redo(self, event=None):
         """Повторяет последнее отменённое действие."""
-        if not self.redo_stack:
+        entry = self.history.redo()
+        if entry is None:
             messagebox.showinfo("Повтор", "Нет действий для повторения.")
+            return "break"
+
+        self.apply_history_entry(entry, reverse=False)
+        self.refresh_history()
+        return "break"
+
+    def show_history(self):
+        """Окно истории: последние записи и объём истории в памяти, в сжатом виде и на диске."""
+        if self.history_window is not None:
+            self.history_window.lift()
+            self.refresh_history()
+            return
+
+        history_window = tk.Toplevel(self.root)
+        history_window.title("История правок")
+        history_window.geometry("480x380")
+        history_window.transient(self.root)
+        history_window.protocol("WM_DELETE_WINDOW", self.close_history)
+        self.history_window = history_window
+
+        self.history_summary = tk.Label(history_window, justify=tk.LEFT, anchor=tk.W)
+        self.history_summary.pack(fill=tk.X, padx=10, pady=5)
+        self.history_list = tk.Listbox(history_window, activestyle=tk.NONE)
+        self.history_list.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.history_list.bind("<Double-Button-1>", lambda event: self.undo_to_selected())
+
+        buttons_frame = tk.Frame(history_window)
+        buttons_frame.pack(pady=5)
+        tk.Button(buttons_frame, text="Отменить до выбранной", command=self.undo_to_selected).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons_frame, text="Закрыть", command=self.close_history).pack(side=tk.LEFT, padx=5)
+        self.refresh_history()
+
+    def close_history(self):
+        self.history_window.destroy()
+        self.history_window = None
+
+    def refresh_history(self):
+        """Обновляет окно истории, если оно открыто."""
+        if self.history_window is None:
             return
+        stats = self.history.stats()
+        self.history_summary.config(text=(
+            f"Записей: {stats['entries']} (повтор: {stats['redo_entries']})\n"
+            f"В памяти: {stats['memory_entries']} — {stats['memory_bytes'] / 1024:.1f} КБ\n"
+            f"Сжато в памяти: {stats['compressed_entries']} — {stats['compressed_bytes'] / 1024:.1f} КБ\n"
+            f"На диске: {stats['disk_entries']} — {stats['disk_bytes'] / 1024:.1f} КБ"
+        ))
+        # Время записи хранится по монотонным часам — переводим его в настенное
+        shift = time.time() - time.monotonic()
+        self.history_list.delete(0, tk.END)
+        for entry in self.history.recent(HISTORY_LIST_SIZE):
+            moment = time.strftime("%H:%M:%S", time.localtime(entry.timestamp + shift))
+            self.history_list.insert(tk.END, f"{moment}  {describe_entry(entry)}")
+        older = stats["entries"] - self.history_list.size()
+        if older:
+            self.history_list.insert(tk.END, f"… ещё {older} более старых записей")
+
+    def undo_to_selected(self):
+        """Отменяет записи от последней до выбранной в окне истории включительно."""
+        selection = self.history_list.curselection()
+        if not selection or selection[0] >= len(self.history.recent(HISTORY_LIST_SIZE)):
+            return
+        for _ in range(selection[0] + 1):
+            entry = self.history.undo()
+            if entry is None:
+                break
+            self.apply_history_entry(entry, reverse=True)
+        self.refresh_history()
 
-        last_action = self.redo_stack.pop()
+    def apply_history_entry(self, entry, reverse):
+        """Применяет дельты записи истории локальными правками (при отмене — в обратном порядке)."""
         self.is_restoring = True
         try:
-            if last_action["type"] == "text":
-                self.text_area.delete(1.0, tk.END)
-                self.text_area.insert(1.0, last_action["text"])
-                self.text_area.mark_set(tk.INSERT, last_action["cursor"])
-            elif last_action["type"] == "format":
-                start = last_action["start"]
-                end = last_action["end"]
-
-                # Повторение шрифта и размера
-                font_tag = f"font_{last_action['font']}_{last_action['size']}"
-                self.text_area.tag_configure(font_tag, font=(last_action["font"], last_action["size"]))
-                self.text_area.tag_add(font_tag, start, end)
-
-                # Повторение других атрибутов
-                if last_action["bold"]:
-                    self.text_area.tag_add("bold", start, end)
-
-                if last_action["italic"]:
-                    self.text_area.tag_add("italic", start, end)
-
-                if last_action["underline"]:
-                    self.text_area.tag_add("underline", start, end)
-
-                if last_action["color"]:
-                    color_tag = f"color_{last_action['color']}"
-                    self.text_area.tag_configure(color_tag, foreground=last_action["color"])
-                    self.text_area.tag_add(color_tag, start, end)
-
-            self.history.append(last_action)
+            for delta in (reversed(entry.deltas) if reverse else entry.deltas):
+                if isinstance(delta, FormatDelta):
+                    tags = {tag for tag, _, _ in delta.before + delta.after}
+                    self.restore_tags(delta.start, delta.end, delta.before if reverse else delta.after, tags)
+                    cursor = delta.end
+                elif (delta.kind == "insert") != reverse:
+                    if delta.tags or delta.kind == "delete":
+                        # Удалённый текст возвращается ровно со своими тегами
+                        self.text_area.insert(self.offset_to_index(delta.offset), delta.text, ())
+                        self.restore_tags(delta.offset, delta.offset + len(delta.text), delta.tags, ())
+                    else:
+                        self.text_area.insert(self.offset_to_index(delta.offset), delta.text)
+                    cursor = delta.offset + len(delta.text)
+                else:
+                    self.text_area.delete(self.offset_to_index(delta.offset),
+                                          self.offset_to_index(delta.offset + len(delta.text)))
+                    cursor = delta.offset
+
+                self.text_area.mark_set(tk.INSERT, self.offset_to_index(cursor))
+            self.text_area.see(tk.INSERT)
         except Exception as e:
-            print(f"[ERROR] Ошибка в redo: {e}")
+            print(f"[ERROR] Ошибка при применении истории: {e}")
         finally:
             self.is_restoring = False
+        self.update_status_bar()
 
-    def confirm_exit(self):
+    def confirm_exit(self, event=None):
         """Запрос подтверждения выхода из программы."""
+        if self.file_task is not None:
+            messagebox.showwarning("Выход", "Дождитесь завершения операции с файлом или отмените её.")
+            return
         if messagebox.askyesno("Подтверждение выхода", "Вы действительно хотите выйти?"):
+            if self.autosave_session is not None:
+                for tab in self.tabs:
+                    tab.autosave.close(discard_files=True)
+                self.autosave_session.close()
+            self.stop_sync()
+            if self.sync_server is not None:
+                self.sync_server.stop()
+            self.images.shutdown()
             self.root.quit()
 
     def bind_shortcuts(self):
@@ -700,9 +2034,24 @@ class TextEditor:
         self.root.bind("<Control-f>", self.search_text)
         self.root.bind("<Control-r>", self.find_and_replace)
         self.root.bind("<Control-q>", self.confirm_exit)
+        self.root.bind("<Escape>", self.cancel_loading)
+        self.root.bind("<Control-g>", self.goto_line)
+        self.root.bind("<Control-n>", self.new_tab)
+        self.root.bind("<Control-w>", self.close_tab)
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "convert":
+        # Пакетное преобразование файлов без окна: python TextEditorCore.py convert --help
+        import Convert
+
+        sys.exit(Convert.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "sync-server":
+        # Сервер совместной правки без окна: python TextEditorCore.py sync-server --help
+        import SyncServer
+
+        sys.exit(SyncServer.main(sys.argv[2:]))
+
     root = tk.Tk()
     editor = TextEditor(root)
     root.mainloop()
@@ -0,0 +1,55 @@
+"""Счётчики строк, слов и символов, обновляемые по изменённому участку.
+
+Число слов считается так же, как len(text.split()): слово — непрерывная
+последовательность непробельных символов. При вставке или удалении
+пересчитываются только начала слов внутри изменённого текста и у символа
+сразу за ним, поэтому стоимость правки пропорциональна её длине, а не
+размеру документа.
+"""
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def _word_starts(before, text, after):
+    """Число начал слов в text + after при условии, что перед ними стоит символ before."""
+    words = count_words(before + text + after)
+    if before and not before.isspace():
+        # Слово, содержащее before, начинается раньше участка
+        words -= 1
+    return words
+
+
+class TextStats:
+    """Статистика документа: строки, слова и символы (без завершающего перевода строки)."""
+
+    def __init__(self):
+        self.lines = 1
+        self.words = 0
+        self.chars = 0
+
+    def recount(self, text):
+        """Полный пересчёт по всему тексту."""
+        self.lines = text.count("\n") + 1
+        self.words = count_words(text)
+        self.chars = len(text)
+
+    def apply_insert(self, text, before="", after=""):
+        """Учитывает вставку text между символами before и after ("" — граница текста)."""
+        self.lines += text.count("\n")
+        self.chars += len(text)
+        self.words += _word_starts(before, text, after) - _word_starts(before, "", after)
+
+    def apply_delete(self, text, before="", after=""):
+        """Учитывает удаление text, после которого соседями стали символы before и after."""
+        self.lines -= text.count("\n")
+        self.chars -= len(text)
+        self.words -= _word_starts(before, text, after) - _word_starts(before, "", after)
+
+    @classmethod
+    def of(cls, text):
+        """Статистика произвольного фрагмента (например, выделения)."""
+        stats = cls()
+        stats.recount(text)
+        return stats
@@ -0,0 +1,543 @@
+"""История правок на основе дельт.
+
+Вместо копии всего документа на каждое нажатие клавиши хранятся небольшие
+дельты: вставка и удаление (позиция, текст) и изменения тегов форматирования
+на участке текста. Подряд набранные символы склеиваются в одну запись.
+
+Объём истории в памяти ограничен. При превышении лимита самые старые
+записи сжимаются пачкой в сегмент (JSON, как документы, через
+DocumentCodec); сжатые сегменты сверх своей доли лимита переносятся в
+файлы временного каталога. Когда отмена доходит до сегмента, он читается
+обратно в память. Сегменты образуют стек: последним читается тот, что
+сжат первым. Только если и на диске история превышает max_disk_bytes,
+самые старые сегменты удаляются.
+
+В общем документе (совместная правка) записи переносятся через правки
+других участников (rebase): для стека отмены — лениво, правки копятся у
+верхней записи и учитываются, когда до неё доходит отмена, стек повтора
+переносится сразу. Набранный локально текст, который другой участник
+удалил, из записей выпадает; его вставки внутрь участков записи при отмене
+остаются на месте.
+"""
+import os
+import shutil
+import tempfile
+import time
+import weakref
+
+import DocumentCodec
+from SyncOperations import Delta
+
+# Примерные накладные расходы на одну дельту и один диапазон тега, байт
+DELTA_OVERHEAD = 64
+RANGE_OVERHEAD = 32
+
+SPILL_SHARE = 0.25  # Доля лимита памяти, которая сжимается в один сегмент
+COMPRESSED_SHARE = 0.25  # Доля лимита памяти под сжатые сегменты; остальные уходят на диск
+MAX_DISK_BYTES = 256 * 1024 * 1024  # Байт сегментов на диске на одну историю (0 — без диска)
+SEGMENT_COMPRESSION = "zstd" if "zstd" in DocumentCodec.COMPRESSIONS else "gzip"
+
+
+class TextDelta:
+    """Вставка ("insert") или удаление ("delete") текста в позиции offset.
+
+    Для удаления в tags хранятся диапазоны тегов удалённого текста
+    (тег, начало, конец), чтобы отмена вернула и форматирование.
+    """
+
+    __slots__ = ("kind", "offset", "text", "tags")
+
+    def __init__(self, kind, offset, text, tags=()):
+        self.kind = kind
+        self.offset = offset
+        self.text = text
+        self.tags = list(tags)
+
+    def size(self):
+        return DELTA_OVERHEAD + len(self.text) + RANGE_OVERHEAD * len(self.tags)
+
+    def __repr__(self):
+        return f"TextDelta({self.kind!r}, {self.offset}, {self.text!r})"
+
+
+class FormatDelta:
+    """Изменение тегов на участке [start, end): диапазоны тегов до и после правки.
+
+    before и after — списки (тег, start, end) в абсолютных смещениях.
+    """
+
+    __slots__ = ("start", "end", "before", "after")
+
+    def __init__(self, start, end, before, after):
+        self.start = start
+        self.end = end
+        self.before = before
+        self.after = after
+
+    def size(self):
+        return DELTA_OVERHEAD + RANGE_OVERHEAD * (len(self.before) + len(self.after))
+
+    def __repr__(self):
+        return f"FormatDelta({self.start}, {self.end}, {self.before!r}, {self.after!r})"
+
+
+class HistoryEntry:
+    """Один шаг отмены: последовательность дельт, применённых в указанном порядке."""
+
+    __slots__ = ("deltas", "timestamp", "size", "pending")
+
+    def __init__(self, deltas, timestamp, pending=None):
+        self.deltas = deltas
+        self.timestamp = timestamp
+        self.size = sum(delta.size() for delta in deltas)
+        self.pending = pending or []  # Чужие правки после этой записи, ещё не перенесённые в неё
+
+
+def delta_to_json(delta):
+    if isinstance(delta, FormatDelta):
+        return ["format", delta.start, delta.end, delta.before, delta.after]
+    return [delta.kind, delta.offset, delta.text, delta.tags]
+
+
+def delta_from_json(data):
+    if data[0] == "format":
+        _, start, end, before, after = data
+        return FormatDelta(start, end, [tuple(item) for item in before], [tuple(item) for item in after])
+    kind, offset, text, tags = data
+    return TextDelta(kind, offset, text, [tuple(item) for item in tags])
+
+
+def _map_point(remote, offset):
+    """Позиция offset после правки remote; чужая вставка в ту же позицию остаётся левее."""
+    old = new = 0
+    for op in remote.ops:
+        if op[0] == "i":
+            new += len(op[1])
+            continue
+        if offset < old + op[1]:
+            return new + offset - old if op[0] == "r" else new
+        old += op[1]
+        if op[0] == "r":
+            new += op[1]
+    return new + offset - old
+
+
+def _map_range(remote, start, end, styled):
+    """Уцелевшие после remote части участка [start, end): список (старое начало, новое начало, длина).
+
+    Чужие вставки разрывают участок; при styled выпадают и части, которым remote назначила стиль.
+    """
+    pieces = []
+
+    def keep(old, new, length):
+        low, high = max(start, old), min(end, old + length)
+        if low >= high:
+            return
+        target = new + low - old
+        if pieces and pieces[-1][0] + pieces[-1][2] == low and pieces[-1][1] + pieces[-1][2] == target:
+            pieces[-1] = (pieces[-1][0], pieces[-1][1], pieces[-1][2] + high - low)
+        else:
+            pieces.append((low, target, high - low))
+
+    old = new = 0
+    for op in remote.ops:
+        if old >= end:
+            break
+        if op[0] == "i":
+            new += len(op[1])
+            continue
+        if op[0] == "r":
+            if not (styled and op[2] is not None):
+                keep(old, new, op[1])
+            new += op[1]
+        old += op[1]
+    if old < end:
+        keep(old, new, end - old)
+    return pieces
+
+
+def _clip(ranges, start, end, shift):
+    return [(tag, max(low, start) + shift, min(high, end) + shift)
+            for tag, low, high in ranges if max(low, start) < min(high, end)]
+
+
+def _rebase_delta(delta, remote, undone):
+    """Дельта записи после чужой правки remote — список дельт (пустой, если от неё ничего не осталось).
+
+    undone — запись отменена (стек повтора): текст вставки ещё не в документе, а удалённый — в нём.
+    """
+    if isinstance(delta, FormatDelta):
+        return [FormatDelta(target, target + length, _clip(delta.before, old, old + length, target - old),
+                            _clip(delta.after, old, old + length, target - old))
+                for old, target, length in _map_range(remote, delta.start, delta.end, True)]
+    if (delta.kind == "insert") == undone:
+        # Текста записи в документе нет: меняется только позиция
+        offset = _map_point(remote, delta.offset)
+        shift = offset - delta.offset
+        return [TextDelta(delta.kind, offset, delta.text,
+                          [(tag, start + shift, end + shift) for tag, start, end in delta.tags])]
+    pieces = [TextDelta(delta.kind, target, delta.text[old - delta.offset:old - delta.offset + length],
+                        _clip(delta.tags, old, old + length, target - old))
+              for old, target, length in _map_range(remote, delta.offset, delta.offset + len(delta.text), False)]
+    # Удаления идут справа налево, чтобы позиции ещё не удалённых частей не сдвигались
+    return pieces if delta.kind == "insert" else pieces[::-1]
+
+
+def _rebase_entry(entry, remote, undone):
+    """Переносит запись через remote; возвращает (новая запись, remote в состоянии по другую сторону записи)."""
+    deltas = []
+    for delta in (entry.deltas if undone else reversed(entry.deltas)):
+        rebased = _rebase_delta(delta, remote, undone)
+        deltas = deltas + rebased if undone else rebased + deltas
+        if isinstance(delta, TextDelta):
+            # Переход через дельту: для отмены — обратная ей правка, для повтора — она сама
+            step = Delta().retain(delta.offset)
+            if (delta.kind == "insert") == undone:
+                step.insert(delta.text, None)
+            else:
+                step.delete(len(delta.text))
+            remote = step.transform(remote, False)
+    return HistoryEntry(deltas, entry.timestamp), remote
+
+
+def describe_entry(entry, width=40):
+    """Короткое описание записи для списка истории."""
+    parts = []
+    for delta in entry.deltas:
+        if isinstance(delta, FormatDelta):
+            parts.append(f"формат {delta.start}–{delta.end}")
+        else:
+            text = delta.text.replace("\n", "⏎")
+            text = text if len(text) <= width else text[:width - 1] + "…"
+            parts.append(f"{'вставка' if delta.kind == 'insert' else 'удаление'} «{text}»")
+    if len(parts) > 2:
+        return f"{parts[0]} и ещё {len(parts) - 1}"
+    return ", ".join(parts)
+
+
+class HistorySegment:
+    """Пачка старых записей истории, сжатая в памяти (data) или вынесенная в файл (path)."""
+
+    __slots__ = ("count", "size", "data", "path", "stored_size", "pending")
+
+    def __init__(self, entries):
+        self.count = len(entries)
+        self.size = sum(entry.size for entry in entries)  # Объём записей до сжатия
+        self.data = DocumentCodec.encode(
+            [[entry.timestamp, [delta_to_json(delta) for delta in entry.deltas],
+              [remote.to_json() for remote in entry.pending]] for entry in entries],
+            SEGMENT_COMPRESSION)
+        self.path = None
+        self.stored_size = len(self.data)
+        self.pending = []  # Чужие правки после новейшей записи сегмента
+
+    def write(self, path):
+        with open(path, "wb") as file:
+            file.write(self.data)
+        self.path = path
+        self.data = None
+
+    def load(self):
+        """Записи сегмента; файл сегмента после чтения удаляется."""
+        data = self.data
+        if data is None:
+            with open(self.path, "rb") as file:
+                data = file.read()
+        self.discard()
+        return [HistoryEntry([delta_from_json(delta) for delta in deltas], timestamp,
+                             [Delta.from_json(remote) for remote in pending])
+                for timestamp, deltas, pending in DocumentCodec.decode(data)]
+
+    def discard(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                print(f"[ERROR] Не удалось удалить сегмент истории: {e}")
+            self.path = None
+        self.data = None
+
+
+class UndoHistory:
+    """Стеки отмены и повтора из дельт с ограничением по памяти и выносом старых записей на диск.
+
+    bytes_used — объём записей в памяти без сжатия; memory_bytes — вместе со сжатыми сегментами.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, coalesce_timeout=1.0, max_disk_bytes=MAX_DISK_BYTES,
+                 spill_dir=None):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.spill_dir = spill_dir  # Каталог для временного каталога сегментов (None — системный)
+        self.coalesce_timeout = coalesce_timeout
+        self.undo_stack = []
+        self.redo_stack = []
+        self.bytes_used = 0
+        self._segments = []  # Сжатые записи, старые первыми; у старейших — только файл
+        self._directory = None
+        self._finalizer = None
+        self._segment_number = 0
+        self._can_coalesce = False
+        self._group = None  # Дельты открытой группы (begin_group/end_group)
+        self._group_depth = 0
+
+    def __len__(self):
+        return len(self.undo_stack) + sum(segment.count for segment in self._segments)
+
+    @property
+    def memory_bytes(self):
+        return self.bytes_used + sum(segment.stored_size for segment in self._segments if segment.path is None)
+
+    @property
+    def disk_bytes(self):
+        return sum(segment.stored_size for segment in self._segments if segment.path is not None)
+
+    def stats(self):
+        """Записи и байты по уровням хранения — для окна истории."""
+        compressed = [segment for segment in self._segments if segment.path is None]
+        on_disk = [segment for segment in self._segments if segment.path is not None]
+        return {
+            "entries": len(self),
+            "memory_entries": len(self.undo_stack),
+            "memory_bytes": self.bytes_used,
+            "compressed_entries": sum(segment.count for segment in compressed),
+            "compressed_bytes": sum(segment.stored_size for segment in compressed),
+            "disk_entries": sum(segment.count for segment in on_disk),
+            "disk_bytes": sum(segment.stored_size for segment in on_disk),
+            "redo_entries": len(self.redo_stack),
+        }
+
+    def recent(self, limit):
+        """Последние записи в памяти, новые первыми."""
+        return self.undo_stack[:-limit - 1:-1]
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.bytes_used = 0
+        self._can_coalesce = False
+        for segment in self._segments:
+            segment.discard()
+        self._segments.clear()
+
+    def close(self):
+        """Очищает историю и удаляет временный каталог сегментов."""
+        self.clear()
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+            self._directory = None
+
+    def seal(self):
+        """Запрещает склеивать следующую правку с последней записью."""
+        self._can_coalesce = False
+
+    def begin_group(self):
+        """Начинает группу: все дельты до end_group() отменяются одним шагом."""
+        self._group_depth += 1
+        if self._group_depth == 1:
+            self._group = []
+
+    def end_group(self):
+        self._group_depth -= 1
+        if self._group_depth == 0:
+            deltas, self._group = self._group, None
+            if deltas:
+                self._push(HistoryEntry(deltas, time.monotonic()))
+            self._can_coalesce = False
+
+    def record_insert(self, offset, text):
+        if text:
+            self._record_text(TextDelta("insert", offset, text))
+
+    def record_delete(self, offset, text, tags=()):
+        if text:
+            self._record_text(TextDelta("delete", offset, text, tags))
+
+    def record_format(self, start, end, before, after):
+        if before == after:
+            return
+        delta = FormatDelta(start, end, before, after)
+        if self._group is not None:
+            self._group.append(delta)
+            return
+        self._push(HistoryEntry([delta], time.monotonic()))
+        self._can_coalesce = False
+
+    def undo(self):
+        """Снимает последнюю запись; дельты нужно откатить в обратном порядке."""
+        while True:
+            if not self.undo_stack and self._segments:
+                self._restore()
+            if not self.undo_stack:
+                return None
+            entry = self.undo_stack.pop()
+            self.bytes_used -= entry.size
+            if entry.pending:
+                entry = self._catch_up(entry)
+            if entry.deltas:
+                break
+        self.redo_stack.append(entry)
+        self._can_coalesce = False
+        return entry
+
+    def redo(self):
+        """Возвращает отменённую запись; дельты нужно применить в прямом порядке."""
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        self.bytes_used += entry.size
+        self._evict()
+        self._can_coalesce = False
+        return entry
+
+    def rebase(self, remote):
+        """Учитывает правку другого участника remote (SyncOperations.Delta), применённую к документу.
+
+        Стек повтора переносится сразу, стек отмены — при отмене (см. описание модуля).
+        """
+        self._can_coalesce = False
+        redo = []
+        passed = remote
+        for entry in reversed(self.redo_stack):
+            entry, passed = _rebase_entry(entry, passed, True)
+            if entry.deltas:
+                redo.append(entry)
+        redo.reverse()
+        self.redo_stack = redo
+        self._defer([remote])
+
+    def _catch_up(self, entry):
+        """Переносит снятую запись через накопленные у неё чужие правки и передаёт их записи ниже."""
+        passed = []
+        for remote in entry.pending:
+            entry, remote = _rebase_entry(entry, remote, False)
+            passed.append(remote)
+        self._defer(passed)
+        return entry
+
+    def _defer(self, remotes):
+        if self.undo_stack:
+            self.undo_stack[-1].pending.extend(remotes)
+        elif self._segments:
+            self._segments[-1].pending.extend(remotes)
+
+    def _record_text(self, delta):
+        if self._group is not None:
+            self._group.append(delta)
+            return
+        now = time.monotonic()
+        if self._can_coalesce and self._coalesce(delta, now):
+            return
+        self._push(HistoryEntry([delta], now))
+        # Склеиваем только одиночные символы, набранные подряд
+        self._can_coalesce = len(delta.text) == 1
+
+    def _coalesce(self, delta, now):
+        """Пытается дописать дельту к последней записи (серия набора или удаления)."""
+        entry = self.undo_stack[-1]
+        last = entry.deltas[-1]
+        if len(entry.deltas) != 1 or last.kind != delta.kind or len(delta.text) != 1:
+            return False
+        if now - entry.timestamp > self.coalesce_timeout or last.text.endswith("\n"):
+            return False
+
+        old_size = last.size()
+        if delta.kind == "insert":
+            # Набор продолжается сразу за предыдущим текстом; пробел после слова начинает новую запись
+            if delta.offset != last.offset + len(last.text):
+                return False
+            if delta.text.isspace() and not last.text[-1].isspace():
+                return False
+            last.text += delta.text
+        elif delta.offset + 1 == last.offset:
+            # Backspace: удаляемый символ стоит перед уже удалённым текстом
+            last.offset = delta.offset
+            last.text = delta.text + last.text
+            last.tags.extend(delta.tags)
+        elif delta.offset == last.offset:
+            # Delete: следующий символ оказывается на той же позиции, до удаления он стоял дальше
+            shift = len(last.text)
+            last.tags.extend((tag, start + shift, end + shift) for tag, start, end in delta.tags)
+            last.text += delta.text
+        else:
+            return False
+
+        entry.timestamp = now
+        entry.size += last.size() - old_size
+        self.bytes_used += last.size() - old_size
+        self._evict()
+        return True
+
+    def _push(self, entry):
+        self.undo_stack.append(entry)
+        self.bytes_used += entry.size
+        self.redo_stack.clear()
+        self._evict()
+
+    def _evict(self):
+        """Сжимает самые старые записи в сегмент, пока история не уложится в лимит (последняя остаётся)."""
+        if self.bytes_used <= self.max_bytes:
+            return
+        target = self.bytes_used - self.max_bytes + int(self.max_bytes * SPILL_SHARE)
+        evicted = spilled = 0
+        while spilled < target and len(self.undo_stack) - evicted > 1:
+            spilled += self.undo_stack[evicted].size
+            evicted += 1
+        if not evicted:
+            return
+        segment = HistorySegment(self.undo_stack[:evicted])
+        del self.undo_stack[:evicted]
+        self.bytes_used -= spilled
+        self._segments.append(segment)
+        self._spill()
+
+    def _spill(self):
+        """Переносит старейшие сжатые сегменты сверх их доли лимита в файлы; сверх max_disk_bytes — удаляет."""
+        compressed_limit = int(self.max_bytes * COMPRESSED_SHARE)
+        compressed = sum(segment.stored_size for segment in self._segments if segment.path is None)
+        while compressed > compressed_limit:
+            # Сегменты перед первым сжатым в памяти уже на диске
+            index = next(i for i, segment in enumerate(self._segments) if segment.path is None)
+            compressed -= self._segments[index].stored_size
+            if not self.max_disk_bytes or not self._write_segment(self._segments[index]):
+                self._drop(index + 1)
+
+        disk = self.disk_bytes
+        while disk > self.max_disk_bytes and self._segments and self._segments[0].path is not None:
+            disk -= self._segments[0].stored_size
+            self._drop(1)
+
+    def _drop(self, count):
+        """Удаляет count самых старых сегментов: без них более старые записи применить нельзя."""
+        for segment in self._segments[:count]:
+            segment.discard()
+        del self._segments[:count]
+
+    def _write_segment(self, segment):
+        try:
+            if self._directory is None:
+                self._directory = tempfile.mkdtemp(prefix="texteditor-history-", dir=self.spill_dir)
+                # Каталог удаляется и при выходе из программы, если историю не закрыли явно
+                self._finalizer = weakref.finalize(self, shutil.rmtree, self._directory, True)
+            self._segment_number += 1
+            segment.write(os.path.join(self._directory, f"{self._segment_number:06d}.seg"))
+            return True
+        except OSError as e:
+            print(f"[ERROR] Не удалось сохранить историю на диск: {e}")
+            return False
+
+    def _restore(self):
+        """Читает в память самый новый сегмент (стек отмены пуст)."""
+        segment = self._segments.pop()
+        try:
+            entries = segment.load()
+        except Exception as e:
+            print(f"[ERROR] Не удалось прочитать сегмент истории: {e}")
+            self._drop(len(self._segments))
+            return
+        if entries:
+            entries[-1].pending.extend(segment.pending)
+        self.undo_stack[:0] = entries
+        self.bytes_used += sum(entry.size for entry in entries)
@@ -0,0 +1,86 @@
+"""Сравнение кодеков документа: размер файла, время записи и чтения для каждой библиотеки JSON и сжатия.
+
+Для сравнения приводится и прежний способ — json.dump с indent=4 в посимвольном формате.
+Запуск из корня проекта (дисплей не нужен):
+    python benchmarks/bench_codec.py
+"""
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import DocumentCodec  # noqa: E402
+import DocumentFormat  # noqa: E402
+
+SIZES = (100_000, 1_000_000)
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "текст", "редактор", "формат")
+STYLES = [
+    dict(DocumentFormat.DEFAULT_STYLE),
+    dict(DocumentFormat.DEFAULT_STYLE, bold=True),
+    dict(DocumentFormat.DEFAULT_STYLE, italic=True, color="#ff0000"),
+    dict(DocumentFormat.DEFAULT_STYLE, font="Courier", size=14, underline=True),
+]
+
+
+def make_document(size, seed=0):
+    """Документ заданной длины с отрезком стиля примерно на каждые 40 символов."""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS) + ("\n" if rng.random() < 0.1 else " ")
+        parts.append(word)
+        length += len(word)
+    text = "".join(parts)[:size]
+
+    builder = DocumentFormat.RunBuilder()
+    position = 0
+    while position < size:
+        end = min(size, position + rng.randint(10, 70))
+        builder.add(position, end, rng.choice(STYLES))
+        position = end
+    return DocumentFormat.make_document(text, builder.table.styles, builder.runs)
+
+
+def legacy_chars(document):
+    """Посимвольное представление документа, как его сохраняли прежние версии."""
+    styles = document["styles"]
+    text = document["text"]
+    return [dict(styles[style_id], text=char)
+            for start, end, style_id in document["runs"] for char in text[start:end]]
+
+
+def timed(action):
+    started = time.perf_counter()
+    result = action()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def report(label, encode, decode):
+    data, write_ms = timed(encode)
+    _, read_ms = timed(lambda: decode(data))
+    print(f"    {label:<24} {len(data) / 1024:10.0f} КБ {write_ms:9.1f} мс {read_ms:9.1f} мс")
+
+
+def main():
+    print(f"{'':4}{'кодек':<24} {'размер':>13} {'запись':>12} {'чтение':>12}")
+    for size in SIZES:
+        document = make_document(size)
+        print(f"{size} символов:")
+        chars = legacy_chars(document)
+        report("json indent=4 (старый)",
+               lambda: json.dumps(chars, ensure_ascii=False, indent=4).encode("utf-8"),
+               lambda data: json.loads(data))
+        for backend in DocumentCodec.BACKENDS:
+            for compression in (None,) + DocumentCodec.COMPRESSIONS:
+                report(f"{backend} + {compression or 'без сжатия'}",
+                       lambda: DocumentCodec.encode(document, compression, backend),
+                       lambda data: DocumentCodec.decode(data, backend))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Замер операций модели документа без дисплея: загрузка, набор, форматирование, сохранение, поиск.
+
+Запуск из корня проекта:
+    python benchmarks/bench_document.py
+"""
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import DocumentFormat  # noqa: E402
+from Document import Document  # noqa: E402
+from SearchEngine import SearchEngine, SearchOptions  # noqa: E402
+
+SIZES = (100_000, 1_000_000, 10_000_000)
+EDITS = 10_000
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "текст", "редактор", "формат")
+BOLD_KEY = DocumentFormat.style_key(dict(DocumentFormat.DEFAULT_STYLE, bold=True))
+
+
+def make_text(size, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS) + ("\n" if rng.random() < 0.1 else " ")
+        parts.append(word)
+        length += len(word)
+    return "".join(parts)[:size]
+
+
+def measure(label, action):
+    started = time.perf_counter()
+    result = action()
+    print(f"    {label:<28} {(time.perf_counter() - started) * 1000:9.1f} мс")
+    return result
+
+
+def main():
+    for size in SIZES:
+        print(f"{size} символов:")
+        text = make_text(size)
+        document = measure("загрузка", lambda: Document(text))
+
+        def type_text():
+            offset = len(document) // 2
+            for i in range(EDITS):
+                document.insert(offset + i, "a")
+
+        def format_runs():
+            rng = random.Random(1)
+            for _ in range(EDITS):
+                start = rng.randrange(len(document))
+                document.set_style(start, start + rng.randint(1, 40), BOLD_KEY)
+
+        measure(f"набор {EDITS} символов", type_text)
+        measure(f"{EDITS} смен стиля", format_runs)
+        data = measure("сохранение (to_json)", document.to_json)
+        measure("открытие (from_json)", lambda: Document.from_json(data))
+        measure("поиск", lambda: SearchEngine().search(document.text(), "текст", SearchOptions()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Замер стоимости одного события правки в EditDispatcher при разном числе подписчиков.
+
+Набор текста имитируется последовательными вставками с редкими удалениями;
+таймер root.after подменён заглушкой, поэтому меряется только то, что
+выполняется на каждое нажатие клавиши, и отдельно — стоимость рассылки.
+Дисплей не нужен:
+    python benchmarks/bench_edit_events.py
+"""
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from EditEvents import EditDispatcher  # noqa: E402
+
+KEYSTROKES = 200_000
+BURST = 50  # Нажатий между рассылками
+SUBSCRIBERS = (1, 10, 100)
+
+
+class FakeRoot:
+    """Заглушка root: таймеры не запускаются, рассылку вызывает сам замер."""
+
+    def after(self, delay, callback):
+        return "job"
+
+    def after_cancel(self, job):
+        pass
+
+
+def run(subscribers):
+    dispatcher = EditDispatcher(FakeRoot())
+    calls = [0]
+
+    def subscriber(ranges):
+        calls[0] += 1
+
+    for _ in range(subscribers):
+        dispatcher.subscribe(subscriber)
+
+    typing = flushing = 0.0
+    offset = 0
+    for i in range(0, KEYSTROKES, BURST):
+        started = time.perf_counter()
+        for j in range(BURST):
+            if j % 10 == 9:
+                offset -= 1
+                dispatcher.record_delete(offset, 1)
+            else:
+                dispatcher.record_insert(offset, 1)
+                offset += 1
+        typing += time.perf_counter() - started
+        started = time.perf_counter()
+        dispatcher.flush()
+        flushing += time.perf_counter() - started
+    return typing / KEYSTROKES, flushing / (KEYSTROKES // BURST), calls[0]
+
+
+def main():
+    print(f"{'подписчиков':>12} {'мкс на нажатие':>16} {'мкс на рассылку':>17} {'вызовов':>9}")
+    for subscribers in SUBSCRIBERS:
+        per_key, per_flush, calls = run(subscribers)
+        print(f"{subscribers:>12} {per_key * 1e6:>16.2f} {per_flush * 1e6:>17.2f} {calls:>9}")
+
+
+if __name__ == "__main__":
+    main()
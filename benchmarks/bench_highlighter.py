@@ -0,0 +1,69 @@
+"""Замер лексеров подсветки без дисплея: скорость полного разбора и объём разбора после правки.
+
+Для каждого лексера строится текст из LINES строк; печатается время
+полного разбора (столько занимает фоновая подсветка без учёта тегов) и
+число строк, которые приходится разобрать заново после правки одной
+строки в середине — до схождения состояния.
+
+Запуск из корня проекта:
+    python benchmarks/bench_highlighter.py
+"""
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from Highlighter import LEXERS  # noqa: E402
+
+LINES = 100_000
+SAMPLES = {
+    "log": ['2024-05-01 12:00:01,123 INFO [worker-3] request from 10.0.0.12:443 took 30.5 ms',
+            '2024-05-01 12:00:02,456 ERROR [worker-1] job 5f1c2e3a-1b2c-4d5e-8f90-123456789abc failed "timeout"'],
+    "config": ['[server]', 'host = "example.org"', 'port = 8080', 'debug = false', '# комментарий'],
+    "python": ['def handler(event):', '    """Обработчик."""', '    if event is None:',
+               '        return 0  # ничего', '    return len("text") + 1.5'],
+}
+# Правка в середине текста: строка, открывающая многострочную строку, где это возможно
+EDITS = {"log": 'ERROR "broken', "config": 'value = """', "python": 'x = """'}
+
+
+def tokenize_all(lexer, lines):
+    state = lexer.initial
+    states = [state]
+    for line in lines:
+        state = lexer.tokenize(line, state)[1]
+        states.append(state)
+    return states
+
+
+def relex_after_edit(lexer, lines, states, line):
+    """Число строк, разобранных после замены строки line, пока состояние не сошлось."""
+    state = states[line]
+    count = 0
+    for i in range(line, len(lines)):
+        state = lexer.tokenize(lines[i], state)[1]
+        count += 1
+        if state == states[i + 1]:
+            break
+    return count
+
+
+def main():
+    for name, lexer in LEXERS.items():
+        sample = SAMPLES[name]
+        lines = [sample[i % len(sample)] for i in range(LINES)]
+        started = time.perf_counter()
+        states = tokenize_all(lexer, lines)
+        elapsed = time.perf_counter() - started
+
+        middle = LINES // 2
+        edited = lines[:middle] + [EDITS[name]] + lines[middle + 1:]
+        relexed = relex_after_edit(lexer, edited, states, middle)
+        print(f"{lexer.title:<14} {LINES} строк за {elapsed * 1000:.0f} мс "
+              f"({LINES / elapsed / 1000:.0f} тыс. строк/с), после правки разобрано строк: {relexed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Замер истории правок длинного сеанса без дисплея: память, сжатые сегменты, диск и отмена с диска.
+
+Записывается EDITS правок (набор, удаление, форматирование) в историю с
+лимитом памяти BUDGET; печатается, сколько записей и байт осталось в
+памяти, в сжатом виде и на диске, сколько заняла запись истории и сколько —
+отмена всех записей, включая чтение сегментов с диска.
+
+Запуск из корня проекта:
+    python benchmarks/bench_history.py
+"""
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from UndoHistory import UndoHistory  # noqa: E402
+
+EDITS = 200_000
+BUDGET = 4 * 1024 * 1024
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "текст", "редактор", "формат")
+
+
+def main():
+    history = UndoHistory(max_bytes=BUDGET)
+    rng = random.Random(1)
+    started = time.perf_counter()
+    for i in range(EDITS):
+        offset = rng.randrange(1_000_000)
+        kind = rng.random()
+        if kind < 0.6:
+            history.record_insert(offset, " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8))))
+        elif kind < 0.9:
+            history.record_delete(offset, rng.choice(WORDS), [("style_1", offset, offset + 3)])
+        else:
+            history.record_format(offset, offset + 40, [("style_1", offset, offset + 40)],
+                                  [("style_2", offset, offset + 40)])
+        history.seal()
+    record_time = time.perf_counter() - started
+
+    stats = history.stats()
+    print(f"{EDITS} правок при лимите {BUDGET / 1024 / 1024:.0f} МБ: запись {record_time:.2f} с")
+    print(f"  в памяти {stats['memory_entries']} записей, {stats['memory_bytes'] / 1024 / 1024:.1f} МБ")
+    print(f"  сжато {stats['compressed_entries']} записей, {stats['compressed_bytes'] / 1024 / 1024:.2f} МБ")
+    print(f"  на диске {stats['disk_entries']} записей, {stats['disk_bytes'] / 1024 / 1024:.2f} МБ")
+
+    started = time.perf_counter()
+    undone = 0
+    while history.undo() is not None:
+        undone += 1
+    print(f"Отмена {undone} записей (с чтением сегментов): {time.perf_counter() - started:.2f} с")
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
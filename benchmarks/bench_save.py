@@ -0,0 +1,84 @@
+"""Замер сохранения документов 10k, 100k и 1M символов тем путём, которым сохраняет редактор.
+
+В потоке интерфейса снимается снимок модели (Document.snapshot), в рабочем
+потоке FileTasks.write_document переводит его в JSON и пишет файл. Оба шага
+замеряются отдельно; записанный файл читается обратно и сверяется с
+документом.
+
+Запуск из корня проекта (дисплей не нужен):
+    python benchmarks/bench_save.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import DocumentCodec  # noqa: E402
+import DocumentFormat  # noqa: E402
+import FileTasks  # noqa: E402
+from Document import Document  # noqa: E402
+
+SIZES = (10_000, 100_000, 1_000_000)
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "текст", "редактор", "формат")
+STYLES = [
+    dict(DocumentFormat.DEFAULT_STYLE),
+    dict(DocumentFormat.DEFAULT_STYLE, bold=True),
+    dict(DocumentFormat.DEFAULT_STYLE, italic=True, color="#ff0000"),
+    dict(DocumentFormat.DEFAULT_STYLE, font="Courier", size=14, underline=True),
+]
+
+
+def make_document(size, seed=0):
+    """Создаёт документ заданной длины с отрезком стиля примерно на каждые 40 символов."""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS) + ("\n" if rng.random() < 0.1 else " ")
+        parts.append(word)
+        length += len(word)
+    text = "".join(parts)[:size]
+
+    builder = DocumentFormat.RunBuilder()
+    position = 0
+    while position < size:
+        end = min(size, position + rng.randint(10, 70))
+        builder.add(position, end, rng.choice(STYLES))
+        position = end
+    return DocumentFormat.make_document(text, builder.table.styles, builder.runs)
+
+
+def main():
+    # Задача без потока: write_document только проверяет отмену и сообщает о прогрессе
+    task = FileTasks.BackgroundTask(None, None, None, None)
+    directory = tempfile.mkdtemp(prefix="bench-save-")
+    path = os.path.join(directory, "document.json")
+    failed = False
+    for size in SIZES:
+        document = Document.from_json(make_document(size))
+
+        started = time.perf_counter()
+        snapshot = document.snapshot()
+        snapshot_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        FileTasks.write_document(path, snapshot, task)
+        write_time = time.perf_counter() - started
+        print(f"{size:>9} символов: снимок {snapshot_time * 1000:7.2f} мс, "
+              f"запись {write_time * 1000:8.1f} мс, отрезков: {len(document.styles)}")
+
+        with open(path, "rb") as file:
+            if Document.from_json(DocumentCodec.decode(file.read())).to_json() != document.to_json():
+                print("[ERROR] Прочитанный документ не совпадает с сохранённым")
+                failed = True
+    os.remove(path)
+    os.rmdir(directory)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Замер запуска редактора: время импортов (python -X importtime) и время до первой отрисовки окна.
+
+Каждый замер выполняется в отдельном процессе. Время до первой отрисовки
+меряется с холодным кэшем шрифтов (пустой домашний каталог) и с прогретым;
+отдельно показано, когда после отрисовки появился список шрифтов.
+
+Запуск из корня проекта (для отрисовки нужен дисплей, например Xvfb):
+    python benchmarks/bench_startup.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPEATS = 5
+TOP_IMPORTS = 15
+HEAVY_MODULES = ("PIL", "numpy")  # Не должны импортироваться при запуске
+
+# Печатает время до первой отрисовки и до заполнения списка шрифтов (секунды от старта процесса)
+FIRST_PAINT_SCRIPT = """
+import time
+started = time.perf_counter()
+import tkinter as tk
+from TextEditorCore import TextEditor
+
+root = tk.Tk()
+editor = TextEditor(root, autosave=False)
+result = {}
+
+def painted(event):
+    if "paint" not in result:
+        result["paint"] = time.perf_counter() - started
+        root.after(10, fonts_ready)
+
+def fonts_ready():
+    if editor.font_families:
+        result["fonts"] = time.perf_counter() - started
+        print(result["paint"], result["fonts"])
+        root.destroy()
+    else:
+        root.after(10, fonts_ready)
+
+root.bind("<Expose>", lambda event: root.after_idle(painted, event), add="+")
+root.mainloop()
+"""
+
+
+def measure_imports():
+    """Разбирает вывод -X importtime; возвращает {модуль: (собственное, суммарное время в мкс)}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import TextEditorCore"],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure_first_paint(home):
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_PAINT_SCRIPT], cwd=ROOT_DIR, env=env,
+        capture_output=True, text=True, timeout=60,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "ошибка запуска")
+    paint, fonts = map(float, result.stdout.split())
+    return paint, fonts
+
+
+def main():
+    modules = measure_imports()
+    total = modules.get("TextEditorCore", (0, 0))[1]
+    print(f"Импорт TextEditorCore: {total / 1000:.1f} мс")
+    print(f"Самые медленные модули (собственное время), первые {TOP_IMPORTS}:")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][0])[:TOP_IMPORTS]:
+        print(f"  {name:<40} {self_us / 1000:8.2f} мс  (суммарно {cumulative_us / 1000:8.2f} мс)")
+    heavy = [name for name in modules if name.split(".")[0] in HEAVY_MODULES]
+    print("Тяжёлые модули при запуске:", ", ".join(heavy) if heavy else "нет")
+
+    with tempfile.TemporaryDirectory() as home:
+        runs = []
+        try:
+            for _ in range(REPEATS + 1):
+                runs.append(measure_first_paint(home))
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"Время до первой отрисовки не измерено: {e}")
+            return
+        cold, warm = runs[0], runs[1:]
+        print(f"Холодный кэш шрифтов: отрисовка {cold[0] * 1000:.0f} мс, список шрифтов {cold[1] * 1000:.0f} мс")
+        print(
+            f"Прогретый кэш (медиана из {REPEATS}): "
+            f"отрисовка {statistics.median(paint for paint, _ in warm) * 1000:.0f} мс, "
+            f"список шрифтов {statistics.median(fonts for _, fonts in warm) * 1000:.0f} мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Замер совместной правки без дисплея: локальный сервер и несколько клиентов на одной машине.
+
+Сервер SyncServer запускается в потоке (LocalServer) на свободном порту,
+CLIENTS клиентов SyncSession подключаются к нему; вместо цикла Tk их очереди
+опрашивает Pump. Каждый клиент делает EDITS случайных правок (вставки,
+удаления, форматирование) в свою копию документа, не дожидаясь остальных.
+В конце проверяется, что все копии совпали с документом сервера, и
+печатается объём переданных данных относительно числа правок и размера
+документа.
+
+Запуск из корня проекта:
+    python benchmarks/bench_sync.py
+"""
+import heapq
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import DocumentFormat  # noqa: E402
+from Document import Document  # noqa: E402
+from run_benchmarks import make_document  # noqa: E402
+from SyncClient import SyncSession  # noqa: E402
+from SyncOperations import delete_delta, format_delta, insert_delta  # noqa: E402
+from SyncServer import LocalServer  # noqa: E402
+
+CLIENTS = 4
+EDITS = 2000
+SIZE = 1_000_000
+DENSITY = 40
+TIMEOUT = 60  # Секунд на схождение копий
+STYLE_KEYS = [DocumentFormat.DEFAULT_STYLE_KEY,
+              DocumentFormat.style_key(dict(DocumentFormat.DEFAULT_STYLE, bold=True))]
+
+
+class Pump:
+    """Заменяет root.after для SyncConnection: отложенные вызовы выполняются в run_once."""
+
+    def __init__(self):
+        self.calls = []
+        self.counter = 0
+
+    def after(self, delay, callback):
+        self.counter += 1
+        heapq.heappush(self.calls, (time.perf_counter() + delay / 1000, self.counter, callback))
+        return self.counter
+
+    def run_once(self):
+        now = time.perf_counter()
+        while self.calls and self.calls[0][0] <= now:
+            heapq.heappop(self.calls)[2]()
+
+
+def random_edit(document, rng):
+    length = len(document)
+    kind = rng.random()
+    if kind < 0.6 or length < 10:
+        return insert_delta(rng.randint(0, length), rng.choice(("a", "б", " ", "\n", "слово ")), rng.choice(STYLE_KEYS))
+    start = rng.randint(0, length - 5)
+    end = start + rng.randint(1, 5)
+    if kind < 0.85:
+        return delete_delta(start, end - start)
+    return format_delta(start, end, rng.choice(STYLE_KEYS))
+
+
+def main():
+    data = make_document(SIZE, DENSITY)
+    server = LocalServer(("tcp", "127.0.0.1", 0))
+    address = server.start()
+    pump = Pump()
+    documents = []
+    sessions = []
+
+    def connect(index, document_json):
+        document = Document.from_json(data) if document_json is not None else None
+        documents.append(document)
+
+        def on_welcome(doc):
+            if doc is not None:
+                documents[index] = Document.from_json(doc)
+
+        def on_remote(deltas):
+            for delta in deltas:
+                delta.apply(documents[index])
+
+        def on_closed(error):
+            if error is not None:
+                print(f"[ERROR] Клиент {index}: {error}")
+
+        session = SyncSession(pump, address, document_json, on_welcome, on_remote, on_closed)
+        sessions.append(session)
+        session.start()
+        while not session.connected:
+            pump.run_once()
+            time.sleep(0.001)
+
+    started = time.perf_counter()
+    connect(0, data)
+    for index in range(1, CLIENTS):
+        connect(index, None)
+    shared = sessions[0].connection.bytes_sent
+    joined = sum(session.connection.bytes_received for session in sessions[1:])
+    print(f"Подключение {CLIENTS} клиентов: {time.perf_counter() - started:.2f} с, "
+          f"документ {SIZE} символов, передано {joined / 1024 / 1024:.1f} МБ")
+
+    rng = random.Random(1)
+    started = time.perf_counter()
+    for _ in range(EDITS):
+        index = rng.randrange(CLIENTS)
+        delta = random_edit(documents[index], rng)
+        delta.apply(documents[index])
+        sessions[index].record(delta)
+        pump.run_once()
+    deadline = time.perf_counter() + TIMEOUT
+    while any(session.state.pending or session.state.buffer for session in sessions) \
+            or any(session.state.revision != server.server.revision for session in sessions):
+        if time.perf_counter() > deadline:
+            print("[ERROR] Копии не сошлись за отведённое время")
+            return 1
+        pump.run_once()
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - started
+
+    expected = server.server.document.to_json()
+    converged = all(document.to_json() == expected for document in documents)
+    sent = sum(session.connection.bytes_sent for session in sessions) - shared
+    received = sum(session.connection.bytes_received for session in sessions) - joined
+    print(f"{EDITS} правок от {CLIENTS} клиентов: {elapsed:.2f} с, ревизий сервера {server.server.revision}")
+    print(f"Отправлено {sent / EDITS:.0f} байт/правку, получено {received / EDITS:.0f} байт/правку "
+          f"(документ {len(expected['text'])} символов)")
+    print("Копии совпадают" if converged else "[ERROR] Копии разошлись")
+
+    for session in sessions:
+        session.close()
+    server.stop()
+    return 0 if converged else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Замер усыпления вкладок без дисплея: объём модели и сжатого документа, время сжатия и разворачивания.
+
+Открывается TABS вкладок по SIZE символов, затем вкладки по очереди
+становятся активными, а вкладки сверх бюджета усыпляются, как это делает
+редактор. В конце печатается общий объём вкладок относительно бюджета.
+
+Запуск из корня проекта:
+    python benchmarks/bench_tabs.py
+"""
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Document import Document  # noqa: E402
+from DocumentTabs import DocumentTab, TabManager, document_size, pack_document, unpack_document  # noqa: E402
+from run_benchmarks import make_document  # noqa: E402
+
+TABS = 30
+SIZE = 1_000_000
+DENSITY = 40
+BUDGET = 64 * 1024 * 1024
+
+
+def main():
+    data = make_document(SIZE, DENSITY)
+    document = Document.from_json(data)
+
+    started = time.perf_counter()
+    packed = pack_document(document)
+    pack_time = time.perf_counter() - started
+    started = time.perf_counter()
+    unpack_document(packed)
+    unpack_time = time.perf_counter() - started
+    print(f"Документ {SIZE} символов: модель ~{document_size(document) / 1024 / 1024:.1f} МБ, "
+          f"сжатый {len(packed) / 1024 / 1024:.2f} МБ")
+    print(f"Сжатие {pack_time * 1000:.0f} мс, разворачивание {unpack_time * 1000:.0f} мс")
+
+    tabs = TabManager(BUDGET)
+    for i in range(TABS):
+        tab = tabs.add(DocumentTab(f"вкладка {i}", Document.from_json(data)))
+        tabs.activate(tab)
+        for candidate in tabs.hibernation_candidates():
+            candidate.packed, candidate.document = pack_document(candidate.document), None
+    hibernated = sum(tab.hibernated for tab in tabs)
+    print(f"{TABS} вкладок: усыплено {hibernated}, всего ~{tabs.memory_size() / 1024 / 1024:.1f} МБ "
+          f"при бюджете {BUDGET / 1024 / 1024:.0f} МБ "
+          f"(без усыпления ~{TABS * document_size(document) / 1024 / 1024:.0f} МБ)")
+
+
+if __name__ == "__main__":
+    main()
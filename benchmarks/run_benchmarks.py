@@ -0,0 +1,424 @@
+"""Набор замеров основных операций редактора с сохранением результатов и сравнением с эталоном.
+
+Синтетический документ заданного размера и плотности форматирования (средняя
+длина отрезка стиля) проверяется на операциях: открытие, сохранение, поиск,
+замена, массовое форматирование, строка состояния, перевод смещений в
+позиции "строка.столбец" и N шагов отмены.
+
+Режимы:
+    model  — без дисплея, модель документа (Document, SearchEngine, UndoHistory);
+    editor — через TextEditor, нужен дисплей (например, xvfb-run).
+
+Каждая операция выполняется --repeat раз (в таблицу идёт медиана), затем ещё
+раз под tracemalloc для пикового объёма памяти. Результаты пишутся в JSON
+(--output); с --baseline они сравниваются с сохранённым эталоном по
+лучшему прогону, и при замедлении сверх --threshold скрипт завершается с
+кодом 1.
+
+Примеры запуска из корня проекта:
+    python benchmarks/run_benchmarks.py --mode model --sizes 100000,1000000
+    xvfb-run python benchmarks/run_benchmarks.py --mode all --output results.json
+    python benchmarks/run_benchmarks.py --baseline baseline.json --save-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import DocumentCodec  # noqa: E402
+import DocumentFormat  # noqa: E402
+from Document import Document  # noqa: E402
+from SearchEngine import SearchEngine, SearchOptions, find_replacements  # noqa: E402
+from TextStats import TextStats  # noqa: E402
+from UndoHistory import UndoHistory  # noqa: E402
+
+DEFAULT_SIZES = (100_000, 1_000_000)
+DEFAULT_DENSITY = 40  # Средняя длина отрезка стиля, символов
+DEFAULT_UNDO_STEPS = 1000
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.2  # Допустимое замедление относительно эталона (доля)
+MIN_REGRESSION = 0.002  # Разница меньше этой (секунд) считается шумом
+STATUS_CALLS = 100
+POSITION_CALLS = 10_000
+
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "текст", "редактор", "формат")
+SEARCH_QUERY = "текст"
+REPLACE_QUERY, REPLACEMENT = "dolor", "DOLOR"
+STYLES = [
+    dict(DocumentFormat.DEFAULT_STYLE),
+    dict(DocumentFormat.DEFAULT_STYLE, bold=True),
+    dict(DocumentFormat.DEFAULT_STYLE, italic=True, color="#ff0000"),
+    dict(DocumentFormat.DEFAULT_STYLE, font="Courier", size=14, underline=True),
+]
+BOLD_KEY = DocumentFormat.style_key(dict(DocumentFormat.DEFAULT_STYLE, bold=True))
+
+
+def make_document(size, density, seed=0):
+    """JSON-документ из size символов с отрезками стилей средней длины density."""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS) + ("\n" if rng.random() < 0.1 else " ")
+        parts.append(word)
+        length += len(word)
+    text = "".join(parts)[:size]
+
+    builder = DocumentFormat.RunBuilder()
+    position = 0
+    while position < size:
+        end = min(size, position + rng.randint(1, 2 * density - 1))
+        builder.add(position, end, rng.choice(STYLES))
+        position = end
+    return DocumentFormat.make_document(text, builder.table.styles, builder.runs)
+
+
+# --- Операции над моделью документа ---
+# Каждая функция получает JSON-документ и параметры и возвращает подготовку
+# (не замеряется) и саму операцию, которая принимает результат подготовки.
+
+def model_load(data, args):
+    encoded = DocumentCodec.encode(data)
+    return lambda: encoded, lambda encoded: Document.from_json(DocumentCodec.decode(encoded))
+
+
+def model_save(data, args):
+    return lambda: Document.from_json(data), lambda document: DocumentCodec.encode(document.to_json())
+
+
+def model_search(data, args):
+    def search(document):
+        SearchEngine().search(document.text(), SEARCH_QUERY, SearchOptions())
+    return lambda: Document.from_json(data), search
+
+
+def model_replace(data, args):
+    def replace(document):
+        replacements = find_replacements(document.text(), REPLACE_QUERY, REPLACEMENT, SearchOptions())
+        for start, end, new_text in reversed(replacements):
+            key = document.style_at(start)
+            document.delete(start, end - start)
+            document.insert(start, new_text, key)
+    return lambda: Document.from_json(data), replace
+
+
+def model_format(data, args):
+    def bulk_format(document):
+        for start in range(0, len(document), 2 * args.density):
+            document.set_style(start, min(len(document), start + args.density), BOLD_KEY)
+    return lambda: Document.from_json(data), bulk_format
+
+
+def model_status(data, args):
+    def status(document):
+        stats = TextStats()
+        stats.recount(document.text())
+        for i in range(STATUS_CALLS):
+            document.set_cursor(i * len(document) // STATUS_CALLS)
+            stats.apply_insert("a", document.text(i, i + 1), "")
+    return lambda: Document.from_json(data), status
+
+
+def model_positions(data, args):
+    """Построение индекса строк, переводы смещение <-> позиция вперемешку с правками и пакетный перевод.
+
+    Правки вносятся только в индекс строк: время правки самого документа замеряют другие операции.
+    """
+    def positions(document):
+        lines = document.lines
+        rng = random.Random(2)
+        for _ in range(POSITION_CALLS):
+            offset = rng.randrange(len(lines))
+            line, column = lines.position(offset)
+            lines.offset(line, column)
+            lines.insert(offset, "\n" if rng.random() < 0.5 else "a")
+        lines.indices(range(0, len(lines), max(1, len(lines) // POSITION_CALLS)))
+    return lambda: Document.from_json(data), positions
+
+
+def model_undo(data, args):
+    """N правок, каждая — отдельный шаг истории; замеряется отмена всех N шагов."""
+    def prepare():
+        document = Document.from_json(data)
+        history = UndoHistory()
+        rng = random.Random(1)
+        for _ in range(args.undo_steps):
+            offset = rng.randrange(len(document))
+            if rng.random() < 0.7:
+                document.insert(offset, "ab")
+                history.record_insert(offset, "ab")
+            else:
+                text = document.text(offset, offset + 3)
+                document.delete(offset, len(text))
+                history.record_delete(offset, text)
+            history.seal()
+        return document, history
+
+    def undo(state):
+        document, history = state
+        for _ in range(args.undo_steps):
+            for delta in reversed(history.undo().deltas):
+                if delta.kind == "insert":
+                    document.delete(delta.offset, len(delta.text))
+                else:
+                    document.insert(delta.offset, delta.text)
+    return prepare, undo
+
+
+MODEL_CASES = {
+    "load": model_load,
+    "save": model_save,
+    "search": model_search,
+    "replace": model_replace,
+    "format": model_format,
+    "status": model_status,
+    "positions": model_positions,
+    "undo": model_undo,
+}
+
+
+# --- Операции через TextEditor (нужен дисплей) ---
+
+class EditorCases:
+    """Операции над открытым TextEditor; каждая подготовка заново загружает документ."""
+
+    def __init__(self):
+        import tkinter as tk
+        from TextEditorCore import TextEditor
+
+        self.tk = tk
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.editor = TextEditor(self.root, autosave=False)
+
+    def close(self):
+        self.editor.images.shutdown()
+        self.root.destroy()
+
+    def load_document(self, data):
+        self.editor.json_to_text(data)
+        self.editor.history.clear()
+        self.root.update()
+
+    def cases(self):
+        return {
+            "load": self.load,
+            "save": self.save,
+            "search": self.search,
+            "replace": self.replace,
+            "format": self.format,
+            "status": self.status,
+            "positions": self.positions,
+            "undo": self.undo,
+        }
+
+    def load(self, data, args):
+        return lambda: None, lambda state: self.editor.json_to_text(data)
+
+    def save(self, data, args):
+        return lambda: self.load_document(data), lambda state: self.editor.text_to_json()
+
+    def search(self, data, args):
+        editor = self.editor
+
+        def prepare():
+            self.load_document(data)
+            editor.search_text()
+            editor.search_query.set(SEARCH_QUERY)
+            editor.search_engine.invalidate()
+
+        def search(state):
+            editor.run_search()
+            self.root.update_idletasks()
+        return prepare, search
+
+    def replace(self, data, args):
+        editor = self.editor
+
+        def replace(state):
+            editor.apply_replacements(
+                find_replacements(editor.document.text(), REPLACE_QUERY, REPLACEMENT, SearchOptions()))
+        return lambda: self.load_document(data), replace
+
+    def format(self, data, args):
+        editor = self.editor
+
+        def prepare():
+            self.load_document(data)
+            editor.text_area.tag_add(self.tk.SEL, "1.0", "end-1c")
+
+        def bulk_format(state):
+            editor.restyle_selection(lambda style: dict(style, bold=True))
+            self.root.update_idletasks()
+        return prepare, bulk_format
+
+    def status(self, data, args):
+        editor = self.editor
+
+        def status(state):
+            for i in range(STATUS_CALLS):
+                editor.text_area.mark_set(self.tk.INSERT, editor.offset_to_index(i * len(editor.document) // STATUS_CALLS))
+                editor.update_status_bar()
+        return lambda: self.load_document(data), status
+
+    def positions(self, data, args):
+        editor = self.editor
+
+        def positions(state):
+            rng = random.Random(2)
+            for _ in range(POSITION_CALLS):
+                editor.index_to_offset(editor.offset_to_index(rng.randrange(len(editor.document))))
+        return lambda: self.load_document(data), positions
+
+    def undo(self, data, args):
+        editor = self.editor
+
+        def prepare():
+            self.load_document(data)
+            rng = random.Random(1)
+            for _ in range(args.undo_steps):
+                index = editor.offset_to_index(rng.randrange(len(editor.document)))
+                if rng.random() < 0.7:
+                    editor.text_area.insert(index, "ab")
+                else:
+                    editor.text_area.delete(index, f"{index} + 3 indices")
+                editor.history.seal()
+
+        def undo(state):
+            for _ in range(args.undo_steps):
+                editor.undo()
+            self.root.update_idletasks()
+        return prepare, undo
+
+
+# --- Замер, сохранение и сравнение ---
+
+def measure(prepare, operation, repeat):
+    """Медиана и минимум времени операции по repeat прогонам и пик памяти отдельного прогона."""
+    timings = []
+    for _ in range(repeat):
+        state = prepare()
+        started = time.perf_counter()
+        operation(state)
+        timings.append(time.perf_counter() - started)
+
+    state = prepare()
+    tracemalloc.start()
+    try:
+        operation(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": statistics.median(timings), "min_seconds": min(timings), "peak_bytes": peak}
+
+
+def run_cases(mode, cases, args, results):
+    for size in args.sizes:
+        data = make_document(size, args.density)
+        for name, case in cases.items():
+            if args.only and name not in args.only:
+                continue
+            key = f"{mode}/{name}/{size}"
+            prepare, operation = case(data, args)
+            results[key] = measure(prepare, operation, args.repeat)
+            result = results[key]
+            print(f"{key:<28} {result['seconds'] * 1000:10.1f} мс {result['peak_bytes'] / 1024 / 1024:10.1f} МБ")
+
+
+def compare(results, baseline, threshold):
+    """Печатает сравнение с эталоном; возвращает список замедлившихся операций."""
+    regressions = []
+    print(f"\n{'операция':<28} {'эталон':>10} {'сейчас':>10} {'изменение':>10}")
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            print(f"{key:<28} {'—':>10} {result['min_seconds'] * 1000:9.1f}  (нет в эталоне)")
+            continue
+        # Сравнивается лучший прогон: он меньше зависит от фоновой нагрузки
+        now, before = result["min_seconds"], reference["min_seconds"]
+        ratio = now / before if before else 1.0
+        mark = ""
+        if ratio > 1 + threshold and now - before > MIN_REGRESSION:
+            regressions.append(key)
+            mark = "  ЗАМЕДЛЕНИЕ"
+        print(f"{key:<28} {before * 1000:9.1f} {now * 1000:9.1f} {(ratio - 1) * 100:+9.1f}%{mark}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("model", "editor", "all"), default="model")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="размеры документов через запятую, символов")
+    parser.add_argument("--density", type=int, default=DEFAULT_DENSITY,
+                        help="средняя длина отрезка стиля, символов")
+    parser.add_argument("--undo-steps", type=int, default=DEFAULT_UNDO_STEPS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--only", default="", help="операции через запятую (по умолчанию все)")
+    parser.add_argument("--output", help="файл JSON для результатов")
+    parser.add_argument("--baseline", help="файл JSON с эталонными результатами")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты в --baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+    args.only = {name for name in args.only.split(",") if name}
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    if args.mode in ("model", "all"):
+        run_cases("model", MODEL_CASES, args, results)
+    if args.mode in ("editor", "all"):
+        try:
+            editor_cases = EditorCases()
+        except Exception as e:
+            print(f"[ERROR] Замеры через редактор пропущены (нет дисплея?): {e}")
+        else:
+            try:
+                run_cases("editor", editor_cases.cases(), args, results)
+            finally:
+                editor_cases.close()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "density": args.density,
+            "undo_steps": args.undo_steps,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    if not args.baseline:
+        return 0
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"Эталон сохранён: {args.baseline}")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nЗамедлились ({len(regressions)}): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
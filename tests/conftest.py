@@ -0,0 +1,6 @@
+"""Общие настройки тестов: модули редактора импортируются из корня проекта."""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
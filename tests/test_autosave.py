@@ -0,0 +1,91 @@
+"""Тесты журнала автосохранения: восстановление документа по снимку и журналу."""
+import os
+
+import DocumentFormat
+from Autosave import Autosave, AutosaveSession, orphaned_sessions, recover, recover_session, remove_session
+from Document import OBJECT_REPLACEMENT, Document
+
+IMAGE_REF = ("0" * 64, 40, 30)
+IMAGE_DATA = b"\x89PNG image data"
+
+
+def journal_document(directory, document, edits):
+    """Пишет журнал правок edits(autosave) после снимка document и возвращает восстановленный документ."""
+    autosave = Autosave(str(directory), snapshot_interval=3600)
+    autosave.reset(document)
+    edits(autosave)
+    autosave.close(discard_files=False)
+    return recover(str(directory))
+
+
+def test_recover_text_edits(tmp_path):
+    def edits(autosave):
+        autosave.record_insert(6, " мир", DocumentFormat.DEFAULT_STYLE_KEY)
+        autosave.record_delete(0, 1)
+
+    recovered = journal_document(tmp_path, Document("привет"), edits)
+    assert Document.from_json(recovered).text() == "ривет мир"
+
+
+def test_recover_inline_image(tmp_path):
+    def edits(autosave):
+        autosave.record_insert(2, OBJECT_REPLACEMENT, DocumentFormat.DEFAULT_STYLE_KEY)
+        autosave.record_image(2, 3, IMAGE_REF, IMAGE_DATA)
+
+    document = Document.from_json(journal_document(tmp_path, Document("ab"), edits))
+    assert document.image_at(2) == IMAGE_REF
+    assert document.image_data[IMAGE_REF[0]] == IMAGE_DATA
+
+
+def test_sessions_do_not_share_journals(tmp_path):
+    first, second = AutosaveSession(str(tmp_path)), AutosaveSession(str(tmp_path))
+    try:
+        assert first.directory != second.directory
+        # Оба редактора живы: восстанавливать нечего
+        assert orphaned_sessions(str(tmp_path)) == []
+    finally:
+        first.close()
+        second.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_orphaned_session_is_recovered(tmp_path):
+    session = AutosaveSession(str(tmp_path))
+    journal_document(session.directory, Document("текст"), lambda autosave: autosave.record_delete(0, 1))
+    session.lock.release()  # Так блокировку снимает ОС, когда редактор падает
+
+    sessions = orphaned_sessions(str(tmp_path))
+    assert [directory for directory, _ in sessions] == [session.directory]
+    assert Document.from_json(recover(session.directory)).text() == "екст"
+    remove_session(*sessions[0])
+    assert os.listdir(tmp_path) == []
+
+
+def test_write_error_is_reported(tmp_path):
+    blocked = tmp_path / "file"
+    blocked.write_text("не каталог")
+    autosave = Autosave(str(blocked / "autosave"))
+    autosave.reset(Document("текст"))
+    autosave.close(discard_files=False)
+    assert isinstance(autosave.take_error(), OSError)
+    assert autosave.take_error() is None
+
+
+def test_every_tab_journal_is_recovered(tmp_path):
+    session = AutosaveSession(str(tmp_path))
+    first = Autosave(session.journal_directory(), snapshot_interval=3600)
+    second = Autosave(session.journal_directory(), snapshot_interval=3600)
+    first.reset(Document("первая"))
+    second.reset(Document("вторая"))
+    first.record_insert(6, "!", DocumentFormat.DEFAULT_STYLE_KEY)
+    second.record_delete(0, 1)
+    second.suspend()  # Вкладка усыплена: журнал остаётся на диске
+    first.close(discard_files=False)
+    second.close(discard_files=False)
+    session.lock.release()
+
+    (directory, lock), = orphaned_sessions(str(tmp_path))
+    texts = [Document.from_json(document).text() for document in recover_session(directory)]
+    assert texts == ["первая!", "торая"]
+    remove_session(directory, lock)
+    assert os.listdir(tmp_path) == []
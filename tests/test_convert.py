@@ -0,0 +1,43 @@
+"""Тесты пакетного преобразования (Convert) без запуска Tk."""
+import json
+
+import pytest
+
+import Convert
+from Convert import LEGACY_BATCH
+from Document import Document
+
+
+@pytest.mark.parametrize("length", [LEGACY_BATCH - 1, LEGACY_BATCH, 2 * LEGACY_BATCH - 1, 2 * LEGACY_BATCH, 0])
+def test_write_legacy_is_valid_json(tmp_path, length):
+    # К тексту добавляется перевод строки виджета: длины кратны LEGACY_BATCH при length = k * LEGACY_BATCH - 1
+    text = ("абв\n" * length)[:length]
+    output_path = tmp_path / "legacy.json"
+    Convert.write_legacy(Document(text), str(output_path))
+    with open(output_path, encoding="utf-8") as file:
+        data = json.load(file)
+    assert len(data) == length + 1
+    assert "".join(item["text"] for item in data) == text + "\n"
+
+
+def test_convert_text_to_legacy_and_back(tmp_path):
+    source_path = tmp_path / "source.txt"
+    source_path.write_text("строка\n" * 700, encoding="utf-8")
+    legacy_path = tmp_path / "legacy.json"
+    Convert.convert_file(str(source_path), str(legacy_path), "legacy")
+    document = Convert.read_document(str(legacy_path))
+    assert document.text() == "строка\n" * 700
+
+
+@pytest.mark.parametrize("output_format", ["json", "json.gz"])
+def test_streamed_text_matches_document(tmp_path, monkeypatch, output_format):
+    # Потоковая запись маленькими блоками: пары \r\n и многобайтовые символы на границах блоков
+    monkeypatch.setattr(Convert, "STREAM_THRESHOLD", 0)
+    monkeypatch.setattr(Convert, "STREAM_CHUNK", 7)
+    source_path = tmp_path / "source.txt"
+    source_path.write_bytes("строка \"в кавычках\"\\😀\r\n".encode("utf-8") * 50)
+    output_path = tmp_path / f"streamed{Convert.OUTPUT_FORMATS[output_format]}"
+    Convert.convert_file(str(source_path), str(output_path), output_format)
+    document = Convert.read_document(str(output_path))
+    assert document.text() == Convert.read_text(str(source_path))
+    assert document.to_json() == Document(document.text()).to_json()
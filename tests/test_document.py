@@ -0,0 +1,180 @@
+"""Тесты модели документа: таблица фрагментов, отрезки стилей, строки и JSON."""
+import random
+
+import Document as document_module
+import DocumentFormat
+from Document import OBJECT_REPLACEMENT, Document, PieceTable, StyleRuns
+
+BOLD = DocumentFormat.style_key(dict(DocumentFormat.DEFAULT_STYLE, bold=True))
+ITALIC = DocumentFormat.style_key(dict(DocumentFormat.DEFAULT_STYLE, italic=True))
+KEYS = [DocumentFormat.DEFAULT_STYLE_KEY, BOLD, ITALIC]
+
+
+def random_text(rng):
+    return "".join(rng.choice("ab \nя") for _ in range(rng.randint(1, 8)))
+
+
+def test_piece_table_matches_string(monkeypatch):
+    # Маленький порог: таблица успевает несколько раз пересобраться
+    monkeypatch.setattr(document_module, "COMPACT_PIECES", 32)
+    rng = random.Random(1)
+    table = PieceTable("начальный текст")
+    expected = "начальный текст"
+    for _ in range(2000):
+        offset = rng.randint(0, len(expected))
+        if rng.random() < 0.6:
+            text = random_text(rng)
+            table.insert(offset, text)
+            expected = expected[:offset] + text + expected[offset:]
+        else:
+            length = rng.randint(0, 6)
+            assert table.delete(offset, length) == expected[offset:offset + length]
+            expected = expected[:offset] + expected[offset + length:]
+        assert len(table) == len(expected)
+        start = rng.randint(0, len(expected))
+        assert table.text(start, start + 10) == expected[start:start + 10]
+    assert table.text() == expected
+
+
+def test_piece_table_typing_extends_one_piece():
+    table = PieceTable("abc")
+    for char in "hello":
+        table.insert(len(table), char)
+    assert table.text() == "abchello"
+    assert table.piece_count == 2
+
+
+def test_piece_table_copy_is_independent():
+    table = PieceTable("abc")
+    table.insert(3, "de")
+    copy = table.copy()
+    table.insert(5, "f")
+    table.delete(0, 1)
+    assert copy.text() == "abcde"
+    assert table.text() == "bcdef"
+
+
+def test_style_runs_match_per_char_keys():
+    rng = random.Random(2)
+    runs = StyleRuns(10)
+    expected = [DocumentFormat.DEFAULT_STYLE_KEY] * 10
+    for _ in range(1000):
+        offset = rng.randint(0, len(expected))
+        kind = rng.random()
+        if kind < 0.4:
+            length, key = rng.randint(1, 5), rng.choice(KEYS)
+            runs.insert(offset, length, key)
+            expected[offset:offset] = [key] * length
+        elif kind < 0.7:
+            length = rng.randint(1, 5)
+            runs.delete(offset, length)
+            del expected[offset:offset + length]
+        else:
+            end, key = offset + rng.randint(1, 8), rng.choice(KEYS)
+            runs.set_style(offset, end, key)
+            expected[offset:end] = [key] * len(expected[offset:end])
+
+        assert [runs.key_at(i) for i in range(len(expected))] == expected
+        # Соседние отрезки всегда различаются ключами
+        assert all(a != b for a, b in zip(runs.keys, runs.keys[1:]))
+        covered = [key for start, end, key in runs.runs() for _ in range(start, end)]
+        assert covered == expected
+
+
+def test_style_runs_from_runs_fills_gaps():
+    runs = StyleRuns.from_runs(10, [(2, 4, BOLD), (4, 6, BOLD), (8, 9, ITALIC)])
+    assert list(runs.runs()) == [(0, 2, DocumentFormat.DEFAULT_STYLE_KEY), (2, 6, BOLD),
+                                 (6, 8, DocumentFormat.DEFAULT_STYLE_KEY), (8, 9, ITALIC),
+                                 (9, 10, DocumentFormat.DEFAULT_STYLE_KEY)]
+    assert list(runs.runs(3, 7)) == [(3, 6, BOLD), (6, 7, DocumentFormat.DEFAULT_STYLE_KEY)]
+
+
+def test_style_runs_span_piece_boundaries():
+    # Каждая вставка в середину — отдельный фрагмент; отрезки стилей от фрагментов не зависят
+    document = Document("0123456789")
+    document.insert(5, "abc", BOLD)
+    document.insert(2, "xy")
+    document.delete(0, 1)
+    assert document.buffer.piece_count > 3
+    assert document.text() == "1xy234abc56789"
+    document.set_style(1, 11, ITALIC)
+    assert list(document.styles.runs()) == [(0, 1, DocumentFormat.DEFAULT_STYLE_KEY), (1, 11, ITALIC),
+                                            (11, 14, DocumentFormat.DEFAULT_STYLE_KEY)]
+    document.set_style(6, 9, DocumentFormat.DEFAULT_STYLE_KEY)
+    assert [document.text(start, end) for start, end, _ in document.styles.runs()] == \
+        ["1", "xy234", "abc", "56", "789"]
+    # Удаление через границы фрагментов и отрезков сливает соседние отрезки с одним стилем
+    document.delete(4, 6)
+    assert document.text() == "1xy26789"
+    assert list(document.styles.runs()) == [(0, 1, DocumentFormat.DEFAULT_STYLE_KEY), (1, 5, ITALIC),
+                                            (5, 8, DocumentFormat.DEFAULT_STYLE_KEY)]
+
+
+def test_document_lines_are_updated_by_edits():
+    document = Document("a\nb")
+    assert document.lines.line_count == 2
+    document.insert(1, "x\ny")
+    document.delete(0, 1)
+    assert document.text() == "x\ny\nb"
+    assert document.lines.line_count == 3
+    assert document.lines.index(len(document)) == "3.1"
+
+
+def test_json_round_trip_keeps_styles_and_images():
+    document = Document("обычный ")
+    document.insert(len(document), "жирный", BOLD)
+    document.insert(len(document), " и курсив", ITALIC)
+    document.insert(3, OBJECT_REPLACEMENT)
+    ref = ("hash1", 16, 8)
+    document.set_image(3, 4, ref)
+    document.add_image_data("hash1", b"\x89PNG data")
+
+    restored = Document.from_json(document.to_json())
+    assert restored.text() == document.text()
+    assert list(restored.styles.runs()) == list(document.styles.runs())
+    assert restored.image_at(3) == ref
+    assert restored.image_at(4) is None
+    assert restored.image_data == {"hash1": b"\x89PNG data"}
+    assert restored.to_json() == document.to_json()
+
+
+def test_json_round_trip_of_legacy_format():
+    # Завершающий перевод строки виджета в старом формате не входит в текст
+    chars = [{"text": "a"}, {"text": "b", "bold": True}, {"text": "\n"}]
+    document = Document.from_json(chars)
+    assert document.text() == "ab"
+    assert document.style_at(1) == BOLD
+    assert Document.from_json(document.to_json()).to_json() == document.to_json()
+
+
+def test_saved_state_restores_after_edits():
+    document = Document("abc")
+    document.insert(3, "def", BOLD)
+    saved = document.to_json()
+    document.insert(0, "x")
+    document.set_style(0, 7, ITALIC)
+    document.delete(4, 2)
+
+    restored = Document.from_json(saved)
+    assert restored.text() == "abcdef"
+    assert restored.style_at(4) == BOLD
+    # Восстановленный документ правится независимо от исходного
+    restored.insert(6, "g")
+    assert document.text() == "xabcf"
+    assert restored.text() == "abcdefg"
+
+
+def test_snapshot_is_independent():
+    document = Document("abc")
+    document.insert(3, "def", BOLD)
+    snapshot = document.snapshot()
+    document.insert(0, "x")
+    document.set_style(0, 7, ITALIC)
+    document.delete(4, 2)
+    assert snapshot.text() == "abcdef"
+    assert snapshot.style_at(4) == BOLD
+    assert document.text() == "xabcf"
+    # Снимок сохраняется и восстанавливается в том состоянии, в котором был снят
+    restored = Document.from_json(snapshot.to_json())
+    assert restored.text() == "abcdef"
+    assert list(restored.styles.runs()) == list(snapshot.styles.runs())
@@ -0,0 +1,90 @@
+"""Тесты кодирования документа: библиотеки JSON, сжатие и определение сжатия по первым байтам."""
+import io
+
+import pytest
+
+import DocumentCodec
+import DocumentFormat
+import FileTasks
+from Document import Document
+
+BOLD = DocumentFormat.style_key(dict(DocumentFormat.DEFAULT_STYLE, bold=True))
+
+
+def backend(name):
+    return pytest.param(name, marks=pytest.mark.skipif(name not in DocumentCodec.BACKENDS,
+                                                       reason=f"не установлен {name}"))
+
+
+BACKENDS = [backend("orjson"), backend("ujson"), backend("json")]
+COMPRESSIONS = [None, "gzip",
+                pytest.param("zstd", marks=pytest.mark.skipif(DocumentCodec.zstandard is None,
+                                                              reason="не установлен zstandard"))]
+
+
+def sample():
+    document = Document("Заголовок \"в кавычках\" / путь\\к\tфайлу\n")
+    document.insert(len(document), "жирный 😀", BOLD)
+    return document
+
+
+def task():
+    return FileTasks.BackgroundTask(None, None, None, None)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+@pytest.mark.parametrize("name", BACKENDS)
+def test_round_trip(name, compression):
+    data = sample().to_json()
+    encoded = DocumentCodec.encode(data, compression, name)
+    assert DocumentCodec.detect_compression(encoded) == compression
+    assert DocumentCodec.decode(encoded, name) == data
+    # Файл, записанный одной библиотекой, читается любой другой
+    for other in DocumentCodec.BACKENDS:
+        assert DocumentCodec.decode(encoded, other) == data
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_stream_writer_round_trip(compression):
+    data = DocumentCodec.encode(sample().to_json())
+    file = io.BytesIO()
+    writer = DocumentCodec.open_writer(file, compression)
+    writer.write(data)
+    if writer is not file:
+        writer.close()
+    assert DocumentCodec.decompress(file.getvalue()) == data
+
+
+def test_output_is_compact_utf8():
+    encoded = DocumentCodec.encode({"text": "привет"}, backend="json")
+    assert encoded == '{"text":"привет"}'.encode("utf-8")
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        DocumentCodec.encode({}, "brotli")
+
+
+@pytest.mark.parametrize("file_name, compression", [
+    ("gzip.json", "gzip"),
+    ("plain.json.gz", None),
+    pytest.param("zstd.json.gz", "zstd", marks=pytest.mark.skipif(DocumentCodec.zstandard is None,
+                                                                  reason="не установлен zstandard")),
+])
+def test_compression_detected_by_magic_bytes(tmp_path, file_name, compression):
+    # Расширение не совпадает с содержимым: читается по первым байтам
+    document = sample()
+    path = tmp_path / file_name
+    path.write_bytes(DocumentCodec.encode(document.to_json(), compression))
+    assert DocumentCodec.is_compressed_file(str(path)) == (compression is not None)
+    restored = FileTasks.read_document(str(path), task())
+    assert restored.to_json() == document.to_json()
+
+
+def test_write_document_compresses_by_extension(tmp_path):
+    document = sample()
+    for file_name, magic in [("doc.json", b"{"), ("doc.json.gz", DocumentCodec.GZIP_MAGIC)]:
+        path = tmp_path / file_name
+        FileTasks.write_document(str(path), document, task())
+        assert path.read_bytes().startswith(magic)
+        assert FileTasks.read_document(str(path), task()).to_json() == document.to_json()
@@ -0,0 +1,124 @@
+"""Тесты потоковой загрузки: границы блоков, переводы строк и отмена."""
+import time
+
+import pytest
+
+import FileLoader
+from FileLoader import ChunkedLoader, TextChunkReader
+
+TIMEOUT = 10  # Секунд на чтение файла рабочим потоком
+
+
+def read_all(path, size):
+    reader = TextChunkReader(str(path))
+    chunks = []
+    while (text := reader.read_chunk(size)) is not None:
+        chunks.append(text)
+    assert reader.finished and reader.file.closed
+    assert reader.bytes_read == reader.total
+    return chunks
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64])
+def test_multibyte_characters_split_between_chunks(tmp_path, size):
+    text = "я€😀 — ёж\n" * 5
+    path = tmp_path / "utf8.txt"
+    path.write_bytes(text.encode("utf-8"))
+    assert "".join(read_all(path, size)) == text
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"a\r\nb\r\n", "a\nb\n"),
+    (b"a\rb\r", "a\nb\n"),  # Одиночный \r, в том числе в конце файла
+    (b"a\r\r\nb", "a\n\nb"),
+    (b"\r\n\r\n", "\n\n"),
+    ("строка\r\nещё\rконец".encode("utf-8"), "строка\nещё\nконец"),
+])
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 1024])
+def test_line_endings_across_chunks(tmp_path, data, expected, size):
+    path = tmp_path / "lines.txt"
+    path.write_bytes(data)
+    assert "".join(read_all(path, size)) == expected
+
+
+def test_cr_at_chunk_end_is_held_back(tmp_path):
+    path = tmp_path / "crlf.txt"
+    path.write_bytes(b"ab\r\ncd")
+    reader = TextChunkReader(str(path))
+    # Блок кончается на \r: он ждёт следующего блока, и пара \r\n даёт один перевод строки
+    assert reader.read_chunk(3) == "ab"
+    assert reader.read_chunk(3) == "\ncd"
+    assert reader.read_chunk(3) is None
+
+
+class Pump:
+    """Заменяет root.after для загрузчика: отложенные вызовы выполняются в run."""
+
+    def __init__(self):
+        self.calls = {}
+        self.counter = 0
+
+    def after(self, delay, callback):
+        self.counter += 1
+        self.calls[self.counter] = callback
+        return self.counter
+
+    def after_cancel(self, job):
+        del self.calls[job]
+
+    def run(self):
+        calls, self.calls = self.calls, {}
+        for callback in calls.values():
+            callback()
+
+
+class Events:
+    def __init__(self):
+        self.chunks = []
+        self.done = []
+
+    def loader(self, root, path):
+        return ChunkedLoader(root, str(path), self.chunks.append, lambda done, total: None, self.done.append,
+                             pytest.fail)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(FileLoader, "FIRST_CHUNK_SIZE", 16)
+    monkeypatch.setattr(FileLoader, "QUEUE_CHUNKS", 2)
+
+
+def test_loader_inserts_whole_file(tmp_path, small_chunks):
+    text = "строка\r\n" * 500
+    path = tmp_path / "big.txt"
+    path.write_bytes(text.encode("utf-8"))
+    pump, events = Pump(), Events()
+    loader = events.loader(pump, path)
+    loader.start()
+    deadline = time.perf_counter() + TIMEOUT
+    while not events.done:
+        assert time.perf_counter() < deadline, "Файл не загрузился вовремя"
+        pump.run()
+        time.sleep(0.001)
+    assert events.done == [False]
+    assert "".join(events.chunks) == text.replace("\r\n", "\n")
+
+
+def test_cancel_stops_reading(tmp_path, small_chunks):
+    # Очередь вмещает два блока: пока их не вставляют, рабочий поток ждёт и не дочитывает файл
+    path = tmp_path / "big.txt"
+    path.write_bytes(b"x" * (FileLoader.CHUNK_SIZE * 8))
+    pump, events = Pump(), Events()
+    loader = events.loader(pump, path)
+    loader.start()
+    assert events.chunks == ["x" * 16]
+    loader.cancel()
+    assert events.done == [True]
+    assert not pump.calls
+    # Рабочий поток замечает отмену, не дочитав файл, и закрывает его
+    loader._thread.join(TIMEOUT)
+    assert not loader._thread.is_alive()
+    assert loader.reader.file.closed
+    assert loader.reader.bytes_read < loader.reader.total
+    loader.cancel()
+    assert events.done == [True]
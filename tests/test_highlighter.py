@@ -0,0 +1,214 @@
+"""Тесты подсветки без дисплея: виджет Text заменён двойником с командами index, get и tag."""
+import pytest
+
+import Highlighter as highlighter_module
+from Highlighter import Highlighter, PYTHON_LEXER, TAG_PREFIX
+
+
+def position(index):
+    line, column = index.split()[0].split(".")
+    return int(line), int(column)
+
+
+class FakeText:
+    """Строки текста, теги подсветки по строкам и видимая область first..last."""
+
+    def __init__(self, text, visible=(1, 30)):
+        self.lines = text.split("\n")
+        self.tags = [set() for _ in self.lines]
+        self.visible = visible
+        self.tk = self
+
+    def tag_configure(self, tag, **options):
+        pass
+
+    def tag_lower(self, tag):
+        pass
+
+    def winfo_height(self):
+        return 1
+
+    def call(self, command, name, *args):
+        if name == "index":
+            if args[0] == "end -1c":
+                return f"{len(self.lines)}.{len(self.lines[-1])}"
+            return f"{self.visible[0] if args[0] == '@0,0' else self.visible[1]}.0"
+        if name == "get":
+            first, last = position(args[0])[0], position(args[1])[0]
+            return "\n".join(self.lines[first - 1:last])
+        action, tag, *indices = args
+        if action == "remove":
+            last = len(self.lines) if indices[1] == "end" else position(indices[1])[0]
+            for line in range(position(indices[0])[0], last + 1):
+                self.tags[line - 1] = {item for item in self.tags[line - 1] if item[2] != tag}
+        else:
+            for start, end in zip(indices[::2], indices[1::2]):
+                (line, first), (_, last) = position(start), position(end)
+                self.tags[line - 1].add((first, last, tag))
+
+    def tokens(self, line):
+        """Подсвеченные участки строки: [(текст, вид лексемы), ...]; соседние участки одного вида слиты."""
+        spans = []
+        for start, end, tag in sorted(self.tags[line - 1]):
+            if spans and spans[-1][1] == start and spans[-1][2] == tag:
+                start = spans.pop()[0]
+            spans.append((start, end, tag))
+        text = self.lines[line - 1]
+        return [(text[start:end], tag[len(TAG_PREFIX):]) for start, end, tag in spans]
+
+    def replace_line(self, highlighter, line, text):
+        """Правка одной строки, как в редакторе: удаление, вставка и уведомления подсветки."""
+        old = self.lines[line - 1]
+        self.lines[line - 1] = ""
+        highlighter.on_delete(f"{line}.0", old)
+        self.lines[line - 1] = text
+        highlighter.on_insert(f"{line}.0", text)
+        highlighter.schedule()
+
+    def insert_lines(self, highlighter, line, lines):
+        """Вставка целых строк перед строкой line."""
+        self.lines[line - 1:line - 1] = lines
+        self.tags[line - 1:line - 1] = [set() for _ in lines]
+        highlighter.on_insert(f"{line}.0", "".join(text + "\n" for text in lines))
+        highlighter.schedule()
+
+    def delete_lines(self, highlighter, line, count):
+        removed = self.lines[line - 1:line - 1 + count]
+        del self.lines[line - 1:line - 1 + count]
+        del self.tags[line - 1:line - 1 + count]
+        highlighter.on_delete(f"{line}.0", "".join(text + "\n" for text in removed))
+        highlighter.schedule()
+
+
+class FakeRoot:
+    """Отложенные вызовы after и after_idle выполняются в run_all."""
+
+    def __init__(self):
+        self.calls = {}
+        self.counter = 0
+
+    def after(self, delay, callback):
+        self.counter += 1
+        self.calls[self.counter] = callback
+        return self.counter
+
+    def after_idle(self, callback):
+        return self.after(0, callback)
+
+    def after_cancel(self, job):
+        del self.calls[job]
+
+    def run_all(self):
+        while self.calls:
+            self.calls.pop(min(self.calls))()
+
+
+@pytest.fixture
+def lexed(monkeypatch):
+    """Номера строк, разобранных лексером Python (по тексту строки вида «... #N»)."""
+    lines = []
+    tokenize = PYTHON_LEXER.tokenize
+
+    def spy(line, state):
+        lines.append(line)
+        return tokenize(line, state)
+
+    monkeypatch.setattr(PYTHON_LEXER, "tokenize", spy)
+    return lines
+
+
+def highlight(text, **options):
+    root, widget = FakeRoot(), FakeText(text, **options)
+    highlighter = Highlighter(root, widget, "text")
+    highlighter.set_lexer("python")
+    root.run_all()
+    return root, widget, highlighter
+
+
+SOURCE = '''x = 1
+s = """начало # не комментарий
+середина 'без пары
+конец""" + y
+# комментарий "не строка"
+if x:
+    return "да"'''
+
+
+def test_state_carries_over_multiline_string():
+    root, widget, highlighter = highlight(SOURCE)
+    assert highlighter.frontier == 8
+    assert highlighter.states == ["root", "root", "double3", "double3", "root", "root", "root", "root"]
+    assert widget.tokens(1) == [("1", "number")]
+    assert widget.tokens(2) == [('"""начало # не комментарий', "string")]
+    assert widget.tokens(3) == [("середина 'без пары", "string")]
+    assert widget.tokens(4) == [('конец"""', "string")]
+    assert widget.tokens(5) == [('# комментарий "не строка"', "comment")]
+    assert widget.tokens(6) == [("if", "keyword")]
+    assert widget.tokens(7) == [("return", "keyword"), ('"да"', "string")]
+
+    # Закрывающие кавычки убраны: строка продолжается до конца текста
+    widget.replace_line(highlighter, 4, "конец + y")
+    root.run_all()
+    assert highlighter.states[4:] == ["double3"] * 4
+    assert widget.tokens(5) == [('# комментарий "не строка"', "string")]
+    assert widget.tokens(6) == [("if x:", "string")]
+    assert widget.tokens(7) == [('    return "да"', "string")]
+
+    # Вернули кавычки: подсветка кода после строки восстановилась
+    widget.replace_line(highlighter, 4, 'конец""" + y')
+    root.run_all()
+    assert highlighter.states[4:] == ["root"] * 4
+    assert widget.tokens(7) == [("return", "keyword"), ('"да"', "string")]
+
+
+def test_comment_hides_string_quotes():
+    root, widget, highlighter = highlight('# """\nx = 1')
+    assert highlighter.states == ["root"] * 3
+    assert widget.tokens(2) == [("1", "number")]
+    widget.replace_line(highlighter, 1, '"""')
+    root.run_all()
+    assert widget.tokens(2) == [("x = 1", "string")]
+
+
+def numbered(count):
+    return "\n".join(f"x = {number}  #{number}" for number in range(1, count + 1))
+
+
+def lexed_lines(lexed):
+    return sorted({int(line.rsplit("#", 1)[1]) for line in lexed if "#" in line})
+
+
+def test_one_line_edit_relexes_only_that_line(lexed):
+    root, widget, highlighter = highlight(numbered(1000), visible=(480, 520))
+    assert highlighter.frontier == 1001 and not highlighter.dirty
+    lexed.clear()
+
+    widget.replace_line(highlighter, 500, "x = 'изменено'  #500")
+    root.run_all()
+    assert lexed_lines(lexed) == [500]
+    assert widget.tokens(500) == [("'изменено'", "string"), ("#500", "comment")]
+
+    # Открытая строка меняет состояние всех следующих строк — они разбираются заново
+    lexed.clear()
+    widget.replace_line(highlighter, 990, 'x = """  #990')
+    root.run_all()
+    assert lexed_lines(lexed) == list(range(990, 1001))
+    assert widget.tokens(1000) == [("x = 1000  #1000", "string")]
+
+
+def test_inserted_and_deleted_lines_shift_states(lexed, monkeypatch):
+    monkeypatch.setattr(highlighter_module, "BLOCK_LINES", 16)
+    root, widget, highlighter = highlight(numbered(100), visible=(1, 10))
+    lexed.clear()
+
+    widget.insert_lines(highlighter, 50, ["y = 2  #new"] * 3)
+    root.run_all()
+    assert lexed == ["y = 2  #new"] * 3 + ["x = 50  #50"]
+    assert len(highlighter.states) == 104
+
+    lexed.clear()
+    widget.delete_lines(highlighter, 50, 3)
+    root.run_all()
+    assert lexed == ["x = 50  #50"]
+    assert highlighter.states == ["root"] * 101
+    assert widget.tokens(50) == [("50", "number"), ("#50", "comment")]
@@ -0,0 +1,92 @@
+"""Тесты кэша картинок без дисплея: Tk и PhotoImage заменены простыми двойниками."""
+import gc
+import sys
+import types
+
+import pytest
+
+from ImageManager import CACHE_SIZE, ImageManager
+
+
+class FakeTk:
+    """Реестр картинок Tk: созданные, удалённые и встроенные в текст."""
+
+    def __init__(self):
+        self.images = set()
+        self.embedded = set()
+        self.counter = 0
+
+    def call(self, *args):
+        assert args[:2] == ("image", "inuse")
+        return args[2] in self.embedded
+
+    def getboolean(self, value):
+        return bool(value)
+
+
+class FakeRoot:
+    def __init__(self):
+        self.tk = FakeTk()
+
+
+@pytest.fixture
+def root(monkeypatch):
+    root = FakeRoot()
+
+    class PhotoImage:
+        """Как ImageTk.PhotoImage: когда ссылок не остаётся, картинка Tk удаляется."""
+
+        def __init__(self, image):
+            root.tk.counter += 1
+            self.name = f"pyimage{root.tk.counter}"
+            root.tk.images.add(self.name)
+
+        def __str__(self):
+            return self.name
+
+        def __del__(self):
+            root.tk.images.discard(self.name)
+
+    image_tk = types.ModuleType("PIL.ImageTk")
+    image_tk.PhotoImage = PhotoImage
+    pil = types.ModuleType("PIL")
+    pil.ImageTk = image_tk
+    monkeypatch.setitem(sys.modules, "PIL", pil)
+    monkeypatch.setitem(sys.modules, "PIL.ImageTk", image_tk)
+    return root
+
+
+def embed(manager, root, ref):
+    """Как TextEditor.embed_image: картинка создаётся, встраивается в текст и запоминается."""
+    photo = manager.add(ref, None)
+    root.tk.embedded.add(str(photo))
+    manager.show(ref, photo)
+    return str(photo)
+
+
+def test_embedded_images_survive_cache_limit(root):
+    manager = ImageManager(root, workers=1)
+    try:
+        names = [embed(manager, root, (f"hash{i}", 10, 10)) for i in range(CACHE_SIZE * 2)]
+        gc.collect()
+        # Ни одна встроенная картинка, в том числе вставленная последней, не удалена
+        assert all(name in root.tk.images for name in names)
+        assert len(manager.shown) == CACHE_SIZE * 2
+    finally:
+        manager.shutdown()
+
+
+def test_images_removed_from_text_are_released(root):
+    manager = ImageManager(root, workers=1)
+    try:
+        names = [embed(manager, root, (f"hash{i}", 10, 10)) for i in range(CACHE_SIZE + 8)]
+        # Из текста удалены первые 16 картинок: их отпускают, а сверх лимита кэша вытесняют
+        root.tk.embedded.difference_update(names[:16])
+        embed(manager, root, ("new", 10, 10))
+        gc.collect()
+        assert len(manager.shown) == CACHE_SIZE - 8 + 1
+        assert len(manager.cache) == CACHE_SIZE
+        assert sum(name in root.tk.images for name in names[:16]) == 16 - 9
+        assert all(name in root.tk.images for name in names[16:])
+    finally:
+        manager.shutdown()
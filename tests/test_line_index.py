@@ -0,0 +1,98 @@
+"""Тесты индекса строк: смещения и позиции сверяются со строками str.splitlines."""
+import random
+
+import pytest
+
+import LineIndex as line_index_module
+from LineIndex import LineIndex
+
+
+def positions(text):
+    """Позиции (строка с 1, столбец) всех смещений текста от 0 до len(text) включительно."""
+    lines = text.splitlines(keepends=True)
+    if not lines or lines[-1].endswith("\n"):
+        lines.append("")  # После завершающего перевода строки начинается пустая строка
+    result = []
+    for number, line in enumerate(lines, 1):
+        result.extend((number, column) for column in range(len(line)))
+    result.append((len(lines), len(lines[-1])))
+    return result
+
+
+def check(index, text):
+    expected = positions(text)
+    assert len(index) == len(text)
+    assert index.line_count == expected[-1][0]
+    for offset, (line, column) in enumerate(expected):
+        assert index.position(offset) == (line, column)
+        assert index.offset(line, column) == offset
+    assert index.indices(range(len(text) + 1)) == [f"{line}.{column}" for line, column in expected]
+
+
+@pytest.mark.parametrize("text", ["", "одна строка", "a\nb\n", "\n\n\n", "x\n" * 1000 + "хвост"])
+def test_round_trip(text):
+    index = LineIndex(text)
+    check(index, text)
+    for offset in range(len(text) + 1):
+        assert index.index_offset(index.index(offset)) == offset
+
+
+def test_offset_clamps_like_widget_indices():
+    index = LineIndex("ab\ncd")
+    assert index.offset(1, 99) == 2  # Столбец за концом строки — перед её переводом строки
+    assert index.offset(2, 99) == 5
+    assert index.offset(99, 0) == 5
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # Маленькие блоки: правки делят блоки и задевают сразу несколько
+    monkeypatch.setattr(line_index_module, "BLOCK_LINES", 4)
+
+
+def test_edits_across_block_boundaries(small_blocks):
+    text = "".join(f"строка {number}\n" for number in range(40))
+    index = LineIndex(text)
+    assert len(index._blocks) == 11  # 40 строк и пустая строка после последнего перевода строки
+
+    # Вставка многих строк посреди блока делит его
+    inserted = "новая\n" * 20
+    offset = text.index("строка 5")
+    index.insert(offset, inserted)
+    text = text[:offset] + inserted + text[offset:]
+    assert max(len(block) for block in index._blocks) <= 8
+    check(index, text)
+
+    # Удаление от середины одного блока до середины другого через несколько блоков
+    start, end = text.index("строка 2") + 3, text.index("строка 30") + 4
+    index.delete(start, end - start)
+    text = text[:start] + text[end:]
+    check(index, text)
+
+    # Удаление всего текста и вставка без переводов строки
+    index.delete(0, len(text))
+    check(index, "")
+    index.insert(0, "одна")
+    check(index, "одна")
+
+
+def test_random_edits(small_blocks):
+    rng = random.Random(3)
+    text = "строка\n" * 50
+    index = LineIndex(text)
+    for step in range(500):
+        offset = rng.randint(0, len(text))
+        if rng.random() < 0.5:
+            inserted = "".join(rng.choice("ab \nя") for _ in range(rng.randint(1, 8))) + "\n" * rng.randint(0, 12)
+            index.insert(offset, inserted)
+            text = text[:offset] + inserted + text[offset:]
+        else:
+            length = rng.randint(1, 60)
+            index.delete(offset, length)
+            text = text[:offset] + text[offset + length:]
+        if step % 25 == 0:
+            check(index, text)
+        else:
+            probe = rng.randint(0, len(text))
+            assert index.position(probe) == positions(text)[probe]
+    check(index, text)
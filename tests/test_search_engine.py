@@ -0,0 +1,104 @@
+"""Тесты поиска и замены по тексту документа."""
+import random
+import re
+
+import pytest
+
+from SearchEngine import SearchEngine, SearchOptions, find_replacements, has_border
+
+TEXT = "Кот и кот. Котёнок, кот-обормот; КОТ\nкот"
+
+
+def spans(engine):
+    return list(zip(engine.starts, engine.ends))
+
+
+def found(text, query, **options):
+    engine = SearchEngine()
+    engine.search(text, query, SearchOptions(**options))
+    return [text[start:end] for start, end in spans(engine)]
+
+
+def test_plain_search_escapes_special_characters():
+    assert found("a.b a+b a.b", "a.b") == ["a.b", "a.b"]
+    assert found("(x) (x)", "(x)") == ["(x)", "(x)"]
+
+
+def test_case_and_whole_word():
+    assert found(TEXT, "кот") == ["кот", "кот", "кот"]
+    assert found(TEXT, "кот", case_sensitive=False) == ["Кот", "кот", "Кот", "кот", "КОТ", "кот"]
+    # «Котёнок» не подходит: слово целиком
+    assert found(TEXT, "кот", case_sensitive=False, whole_word=True) == ["Кот", "кот", "кот", "КОТ", "кот"]
+
+
+def test_regex_search():
+    assert found(TEXT, r"[Кк]от\w+", regex=True) == ["Котёнок"]
+    assert found(TEXT, r"^кот", regex=True) == ["кот"]
+    assert found(TEXT, r"к(о|О)т", regex=True, case_sensitive=False, whole_word=True) == \
+        ["Кот", "кот", "кот", "КОТ", "кот"]
+    # Пустые совпадения не подсвечиваются
+    assert found("abc", r"x*", regex=True) == []
+    with pytest.raises(re.error):
+        found("abc", "(", regex=True)
+
+
+def test_navigation_wraps_around():
+    engine = SearchEngine()
+    engine.search("ab ab ab", "ab", SearchOptions())
+    assert engine.next_match(1) == 1
+    assert engine.next_match(7) == 0
+    assert engine.previous_match(3) == 0
+    assert engine.previous_match(0) == 2
+    assert engine.matches_between(1, 4) == [(0, 2), (3, 5)]
+    assert engine.span(2) == (6, 8)
+
+
+def test_refine_matches_fresh_search():
+    rng = random.Random(4)
+    for _ in range(300):
+        text = "".join(rng.choice("ab") for _ in range(rng.randint(0, 40)))
+        query = "".join(rng.choice("ab") for _ in range(rng.randint(1, 4)))
+        engine = SearchEngine()
+        engine.search(text, query[:1], SearchOptions())
+        # Набор в строке поиска: каждый следующий запрос дописывает предыдущий
+        for size in range(2, len(query) + 1):
+            engine.search(text, query[:size], SearchOptions())
+            fresh = SearchEngine()
+            fresh.search(text, query[:size], SearchOptions())
+            assert spans(engine) == spans(fresh)
+
+
+def test_refine_is_used_only_without_border(monkeypatch):
+    calls = []
+    monkeypatch.setattr(SearchEngine, "_refine", lambda self, query: calls.append(query))
+    text = "abcab aab"
+    engine = SearchEngine()
+    engine.search(text, "ab", SearchOptions())
+    engine.search(text, "abc", SearchOptions())
+    assert calls == ["abc"]
+    assert has_border("aa") and has_border("aba") and not has_border("ab")
+
+    engine = SearchEngine()
+    engine.search(text, "aa", SearchOptions())
+    engine.search(text, "aab", SearchOptions())
+    # Другой текст или другие параметры — поиск заново
+    engine.search(text + " ", "aabx", SearchOptions())
+    engine.search(text, "aab", SearchOptions(case_sensitive=False))
+    engine.search(text, "aabc", SearchOptions(case_sensitive=False))
+    assert calls == ["abc"]
+
+
+def test_find_replacements_plain_keeps_replacement_literal():
+    assert find_replacements("a1 b2 a1", "a1", r"\1-x", SearchOptions()) == [(0, 2, r"\1-x"), (6, 8, r"\1-x")]
+
+
+def test_find_replacements_expands_groups():
+    text = "2024-01-31 и 1999-12-01"
+    replacements = find_replacements(text, r"(\d{4})-(?P<month>\d\d)-(\d\d)", r"\3.\g<month>.\1",
+                                     SearchOptions(regex=True))
+    assert replacements == [(0, 10, "31.01.2024"), (13, 23, "01.12.1999")]
+
+
+def test_find_replacements_in_range():
+    text = "кот кот кот"
+    assert find_replacements(text, "кот", "пёс", SearchOptions(), 2, 9) == [(4, 7, "пёс")]
@@ -0,0 +1,219 @@
+"""Тесты совместной правки: преобразование дельт, JSON и клиенты локального сервера на одной машине."""
+import heapq
+import random
+import time
+from collections import deque
+
+import pytest
+
+import DocumentFormat
+from Document import Document
+from SyncClient import SyncSession
+from SyncOperations import Delta, delete_delta, format_delta, insert_delta, transform_lists
+from SyncServer import LocalServer
+
+BOLD = DocumentFormat.style_key(dict(DocumentFormat.DEFAULT_STYLE, bold=True))
+ITALIC = DocumentFormat.style_key(dict(DocumentFormat.DEFAULT_STYLE, italic=True))
+TIMEOUT = 10  # Секунд на обмен сообщениями с сервером
+
+
+def state(document):
+    return document.text(), list(document.styles.runs())
+
+
+def apply_all(text, deltas):
+    document = Document(text)
+    for delta in deltas:
+        delta.apply(document)
+    return document
+
+
+def merge(text, client, server):
+    """Оба порядка применения серий правок: client после server и server после client."""
+    client_after, server_after = transform_lists(client, server)
+    return apply_all(text, server + client_after), apply_all(text, client + server_after)
+
+
+@pytest.mark.parametrize("client, server, expected", [
+    # Вставки в одну позицию: правка, принятая сервером раньше, стоит левее
+    ([insert_delta(2, "К")], [insert_delta(2, "С")], "abСКcdef"),
+    # Удаления, перекрывающие друг друга
+    ([delete_delta(1, 3)], [delete_delta(2, 3)], "af"),
+    ([delete_delta(1, 4)], [delete_delta(2, 1)], "af"),
+    ([delete_delta(2, 2)], [delete_delta(2, 2)], "abef"),
+    # Вставка внутрь удаляемого участка сохраняется
+    ([insert_delta(3, "X")], [delete_delta(1, 4)], "aXf"),
+    ([delete_delta(1, 4)], [insert_delta(3, "X")], "aXf"),
+    # Вставка на границе удаления
+    ([insert_delta(1, "X")], [delete_delta(1, 2)], "aXdef"),
+    ([insert_delta(3, "X")], [delete_delta(1, 2)], "aXdef"),
+])
+def test_transform_converges(client, server, expected):
+    first, second = merge("abcdef", client, server)
+    assert first.text() == expected
+    assert state(first) == state(second)
+
+
+def test_transform_keeps_server_style_on_overlap():
+    first, second = merge("abcdef", [format_delta(1, 4, ITALIC)], [format_delta(2, 5, BOLD)])
+    assert state(first) == state(second)
+    assert [first.style_at(i) for i in range(6)] == [DocumentFormat.DEFAULT_STYLE_KEY, ITALIC, BOLD, BOLD, BOLD,
+                                                     DocumentFormat.DEFAULT_STYLE_KEY]
+
+
+def random_delta(length, rng):
+    kind = rng.random()
+    if kind < 0.5 or length < 2:
+        return insert_delta(rng.randint(0, length), rng.choice(["x", "yz", "щ\n"]), rng.choice([BOLD, ITALIC]))
+    start = rng.randrange(length - 1)
+    end = rng.randint(start + 1, length)
+    if kind < 0.8:
+        return delete_delta(start, end - start)
+    return format_delta(start, end, rng.choice([BOLD, ITALIC]))
+
+
+def test_transform_lists_converge_on_random_series():
+    rng = random.Random(5)
+    for _ in range(300):
+        text = "".join(rng.choice("abc \n") for _ in range(rng.randint(0, 12)))
+        series = []
+        for _ in range(2):
+            document, deltas = Document(text), []
+            for _ in range(rng.randint(1, 4)):
+                delta = random_delta(len(document), rng)
+                delta.apply(document)
+                deltas.append(delta)
+            series.append(deltas)
+        first, second = merge(text, *series)
+        assert state(first) == state(second)
+
+
+@pytest.mark.parametrize("delta", [
+    Delta(),
+    insert_delta(0, "привет\n"),
+    insert_delta(5, "x", BOLD),
+    delete_delta(3, 7),
+    format_delta(2, 9, ITALIC),
+    Delta().retain(2).insert("ab", BOLD).delete(3).retain(4, ITALIC).insert("c").retain(1),
+])
+def test_delta_json_round_trip(delta):
+    assert Delta.from_json(delta.to_json()) == delta
+
+
+class Pump:
+    """Заменяет root.after для соединений: отложенные вызовы выполняются в run_once."""
+
+    def __init__(self):
+        self.calls = []
+        self.counter = 0
+
+    def after(self, delay, callback):
+        self.counter += 1
+        heapq.heappush(self.calls, (time.perf_counter() + delay / 1000, self.counter, callback))
+        return self.counter
+
+    def run_once(self):
+        now = time.perf_counter()
+        while self.calls and self.calls[0][0] <= now:
+            heapq.heappop(self.calls)[2]()
+
+
+def run_until(pumps, condition):
+    deadline = time.perf_counter() + TIMEOUT
+    while not condition():
+        assert time.perf_counter() < deadline, "Сервер не ответил вовремя"
+        for pump in pumps:
+            pump.run_once()
+        time.sleep(0.001)
+
+
+class Client:
+    """Копия документа у одного участника и его сессия."""
+
+    def __init__(self, pump, address, document=None):
+        self.document = document
+        self.welcomes = 0
+        self.session = SyncSession(pump, address, None if document is None else document.to_json(),
+                                   self.on_welcome, self.on_remote, self.on_closed)
+        self.session.start()
+        run_until([pump], lambda: self.session.connected)
+
+    def on_welcome(self, data):
+        self.welcomes += 1
+        if data is not None:
+            self.document = Document.from_json(data)
+
+    def on_remote(self, deltas):
+        for delta in deltas:
+            delta.apply(self.document)
+
+    def on_closed(self, error):
+        assert error is None
+
+    def edit(self, delta):
+        delta.apply(self.document)
+        self.session.record(delta)
+
+    def settled(self, server):
+        sync = self.session.state
+        return sync is not None and not sync.pending and not sync.buffer and sync.revision == server.revision
+
+
+@pytest.fixture
+def server():
+    local = LocalServer(("tcp", "127.0.0.1", 0))
+    local.start()
+    yield local
+    local.stop()
+
+
+def converge(pumps, server, clients):
+    run_until(pumps, lambda: all(client.settled(server.server) for client in clients))
+    expected = state(server.server.document)
+    for client in clients:
+        assert state(client.document) == expected
+
+
+def test_clients_converge_after_concurrent_edits(server):
+    pump = Pump()
+    first = Client(pump, server.address, Document("общий документ"))
+    second = Client(pump, server.address)
+    assert state(second.document) == state(first.document)
+
+    rng = random.Random(7)
+    for _ in range(200):
+        client = rng.choice([first, second])
+        client.edit(random_delta(len(client.document), rng))
+        if rng.random() < 0.3:
+            pump.run_once()
+    converge([pump], server, [first, second])
+
+    first.session.close()
+    second.session.close()
+
+
+def test_lagging_client_gets_document_again(server):
+    pump, lagging_pump = Pump(), Pump()
+    first = Client(pump, server.address, Document("abc"))
+    second = Client(lagging_pump, server.address)
+    # Второй клиент не читает сообщения, а журнал сервера короче его отставания:
+    # его правку сервер не примет и пришлёт документ заново
+    server.server.log = deque(maxlen=1)
+    for index in range(3):
+        first.edit(insert_delta(0, str(index)))
+        run_until([pump], lambda: first.settled(server.server))
+    second.edit(insert_delta(len(second.document), "!"))
+    run_until([pump, lagging_pump], lambda: second.welcomes == 2)
+    converge([pump, lagging_pump], server, [first, second])
+    assert first.document.text() == "210abc"
+
+    # Переподключение: новая сессия получает текущий документ сервера
+    second.session.close()
+    third = Client(lagging_pump, server.address)
+    first.edit(delete_delta(0, 1))
+    third.edit(insert_delta(0, ">"))
+    converge([pump, lagging_pump], server, [first, third])
+    assert first.document.text() == ">10abc"
+
+    first.session.close()
+    third.session.close()
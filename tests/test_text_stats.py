@@ -0,0 +1,65 @@
+"""Тесты счётчиков: после каждой правки статистика совпадает с полным пересчётом."""
+import random
+
+import pytest
+
+from TextStats import TextStats
+
+
+def counts(stats):
+    return stats.lines, stats.words, stats.chars
+
+
+def expected(text):
+    return counts(TextStats.of(text))
+
+
+def insert(stats, text, offset, inserted):
+    stats.apply_insert(inserted, text[offset - 1:offset], text[offset:offset + 1])
+    return text[:offset] + inserted + text[offset:]
+
+
+def delete(stats, text, start, end):
+    stats.apply_delete(text[start:end], text[start - 1:start] if start else "", text[end:end + 1])
+    return text[:start] + text[end:]
+
+
+@pytest.mark.parametrize("text, lines, words", [
+    ("", 1, 0),
+    ("одно", 1, 1),
+    ("  два  слова \n", 2, 2),
+    ("a\tb\nc d", 2, 4),
+])
+def test_recount(text, lines, words):
+    assert counts(TextStats.of(text)) == (lines, words, len(text))
+
+
+def test_typing_and_splitting_words():
+    stats, text = TextStats(), ""
+    for char in "привет мир":
+        text = insert(stats, text, len(text), char)
+        assert counts(stats) == expected(text)
+    # Пробел посреди слова делит его, удаление пробела склеивает обратно
+    text = insert(stats, text, 3, " ")
+    assert counts(stats) == expected(text) == (1, 3, 11)
+    text = delete(stats, text, 3, 4)
+    assert counts(stats) == expected(text) == (1, 2, 10)
+    # Перевод строки между словами и удаление всего текста
+    text = insert(stats, text, 6, "\n")
+    assert counts(stats) == expected(text) == (2, 2, 11)
+    text = delete(stats, text, 0, len(text))
+    assert counts(stats) == expected(text) == (1, 0, 0)
+
+
+def test_random_edits_match_recount():
+    rng = random.Random(6)
+    text = "первая строка\nвторая  строка\n"
+    stats = TextStats.of(text)
+    for _ in range(2000):
+        offset = rng.randint(0, len(text))
+        if rng.random() < 0.55:
+            inserted = "".join(rng.choice("ab я\n\t") for _ in range(rng.randint(1, 6)))
+            text = insert(stats, text, offset, inserted)
+        else:
+            text = delete(stats, text, offset, min(len(text), offset + rng.randint(1, 6)))
+        assert counts(stats) == expected(text)
@@ -0,0 +1,126 @@
+import random
+
+from SyncOperations import delete_delta, insert_delta
+from UndoHistory import TextDelta, UndoHistory
+
+
+def apply_delta(text, delta):
+    position = 0
+    for op in delta.ops:
+        if op[0] == "r":
+            position += op[1]
+        elif op[0] == "i":
+            text = text[:position] + op[1] + text[position:]
+            position += len(op[1])
+        else:
+            text = text[:position] + text[position + op[1]:]
+    return text
+
+
+def apply_entry(text, entry, reverse):
+    for delta in (reversed(entry.deltas) if reverse else entry.deltas):
+        assert isinstance(delta, TextDelta)
+        if (delta.kind == "insert") != reverse:
+            text = text[:delta.offset] + delta.text + text[delta.offset:]
+        else:
+            assert text[delta.offset:delta.offset + len(delta.text)] == delta.text
+            text = text[:delta.offset] + text[delta.offset + len(delta.text):]
+    return text
+
+
+class Shared:
+    """Текст, локальная история и чужие правки поверх него."""
+
+    def __init__(self, text, history=None):
+        self.text = text
+        self.history = UndoHistory() if history is None else history
+
+    def insert(self, offset, text):
+        self.text = self.text[:offset] + text + self.text[offset:]
+        self.history.record_insert(offset, text)
+        self.history.seal()
+
+    def delete(self, offset, length):
+        self.history.record_delete(offset, self.text[offset:offset + length])
+        self.history.seal()
+        self.text = self.text[:offset] + self.text[offset + length:]
+
+    def remote(self, delta):
+        self.text = apply_delta(self.text, delta)
+        self.history.rebase(delta)
+
+    def undo(self):
+        entry = self.history.undo()
+        if entry is not None:
+            self.text = apply_entry(self.text, entry, True)
+        return entry
+
+    def redo(self):
+        entry = self.history.redo()
+        if entry is not None:
+            self.text = apply_entry(self.text, entry, False)
+        return entry
+
+
+def test_undo_keeps_remote_insert_before_local_edit():
+    shared = Shared("hello world")
+    shared.insert(6, "big ")
+    shared.remote(insert_delta(0, ">> "))
+    shared.undo()
+    assert shared.text == ">> hello world"
+    shared.redo()
+    assert shared.text == ">> hello big world"
+
+
+def test_undo_keeps_remote_text_inside_local_insert():
+    shared = Shared("")
+    shared.insert(0, "abc")
+    shared.remote(insert_delta(1, "Z"))
+    shared.undo()
+    assert shared.text == "Z"
+    shared.redo()
+    assert shared.text == "aZbc"
+
+
+def test_undo_skips_local_text_deleted_remotely():
+    shared = Shared("12")
+    shared.insert(1, "abc")
+    shared.insert(0, "x")
+    shared.remote(delete_delta(2, 2))
+    assert shared.text == "x1c2"
+    shared.undo()
+    shared.undo()
+    assert shared.text == "12"
+    assert shared.undo() is None
+
+
+def test_undo_restores_deleted_text_at_moved_position():
+    shared = Shared("one two three")
+    shared.delete(4, 4)
+    shared.remote(insert_delta(0, "zero "))
+    shared.remote(delete_delta(len("zero one "), 2))
+    shared.undo()
+    assert shared.text == "zero one two ree"
+
+
+def test_random_edits_undo_to_remote_only_text(tmp_path):
+    rng = random.Random(3)
+    # Маленький лимит: старые записи уходят в сегменты и переносятся через чужие правки при чтении
+    shared = Shared("", UndoHistory(max_bytes=2000, spill_dir=str(tmp_path)))
+    for _ in range(300):
+        if rng.random() < 0.5:
+            offset = rng.randint(0, len(shared.text))
+            shared.insert(offset, rng.choice("abc") * rng.randint(1, 3))
+        else:
+            offset = rng.randint(0, len(shared.text))
+            delta = insert_delta(offset, "R")
+            if shared.text and rng.random() < 0.3:
+                offset = rng.randrange(len(shared.text))
+                delta = delete_delta(offset, min(2, len(shared.text) - offset))
+            shared.remote(delta)
+    while shared.undo() is not None:
+        pass
+    remote_only = "".join(char for char in shared.text if char == "R")
+    assert shared.text == remote_only
+    assert shared.history.disk_bytes == 0
+    shared.history.close()